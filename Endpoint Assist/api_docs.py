@@ -77,7 +77,9 @@ API_SPEC = {
                             }
                         }
                     },
-                    "401": {"description": "Invalid credentials"}
+                    "401": {"description": "Invalid credentials"},
+                    "429": {"description": "Too many login attempts from this address or for this account; see Retry-After"},
+                    "503": {"description": "Password hashing is saturated; see Retry-After"}
                 }
             }
         },
@@ -321,16 +323,30 @@ API_SPEC = {
             "get": {
                 "tags": ["Tickets"],
                 "summary": "Get all tickets",
+                "description": "Returns tickets newest first. Pass the returned next_cursor to fetch the following page; it is null on the last page.",
                 "parameters": [
                     {
                         "name": "status",
                         "in": "query",
                         "description": "Filter by status",
                         "schema": {"type": "string", "enum": ["open", "in-progress", "resolved", "closed"]}
+                    },
+                    {
+                        "name": "limit",
+                        "in": "query",
+                        "description": "Page size; values above 500 are clamped and values below 1 rejected",
+                        "schema": {"type": "integer", "default": 100, "minimum": 1, "maximum": 500}
+                    },
+                    {
+                        "name": "cursor",
+                        "in": "query",
+                        "description": "Opaque cursor from a previous page's next_cursor",
+                        "schema": {"type": "string"}
                     }
                 ],
                 "responses": {
-                    "200": {"description": "Ticket list"}
+                    "200": {"description": "Ticket list with next_cursor"},
+                    "400": {"description": "Invalid cursor"}
                 }
             },
             "post": {
@@ -349,6 +365,84 @@ API_SPEC = {
                 }
             }
         },
+        "/api/tickets/bulk": {
+            "post": {
+                "tags": ["Tickets"],
+                "summary": "Bulk import tickets",
+                "description": "Create many tickets from a JSON array or an NDJSON body (Content-Type: application/x-ndjson). Each ticket is validated on its own; valid tickets are inserted in batched transactions and one audit entry records the import. Results are returned per input row, in order.",
+                "security": [{"bearerAuth": []}],
+                "requestBody": {
+                    "required": True,
+                    "content": {
+                        "application/json": {
+                            "schema": {"type": "array", "items": {"$ref": "#/components/schemas/TicketCreate"}}
+                        },
+                        "application/x-ndjson": {
+                            "schema": {"type": "string", "example": "{\"title\": \"Printer offline\"}\n{\"title\": \"VPN drops\"}"}
+                        }
+                    }
+                },
+                "responses": {
+                    "200": {"description": "Created and failed counts with per-row results"},
+                    "400": {"description": "Body is not a JSON array or NDJSON"},
+                    "401": {"description": "Authentication required"},
+                    "413": {"description": "Too many tickets in one request"}
+                }
+            }
+        },
+        "/api/tickets/stats": {
+            "get": {
+                "tags": ["Tickets"],
+                "summary": "Get ticket statistics",
+                "description": "Ticket totals by status, priority and category, read from trigger-maintained counters",
+                "responses": {
+                    "200": {"description": "Ticket counts"}
+                }
+            }
+        },
+        "/api/admin/ticket-counters/reconcile": {
+            "post": {
+                "tags": ["Tickets"],
+                "summary": "Reconcile ticket counters",
+                "description": "Recount tickets, rewrite the counters behind /api/tickets/stats and list any rows that had drifted (admin only)",
+                "security": [{"bearerAuth": []}],
+                "responses": {
+                    "200": {"description": "Drifted counters, empty when the counters were exact"},
+                    "401": {"description": "Authentication required"},
+                    "403": {"description": "Admin access required"}
+                }
+            }
+        },
+        "/api/tickets/search": {
+            "get": {
+                "tags": ["Tickets"],
+                "summary": "Search tickets",
+                "description": "Full-text search over titles, descriptions and resolutions, ranked by bm25. End a term with * for a prefix match. Each result includes an HTML-escaped snippet with matches wrapped in <mark> tags.",
+                "parameters": [
+                    {
+                        "name": "q",
+                        "in": "query",
+                        "required": True,
+                        "schema": {"type": "string", "example": "printer offl*"}
+                    },
+                    {
+                        "name": "status",
+                        "in": "query",
+                        "description": "Filter by status",
+                        "schema": {"type": "string", "enum": ["open", "in-progress", "resolved", "closed"]}
+                    },
+                    {
+                        "name": "limit",
+                        "in": "query",
+                        "schema": {"type": "integer", "default": 20, "maximum": 200}
+                    }
+                ],
+                "responses": {
+                    "200": {"description": "Ranked search results"},
+                    "400": {"description": "Empty search query"}
+                }
+            }
+        },
         "/api/tickets/{ticket_id}": {
             "put": {
                 "tags": ["Tickets"],
@@ -440,21 +534,219 @@ API_SPEC = {
             "get": {
                 "tags": ["Audit"],
                 "summary": "Get audit logs",
+                "description": "Returns audit logs newest first. Pass the returned next_cursor to fetch the following page; it is null on the last page.",
                 "parameters": [
                     {
                         "name": "limit",
                         "in": "query",
-                        "schema": {"type": "integer", "default": 100}
+                        "description": "Page size; values above 500 are clamped and values below 1 rejected",
+                        "schema": {"type": "integer", "default": 100, "minimum": 1, "maximum": 500}
                     },
                     {
                         "name": "action",
                         "in": "query",
                         "description": "Filter by action type",
                         "schema": {"type": "string"}
+                    },
+                    {
+                        "name": "q",
+                        "in": "query",
+                        "description": "Full-text search. Scope terms with action:, details:, user: or ip:; other colons are searched literally. Double quotes group a phrase; end a term with * for a prefix match",
+                        "schema": {"type": "string", "example": "user:admin action:Ticket"}
+                    },
+                    {
+                        "name": "since",
+                        "in": "query",
+                        "description": "Only logs at or after this ISO 8601 time (UTC unless an offset is given)",
+                        "schema": {"type": "string", "format": "date-time"}
+                    },
+                    {
+                        "name": "until",
+                        "in": "query",
+                        "description": "Only logs before this ISO 8601 time (UTC unless an offset is given)",
+                        "schema": {"type": "string", "format": "date-time"}
+                    },
+                    {
+                        "name": "archived",
+                        "in": "query",
+                        "description": "Also read months that have been expired to compressed archives",
+                        "schema": {"type": "boolean", "default": False}
+                    },
+                    {
+                        "name": "cursor",
+                        "in": "query",
+                        "description": "Opaque cursor from a previous page's next_cursor",
+                        "schema": {"type": "string"}
                     }
                 ],
                 "responses": {
-                    "200": {"description": "Audit log list"}
+                    "200": {"description": "Audit log list with next_cursor"},
+                    "400": {"description": "Invalid cursor, search query or timestamp"}
+                }
+            }
+        },
+        "/api/export/{dataset}": {
+            "get": {
+                "tags": ["Reports"],
+                "summary": "Export data",
+                "description": "Streams tickets, audit logs or devices oldest first as NDJSON or CSV. The response is written as rows are read, so memory use does not grow with the table.",
+                "security": [{"bearerAuth": []}],
+                "parameters": [
+                    {
+                        "name": "dataset",
+                        "in": "path",
+                        "required": True,
+                        "schema": {"type": "string", "enum": ["tickets", "audit-logs", "devices"]}
+                    },
+                    {
+                        "name": "format",
+                        "in": "query",
+                        "schema": {"type": "string", "enum": ["ndjson", "csv"], "default": "ndjson"}
+                    },
+                    {
+                        "name": "since",
+                        "in": "query",
+                        "description": "Only rows created (tickets), logged (audit logs) or last seen (devices) at or after this ISO 8601 time",
+                        "schema": {"type": "string", "format": "date-time"}
+                    },
+                    {
+                        "name": "until",
+                        "in": "query",
+                        "description": "Only rows before this ISO 8601 time",
+                        "schema": {"type": "string", "format": "date-time"}
+                    },
+                    {
+                        "name": "status",
+                        "in": "query",
+                        "description": "Tickets only: filter by status",
+                        "schema": {"type": "string"}
+                    },
+                    {
+                        "name": "archived",
+                        "in": "query",
+                        "description": "Audit logs only: also read months expired to compressed archives",
+                        "schema": {"type": "boolean", "default": False}
+                    }
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Streamed export file",
+                        "content": {"application/x-ndjson": {}, "text/csv": {}}
+                    },
+                    "400": {"description": "Unknown format or invalid timestamp"},
+                    "401": {"description": "Authentication required"},
+                    "404": {"description": "Unknown dataset"}
+                }
+            }
+        },
+        "/api/admin/audit-writer": {
+            "get": {
+                "tags": ["Audit"],
+                "summary": "Get audit writer statistics",
+                "description": "Queue depth and counters for the background audit log writer (admin only)",
+                "security": [{"bearerAuth": []}],
+                "responses": {
+                    "200": {"description": "Writer statistics"},
+                    "401": {"description": "Authentication required"},
+                    "403": {"description": "Admin access required"}
+                }
+            }
+        },
+        "/api/admin/query-stats": {
+            "get": {
+                "tags": ["Audit"],
+                "summary": "Get query statistics",
+                "description": "Top SQL statements (normalized) over the rolling window, with counts, rows, latency percentiles, histograms and sampled calling code, plus recent slow queries with their EXPLAIN QUERY PLAN (admin only)",
+                "security": [{"bearerAuth": []}],
+                "parameters": [
+                    {
+                        "name": "limit",
+                        "in": "query",
+                        "schema": {"type": "integer", "default": 20}
+                    },
+                    {
+                        "name": "sort",
+                        "in": "query",
+                        "schema": {"type": "string", "enum": ["total_ms", "count", "max_ms", "rows"], "default": "total_ms"}
+                    }
+                ],
+                "responses": {
+                    "200": {"description": "Statement statistics and slow queries"},
+                    "400": {"description": "Unknown sort field"},
+                    "401": {"description": "Authentication required"},
+                    "403": {"description": "Admin access required"}
+                }
+            }
+        },
+        "/api/admin/query-stats/reset": {
+            "post": {
+                "tags": ["Audit"],
+                "summary": "Reset query statistics",
+                "description": "Discards collected statement statistics and the slow-query log (admin only)",
+                "security": [{"bearerAuth": []}],
+                "responses": {
+                    "200": {"description": "Statistics reset"},
+                    "401": {"description": "Authentication required"},
+                    "403": {"description": "Admin access required"}
+                }
+            }
+        },
+        "/api/admin/maintenance": {
+            "get": {
+                "tags": ["Audit"],
+                "summary": "Get database maintenance history",
+                "description": "Recent maintenance runs (optimize, ANALYZE, incremental vacuum, WAL checkpoint) with per-task timings and bytes reclaimed, plus the idle scheduler's state (admin only)",
+                "security": [{"bearerAuth": []}],
+                "parameters": [
+                    {
+                        "name": "limit",
+                        "in": "query",
+                        "schema": {"type": "integer", "default": 50}
+                    }
+                ],
+                "responses": {
+                    "200": {"description": "Scheduler state and runs, newest first"},
+                    "401": {"description": "Authentication required"},
+                    "403": {"description": "Admin access required"}
+                }
+            }
+        },
+        "/api/admin/maintenance/run": {
+            "post": {
+                "tags": ["Audit"],
+                "summary": "Run database maintenance now",
+                "description": "Runs maintenance immediately within the configured time budget, whatever the load (admin only)",
+                "security": [{"bearerAuth": []}],
+                "responses": {
+                    "200": {"description": "The recorded run"},
+                    "401": {"description": "Authentication required"},
+                    "403": {"description": "Admin access required"}
+                }
+            }
+        },
+        "/api/admin/session-sweeper": {
+            "get": {
+                "tags": ["Authentication"],
+                "summary": "Get expired-session sweeper statistics",
+                "description": "Sessions and revocations removed so far, the sweep interval and the latest sweep (admin only)",
+                "security": [{"bearerAuth": []}],
+                "responses": {
+                    "200": {"description": "Sweeper totals and latest sweep"},
+                    "401": {"description": "Authentication required"},
+                    "403": {"description": "Admin access required"}
+                }
+            }
+        },
+        "/api/admin/session-sweeper/run": {
+            "post": {
+                "tags": ["Authentication"],
+                "summary": "Delete expired sessions now",
+                "description": "Runs a sweep immediately and returns the rows removed, batches and duration (admin only)",
+                "security": [{"bearerAuth": []}],
+                "responses": {
+                    "200": {"description": "Rows removed by the sweep"},
+                    "401": {"description": "Authentication required"},
+                    "403": {"description": "Admin access required"}
                 }
             }
         },
@@ -559,7 +851,9 @@ API_SPEC = {
                     "title": {"type": "string"},
                     "description": {"type": "string"},
                     "category": {"type": "string"},
-                    "priority": {"type": "string", "enum": ["low", "medium", "high", "critical"]}
+                    "priority": {"type": "string", "enum": ["low", "medium", "high", "critical"]},
+                    "status": {"type": "string", "enum": ["open", "in-progress", "resolved", "closed"], "description": "Bulk import only"},
+                    "assigned_to": {"type": "string", "description": "Bulk import only"}
                 }
             },
             "TicketUpdate": {
@@ -3,7 +3,7 @@ Endpoint Assist - Professional IT Help Desk Tool
 A comprehensive web application for IT support and diagnostics
 """
 
-from flask import Flask, render_template, jsonify, request, session, send_file
+from flask import Flask, render_template, jsonify, request, session, send_file, Response, stream_with_context
 from flask_cors import CORS
 import psutil
 import platform
@@ -13,6 +13,7 @@ import json
 import os
 import uuid
 import time
+import math
 from datetime import datetime, timedelta
 import threading
 import re
@@ -23,11 +24,27 @@ import wmi
 # Import database module
 from database import (
     init_db, 
-    create_ticket, get_all_tickets, get_ticket_by_id, update_ticket, delete_ticket, get_ticket_stats,
-    add_audit_log as db_add_audit_log, get_audit_logs,
+    create_ticket, get_all_tickets, get_tickets_page, get_ticket_by_id, update_ticket, delete_ticket, get_ticket_stats,
+    search_tickets, reconcile_ticket_counters, display_id, create_tickets_bulk, get_maintenance_history,
+    add_audit_log as db_add_audit_log, get_audit_logs, get_audit_logs_page,
     get_setting, set_setting
 )
 
+# Import background audit log writer
+from audit_writer import audit_writer, start_audit_writer, enqueue_audit_log
+
+# Import per-statement query statistics
+from query_stats import query_stats
+
+# Import idle-time database maintenance
+from maintenance import maintenance_scheduler, start_maintenance_scheduler
+
+# Import the expired-session sweeper
+from session_sweeper import session_sweeper, start_session_sweeper
+
+# Import streaming data exports
+from exports import stream_export, EXPORT_FORMATS, EXPORT_DATASETS
+
 # Import PDF report generator
 from reports import generate_system_pdf, generate_network_pdf, generate_full_pdf
 
@@ -35,7 +52,7 @@ from reports import generate_system_pdf, generate_network_pdf, generate_full_pdf
 from auth import (
     init_auth_db, authenticate, create_session, validate_session, invalidate_session,
     create_user, get_user_by_id, get_all_users, update_user, delete_user, change_password,
-    login_required, admin_required, get_current_user, ROLES
+    login_required, admin_required, get_current_user, ROLES, PasswordHasherBusy, LoginThrottled
 )
 
 # Import API documentation
@@ -56,6 +73,15 @@ CORS(app)
 init_db()
 init_auth_db()
 
+# Audit events are committed in batches off the request thread
+start_audit_writer()
+
+# ANALYZE, incremental vacuum and WAL checkpoints run when the machine is idle
+start_maintenance_scheduler()
+
+# Expired sessions are deleted in small batches on a schedule
+start_session_sweeper()
+
 # Initialize WebSocket (optional)
 try:
     from realtime import init_socketio, start_monitoring
@@ -74,14 +100,34 @@ except:
 # ==================== UTILITY FUNCTIONS ====================
 
 def add_audit_log(action, details, user="System"):
-    """Add an entry to the audit log (wrapper for database function)"""
+    """Add an entry to the audit log (queued for the background writer when it is running)"""
+    write = enqueue_audit_log if audit_writer.running else db_add_audit_log
     try:
         ip_address = request.remote_addr if request else None
         user_agent = request.user_agent.string if request and request.user_agent else None
-        db_add_audit_log(action, details, user, ip_address, user_agent)
+        write(action, details, user, ip_address, user_agent)
     except:
         # Fallback if request context is not available
-        db_add_audit_log(action, details, user)
+        write(action, details, user)
+
+# Largest page /api/tickets and /api/audit-logs return; larger limits are clamped
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 500))
+
+def page_limit(default=100):
+    """The ?limit= of a list request, at most PAGE_SIZE_MAX; raises ValueError unless positive"""
+    limit = request.args.get('limit', default, type=int)
+    if limit <= 0:
+        raise ValueError("'limit' must be a positive integer")
+    return min(limit, PAGE_SIZE_MAX)
+
+def json_list_response(data_json, **fields):
+    """Success response around a list already encoded as JSON by the database
+    
+    The rows go straight into the body instead of through dicts and jsonify,
+    and the envelope is sent around them in pieces so the list is not copied.
+    """
+    extra = ''.join(f',{json.dumps(key)}:{json.dumps(value)}' for key, value in fields.items())
+    return app.response_class(['{"status":"success","data":', data_json, extra + '}'], mimetype='application/json')
 
 def run_command(command, shell=True):
     """Run a system command and return output"""
@@ -129,7 +175,16 @@ def login():
         if not username or not password:
             return jsonify({"status": "error", "message": "Username and password required"}), 400
         
-        user, error = authenticate(username, password)
+        try:
+            user, error = authenticate(username, password, ip_address=request.remote_addr)
+        except LoginThrottled as e:
+            response = jsonify({"status": "error", "message": str(e)})
+            response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+            return response, 429
+        except PasswordHasherBusy as e:
+            response = jsonify({"status": "error", "message": str(e)})
+            response.headers['Retry-After'] = '1'
+            return response, 503
         if error:
             add_audit_log("Login Failed", f"Failed login attempt for {username}")
             return jsonify({"status": "error", "message": error}), 401
@@ -187,6 +242,9 @@ def logout():
 def get_me():
     """Get current user info"""
     user = get_current_user()
+    if user and 'email' not in user:
+        # Signed session tokens carry only the id, username and role
+        user = get_user_by_id(user['id'])
     if not user:
         return jsonify({"status": "error", "message": "Not authenticated"}), 401
     
@@ -205,8 +263,7 @@ def get_me():
 @admin_required
 def list_users():
     """List all users (admin only)"""
-    users = get_all_users()
-    return jsonify({"status": "success", "data": users})
+    return json_list_response(get_all_users(as_json=True))
 
 @app.route('/api/auth/users', methods=['POST'])
 @admin_required
@@ -871,10 +928,15 @@ def get_error_logs():
 
 @app.route('/api/tickets', methods=['GET'])
 def get_tickets_route():
-    """Get all tickets"""
+    """Get tickets, newest first, one keyset page at a time"""
     status = request.args.get('status', None)
-    tickets = get_all_tickets(status_filter=status)
-    return jsonify({"status": "success", "data": tickets})
+    cursor = request.args.get('cursor', None)
+    try:
+        limit = page_limit()
+        tickets, next_cursor = get_tickets_page(status_filter=status, limit=limit, cursor=cursor, as_json=True)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return json_list_response(tickets, next_cursor=next_cursor)
 
 @app.route('/api/tickets/stats', methods=['GET'])
 def get_tickets_stats():
@@ -882,6 +944,26 @@ def get_tickets_stats():
     stats = get_ticket_stats()
     return jsonify({"status": "success", "data": stats})
 
+@app.route('/api/admin/ticket-counters/reconcile', methods=['POST'])
+@admin_required
+def reconcile_ticket_counters_route():
+    """Rebuild the ticket counters behind /api/tickets/stats and report drift (admin only)"""
+    drift = reconcile_ticket_counters()
+    add_audit_log("Maintenance", f"Ticket counters reconciled: {len(drift)} drifted")
+    return jsonify({"status": "success", "data": {"drift": drift}})
+
+@app.route('/api/tickets/search', methods=['GET'])
+def search_tickets_route():
+    """Full-text search over tickets, best matches first"""
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    status = request.args.get('status', None)
+    try:
+        results = search_tickets(query, limit=limit, status_filter=status)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", "data": results})
+
 @app.route('/api/tickets', methods=['POST'])
 def create_ticket_route():
     """Create a new ticket"""
@@ -895,12 +977,63 @@ def create_ticket_route():
             "status": "open",
             "created_by": data.get("user", "Anonymous")
         })
-        add_audit_log("Ticket", f"Ticket {ticket_id[:8].upper()} created")
+        add_audit_log("Ticket", f"Ticket {display_id(ticket_id)} created")
         ticket = get_ticket_by_id(ticket_id)
         return jsonify({"status": "success", "data": ticket})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)})
 
+# Largest number of tickets accepted by one bulk import request
+TICKET_BULK_MAX = int(os.environ.get('TICKET_BULK_MAX', 50000))
+
+def _parse_bulk_tickets():
+    """Parse a bulk import body (JSON array or NDJSON) into [(index, ticket)] and {index: error}"""
+    if 'ndjson' in (request.content_type or ''):
+        tickets, errors = [], {}
+        lines = request.get_data(as_text=True).splitlines()
+        for index, line in enumerate(line for line in lines if line.strip()):
+            try:
+                tickets.append((index, json.loads(line)))
+            except ValueError as e:
+                errors[index] = f"Invalid JSON: {e}"
+        return tickets, errors
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array or NDJSON (application/x-ndjson) body")
+    return list(enumerate(data)), {}
+
+@app.route('/api/tickets/bulk', methods=['POST'])
+@login_required
+def bulk_create_tickets_route():
+    """Import many tickets at once from a JSON array or NDJSON body"""
+    try:
+        tickets, errors = _parse_bulk_tickets()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if len(tickets) + len(errors) > TICKET_BULK_MAX:
+        return jsonify({"status": "error", "message": f"At most {TICKET_BULK_MAX} tickets per request"}), 413
+    
+    user = request.current_user.get('username', 'Anonymous')
+    for _, ticket in tickets:
+        if isinstance(ticket, dict):
+            ticket.setdefault('created_by', ticket.pop('user', user))
+    
+    results = create_tickets_bulk([ticket for _, ticket in tickets])
+    for (index, _), result in zip(tickets, results):
+        result['index'] = index
+    results.extend({"index": index, "status": "error", "message": message} for index, message in errors.items())
+    results.sort(key=lambda result: result['index'])
+    
+    created = sum(1 for result in results if result['status'] == 'created')
+    add_audit_log("Ticket", f"Bulk import: {created} tickets created, {len(results) - created} rejected",
+                  user=user)
+    return jsonify({"status": "success", "data": {
+        "created": created,
+        "failed": len(results) - created,
+        "results": results
+    }})
+
 @app.route('/api/tickets/<ticket_id>', methods=['PUT'])
 def update_ticket_route(ticket_id):
     """Update a ticket"""
@@ -912,7 +1045,7 @@ def update_ticket_route(ticket_id):
             'resolution': data.get('resolution')
         })
         if success:
-            add_audit_log("Ticket", f"Ticket {ticket_id[:8].upper()} updated")
+            add_audit_log("Ticket", f"Ticket {display_id(ticket_id)} updated")
             ticket = get_ticket_by_id(ticket_id)
             return jsonify({"status": "success", "data": ticket})
         return jsonify({"status": "error", "message": "Ticket not found"})
@@ -925,7 +1058,7 @@ def delete_ticket_route(ticket_id):
     try:
         success = delete_ticket(ticket_id)
         if success:
-            add_audit_log("Ticket", f"Ticket {ticket_id[:8].upper()} deleted")
+            add_audit_log("Ticket", f"Ticket {display_id(ticket_id)} deleted")
             return jsonify({"status": "success", "message": "Ticket deleted"})
         return jsonify({"status": "error", "message": "Ticket not found"})
     except Exception as e:
@@ -991,11 +1124,96 @@ def get_device_inventory():
 
 @app.route('/api/audit-logs')
 def get_audit_logs_route():
-    """Get audit logs"""
-    limit = request.args.get('limit', 100, type=int)
+    """Get audit logs, newest first, one keyset page at a time"""
     action_filter = request.args.get('action', None)
-    logs = get_audit_logs(limit=limit, action_filter=action_filter)
-    return jsonify({"status": "success", "data": logs})
+    cursor = request.args.get('cursor', None)
+    search = request.args.get('q', None)
+    since = request.args.get('since', None)
+    until = request.args.get('until', None)
+    include_archived = request.args.get('archived', 'false').lower() == 'true'
+    try:
+        limit = page_limit()
+        logs, next_cursor = get_audit_logs_page(
+            limit=limit, action_filter=action_filter, cursor=cursor,
+            search=search, since=since, until=until, include_archived=include_archived, as_json=True
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return json_list_response(logs, next_cursor=next_cursor)
+
+@app.route('/api/admin/audit-writer')
+@admin_required
+def get_audit_writer_stats():
+    """Get background audit writer queue depth and lost-event counters (admin only)"""
+    return jsonify({"status": "success", "data": audit_writer.stats()})
+
+# ==================== QUERY STATISTICS ====================
+
+@app.route('/api/admin/query-stats')
+@admin_required
+def get_query_stats_route():
+    """Get the slowest statements by total time, and the slow-query log (admin only)"""
+    limit = max(request.args.get('limit', 20, type=int), 1)
+    sort = request.args.get('sort', 'total_ms')
+    try:
+        statements = query_stats.top(limit, sort)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({
+        "status": "success",
+        "data": {
+            "statements": statements,
+            "slow_queries": query_stats.slow_queries(limit),
+            "slow_query_ms": query_stats.slow_query_ms
+        }
+    })
+
+@app.route('/api/admin/query-stats/reset', methods=['POST'])
+@admin_required
+def reset_query_stats_route():
+    """Discard collected query statistics (admin only)"""
+    query_stats.reset()
+    return jsonify({"status": "success", "message": "Query statistics reset"})
+
+# ==================== DATABASE MAINTENANCE ====================
+
+@app.route('/api/admin/maintenance')
+@admin_required
+def get_maintenance_route():
+    """Get maintenance run history and scheduler state (admin only)"""
+    limit = max(request.args.get('limit', 50, type=int), 1)
+    return jsonify({
+        "status": "success",
+        "data": {"scheduler": maintenance_scheduler.stats(), "runs": get_maintenance_history(limit)}
+    })
+
+@app.route('/api/admin/maintenance/run', methods=['POST'])
+@admin_required
+def run_maintenance_route():
+    """Run database maintenance now, regardless of load (admin only)"""
+    try:
+        run = maintenance_scheduler.run_now(trigger='admin')
+        add_audit_log("Maintenance", f"Database maintenance run, {run['bytes_reclaimed']:,} bytes reclaimed")
+        return jsonify({"status": "success", "data": run})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/admin/session-sweeper')
+@admin_required
+def get_session_sweeper_stats():
+    """Get expired-session sweeper totals and the latest sweep (admin only)"""
+    return jsonify({"status": "success", "data": session_sweeper.stats()})
+
+@app.route('/api/admin/session-sweeper/run', methods=['POST'])
+@admin_required
+def run_session_sweep_route():
+    """Delete expired sessions now (admin only)"""
+    try:
+        result = session_sweeper.sweep_now()
+        add_audit_log("Session Sweep", f"Removed {result['sessions']:,} expired sessions")
+        return jsonify({"status": "success", "data": result})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
 # ==================== PDF REPORTS ====================
 
@@ -1097,6 +1315,32 @@ def generate_excel_network():
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)})
 
+# ==================== DATA EXPORT ====================
+
+@app.route('/api/export/<dataset>')
+@login_required
+def export_dataset(dataset):
+    """Stream tickets, audit logs or devices as NDJSON or CSV, oldest first"""
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({"status": "error", "message": f"Unknown export '{dataset}'"}), 404
+    fmt = request.args.get('format', 'ndjson').lower()
+    filters = {'since': request.args.get('since', None), 'until': request.args.get('until', None)}
+    if dataset == 'tickets':
+        filters['status_filter'] = request.args.get('status', None)
+    elif dataset == 'audit-logs':
+        filters['include_archived'] = request.args.get('archived', 'false').lower() == 'true'
+    try:
+        chunks = stream_export(dataset, fmt, **filters)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    add_audit_log("Export", f"{dataset} exported as {fmt}")
+    filename = f'{dataset}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{fmt}'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 # ==================== REPORTS ====================
 
 @app.route('/api/reports/generate')
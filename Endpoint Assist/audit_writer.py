@@ -0,0 +1,200 @@
+"""
+Endpoint Assist - Audit Log Writer
+Background group-commit writer so requests do not pay for an audit INSERT + COMMIT
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from background import BackgroundWorker
+from database import insert_audit_logs, new_id
+
+# Writer configuration
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_FLUSH_INTERVAL_MS = int(os.environ.get('AUDIT_FLUSH_INTERVAL_MS', 200))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+AUDIT_QUEUE_POLICY = os.environ.get('AUDIT_QUEUE_POLICY', 'block')
+AUDIT_SAMPLE_RATE = float(os.environ.get('AUDIT_SAMPLE_RATE', 0.1))
+AUDIT_BLOCK_TIMEOUT = float(os.environ.get('AUDIT_BLOCK_TIMEOUT', 1.0))
+
+QUEUE_POLICIES = ('block', 'drop', 'sample')
+
+
+class _FlushMarker:
+    """Queue item that is signalled once everything queued before it is written"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AuditLogWriter(BackgroundWorker):
+    """Background writer that commits queued audit events in batches
+    
+    Events are written with one executemany() per batch, every
+    flush_interval_ms or as soon as batch_size events are waiting. When the
+    queue is full the policy decides what happens: 'block' waits up to
+    block_timeout for room, 'drop' discards the event, and 'sample' keeps a
+    sample_rate fraction (waiting for room) and discards the rest.
+    """
+    
+    thread_name = 'audit-writer'
+    label = '📝 Audit log writer'
+    
+    def __init__(self, queue_size=AUDIT_QUEUE_SIZE, flush_interval_ms=AUDIT_FLUSH_INTERVAL_MS,
+                 batch_size=AUDIT_BATCH_SIZE, policy=AUDIT_QUEUE_POLICY,
+                 sample_rate=AUDIT_SAMPLE_RATE, block_timeout=AUDIT_BLOCK_TIMEOUT):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown audit queue policy '{policy}'")
+        super().__init__({
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'dropped': 0,
+            'sampled_out': 0,
+            'failed': 0
+        })
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.policy = policy
+        self.sample_rate = sample_rate
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+    
+    def enqueue(self, action, details, user="System", ip_address=None, user_agent=None):
+        """Queue an audit event, returning its id or None if the event was discarded"""
+        log_id = new_id()
+        # Same format as the column's CURRENT_TIMESTAMP default, captured at request time
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        entry = (log_id, timestamp, action, details, user, ip_address, user_agent)
+        
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            if not self._put_when_full(entry):
+                return None
+        
+        self._count('enqueued')
+        return log_id
+    
+    def flush(self, timeout=5):
+        """Block until every event queued so far has been written"""
+        if not self.running:
+            return False
+        marker = _FlushMarker()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+    
+    def stats(self):
+        """Get queue depth and event counters"""
+        counters = super().stats()
+        counters['lost'] = counters['dropped'] + counters['sampled_out'] + counters['failed']
+        counters['queue_depth'] = self._queue.qsize()
+        counters['queue_size'] = self.queue_size
+        counters['policy'] = self.policy
+        return counters
+    
+    def _put_when_full(self, entry):
+        """Apply the full-queue policy, returning whether the event was queued"""
+        if self.policy == 'drop':
+            self._count('dropped')
+            return False
+        
+        if self.policy == 'sample' and random.random() >= self.sample_rate:
+            self._count('sampled_out')
+            return False
+        
+        try:
+            self._queue.put(entry, timeout=self.block_timeout)
+            return True
+        except queue.Full:
+            self._count('dropped')
+            return False
+    
+    def _on_stop(self, timeout):
+        """Write everything queued before stopping"""
+        self.flush(timeout=timeout)
+    
+    def _loop(self):
+        """Collect events into batches and commit them"""
+        while self.running:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            
+            batch = []
+            markers = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, _FlushMarker):
+                    # Write what is pending before signalling the flush
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            self._write(batch)
+            for marker in markers:
+                marker.done.set()
+        
+        # Events queued while stopping still get written
+        self._drain()
+    
+    def _drain(self):
+        """Write everything left in the queue"""
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _FlushMarker):
+                item.done.set()
+            else:
+                batch.append(item)
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+    
+    def _write(self, batch):
+        """Commit one batch in a single transaction"""
+        if not batch:
+            return
+        try:
+            insert_audit_logs(batch)
+            self._count('written', len(batch))
+            self._count('batches')
+        except Exception as e:
+            self._count('failed', len(batch))
+            print(f"Audit writer error: {e}")
+
+
+# Global writer instance
+audit_writer = AuditLogWriter()
+
+def start_audit_writer():
+    """Start the background audit log writer"""
+    audit_writer.start()
+
+def stop_audit_writer():
+    """Flush and stop the background audit log writer"""
+    audit_writer.stop()
+
+def enqueue_audit_log(action, details, user="System", ip_address=None, user_agent=None):
+    """Queue an audit event for the background writer"""
+    return audit_writer.enqueue(action, details, user, ip_address, user_agent)
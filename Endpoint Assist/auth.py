@@ -3,16 +3,91 @@ Endpoint Assist - Authentication Module
 Simple authentication system with role-based access control
 """
 
+import base64
 import hashlib
+import hmac
+import json
+import math
+import os
 import secrets
 import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from flask import request, jsonify, session
-from database import get_db_connection, init_db
+from database import get_db_connection, get_storage_backend, init_db, migrate_db, json_object_sql
 import sqlite3
 
+# Seconds a validated session is trusted without reading user_sessions again (0 disables the cache)
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', 5))
+# Most validated sessions kept; the least recently used are dropped first
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 4096))
+
+# 'database' stores sessions in user_sessions; 'signed' issues HMAC-signed tokens
+# that validate without the database
+SESSION_TOKEN_MODE = os.environ.get('SESSION_TOKEN_MODE', 'database')
+# Shared by every worker that validates signed tokens
+SESSION_SIGNING_KEY = os.environ.get('SESSION_SIGNING_KEY') or os.environ.get('SECRET_KEY')
+# Longest signed token lifetime, which is also how long revocations are kept
+SESSION_TOKEN_MAX_HOURS = float(os.environ.get('SESSION_TOKEN_MAX_HOURS', 168))
+# Seconds between reads of revocations recorded by other workers
+SESSION_REVOCATION_SYNC_INTERVAL = float(os.environ.get('SESSION_REVOCATION_SYNC_INTERVAL', 5))
+# Revoked tokens the filter is sized for before it is rebuilt from the table
+SESSION_REVOCATION_CAPACITY = int(os.environ.get('SESSION_REVOCATION_CAPACITY', 100000))
+
+# scrypt cost; each doubling of N doubles the time and memory (128 * N * r bytes) per hash
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', 1))
+# Hashes computed at once (default half the CPUs) and how many more may wait for one
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+# Seconds a request waits for a place in the queue before it is turned away
+PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 5))
+
+# Login attempts per minute, and bursts, allowed per client address and per username (0 disables)
+LOGIN_IP_RATE = float(os.environ.get('LOGIN_IP_RATE', 30))
+LOGIN_IP_BURST = int(os.environ.get('LOGIN_IP_BURST', 10))
+LOGIN_USER_RATE = float(os.environ.get('LOGIN_USER_RATE', 10))
+LOGIN_USER_BURST = int(os.environ.get('LOGIN_USER_BURST', 5))
+# Addresses and usernames tracked at once; the least recently seen are forgotten first
+LOGIN_THROTTLE_MAX_KEYS = int(os.environ.get('LOGIN_THROTTLE_MAX_KEYS', 10000))
+# Failed logins before the account is locked in the database, and for how long
+LOGIN_LOCKOUT_THRESHOLD = int(os.environ.get('LOGIN_LOCKOUT_THRESHOLD', 5))
+LOGIN_LOCKOUT_MINUTES = float(os.environ.get('LOGIN_LOCKOUT_MINUTES', 15))
+
+# Expired sessions deleted per transaction, and the pause between transactions
+SESSION_SWEEP_BATCH_SIZE = int(os.environ.get('SESSION_SWEEP_BATCH_SIZE', 500))
+SESSION_SWEEP_PAUSE = float(os.environ.get('SESSION_SWEEP_PAUSE', 0.01))
+
 # ==================== DATABASE SETUP ====================
 
+# Schema upgrades for the authentication tables, recorded in schema_migrations
+# under the 'auth' component (see database.migrate_db)
+AUTH_MIGRATIONS = [
+    ('session indexes', [
+        # Expiry sweeps and per-user invalidation
+        'CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions (expires_at)',
+        'CREATE INDEX IF NOT EXISTS idx_user_sessions_user ON user_sessions (user_id)'
+    ]),
+    ('signed token revocations', [
+        # A row revokes one token (jti), or every token of user_id issued up to
+        # not_before (µs since the epoch); it can go once those tokens expire
+        '''CREATE TABLE IF NOT EXISTS session_revocations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            jti TEXT,
+            user_id INTEGER,
+            not_before INTEGER,
+            expires_at TIMESTAMP NOT NULL,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_session_revocations_jti ON session_revocations (jti)',
+        'CREATE INDEX IF NOT EXISTS idx_session_revocations_expires ON session_revocations (expires_at)'
+    ])
+]
+
 def init_auth_db():
     """Initialize authentication tables"""
     with get_db_connection() as conn:
@@ -49,6 +124,9 @@ def init_auth_db():
             )
         ''')
         
+        conn.commit()
+        migrate_db(conn, AUTH_MIGRATIONS, component='auth')
+        
         # Create default admin user if not exists
         cursor.execute('SELECT COUNT(*) FROM users WHERE username = ?', ('admin',))
         if cursor.fetchone()[0] == 0:
@@ -63,21 +141,89 @@ def init_auth_db():
 
 # ==================== PASSWORD UTILITIES ====================
 
+class PasswordHasherBusy(Exception):
+    """Raised when every password hashing slot stays taken for PASSWORD_HASH_WAIT seconds"""
+
+class PasswordHasher:
+    """Bounded executor for password hashing
+    
+    A KDF costs tens of milliseconds of CPU and megabytes of memory per hash.
+    Running it on the request thread would let a login burst take every
+    worker and CPU. Hashes run on `workers` threads instead (scrypt releases
+    the GIL). At most queue_size more wait their turn; later callers wait up
+    to `wait` seconds for a place and then get PasswordHasherBusy.
+    """
+    
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, queue_size=PASSWORD_HASH_QUEUE, wait=PASSWORD_HASH_WAIT):
+        self.workers = workers
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self.stats = {'hashed': 0, 'failed': 0, 'rejected': 0}
+    
+    def run(self, fn, *args):
+        """Run fn(*args) on a hashing thread and wait for its result"""
+        if not self._slots.acquire(timeout=self.wait):
+            self.stats['rejected'] += 1
+            raise PasswordHasherBusy("Too many logins in progress, try again shortly")
+        try:
+            result = self._executor.submit(fn, *args).result()
+        except Exception:
+            self.stats['failed'] += 1
+            raise
+        finally:
+            self._slots.release()
+        self.stats['hashed'] += 1
+        return result
+
+# Global password hasher
+password_hasher = PasswordHasher()
+
+def _scrypt(password, salt, n, r, p):
+    """scrypt digest of a password as hex"""
+    return hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=32).hex()
+
 def hash_password(password):
-    """Hash a password using SHA-256 with salt"""
+    """Hash a password with scrypt at the configured cost
+    
+    Stored as scrypt$N$r$p$salt$hash, so hashes made at an older cost still
+    verify and needs_rehash() can tell them apart.
+    """
     salt = secrets.token_hex(16)
-    hash_obj = hashlib.sha256((password + salt).encode())
-    return f"{salt}${hash_obj.hexdigest()}"
+    n, r, p = PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P
+    return f"scrypt${n}${r}${p}${salt}${password_hasher.run(_scrypt, password, salt, n, r, p)}"
 
 def verify_password(password, password_hash):
-    """Verify a password against its hash"""
+    """Verify a password against its hash (scrypt, or a legacy salted SHA-256)"""
     try:
-        salt, hash_value = password_hash.split('$')
-        hash_obj = hashlib.sha256((password + salt).encode())
-        return hash_obj.hexdigest() == hash_value
-    except:
+        parts = password_hash.split('$')
+        if parts[0] == 'scrypt':
+            _, n, r, p, salt, hash_value = parts
+            computed = password_hasher.run(_scrypt, password, salt, int(n), int(r), int(p))
+        else:
+            salt, hash_value = parts
+            computed = hashlib.sha256((password + salt).encode()).hexdigest()
+        return hmac.compare_digest(computed, hash_value)
+    except (ValueError, TypeError, AttributeError):
         return False
 
+# Hash of a random password per cost, checked against for unknown usernames
+_dummy_hashes = {}
+
+def _dummy_password_hash():
+    """A hash at the configured cost that no password matches"""
+    cost = (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    if cost not in _dummy_hashes:
+        _dummy_hashes[cost] = hash_password(secrets.token_urlsafe(32))
+    return _dummy_hashes[cost]
+
+def needs_rehash(password_hash):
+    """Whether a hash is legacy SHA-256 or scrypt at a different cost than configured"""
+    return not password_hash.startswith(
+        f"scrypt${PASSWORD_SCRYPT_N}${PASSWORD_SCRYPT_R}${PASSWORD_SCRYPT_P}$"
+    )
+
 def generate_token():
     """Generate a secure session token"""
     return secrets.token_urlsafe(32)
@@ -115,11 +261,20 @@ def get_user_by_id(user_id):
         row = cursor.fetchone()
         return dict(row) if row else None
 
-def get_all_users():
-    """Get all users (without password hashes)"""
+USER_LIST_COLUMNS = ['id', 'username', 'email', 'full_name', 'role', 'is_active', 'created_at', 'last_login']
+
+def get_all_users(as_json=False):
+    """Get all users (without password hashes)
+    
+    With as_json the users are returned as a JSON array string encoded by SQLite.
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT id, username, email, full_name, role, is_active, created_at, last_login FROM users ORDER BY created_at DESC')
+        if as_json:
+            cursor.row_factory = None
+            cursor.execute(f"SELECT {json_object_sql(conn, 'users', USER_LIST_COLUMNS)} FROM users ORDER BY created_at DESC")
+            return '[' + ','.join(row[0] for row in cursor.fetchall()) + ']'
+        cursor.execute(f"SELECT {', '.join(USER_LIST_COLUMNS)} FROM users ORDER BY created_at DESC")
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
 
@@ -133,11 +288,19 @@ def update_user(user_id, **kwargs):
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute('SELECT role, is_active FROM users WHERE id = ?', (user_id,))
+        current = cursor.fetchone()
         fields = ', '.join(f'{k} = ?' for k in updates.keys())
         values = list(updates.values()) + [user_id]
         cursor.execute(f'UPDATE users SET {fields} WHERE id = ?', values)
         conn.commit()
-        return cursor.rowcount > 0
+    # Cached sessions and signed tokens carry the role and is_active flag;
+    # signed tokens are only revoked when one of them actually changes
+    session_cache.evict_user(user_id)
+    if current and (updates.get('role', current['role']) != current['role']
+                    or (current['is_active'] and not updates.get('is_active', 1))):
+        revocation_filter.revoke_user(user_id)
+    return cursor.rowcount > 0
 
 def change_password(user_id, new_password):
     """Change user password"""
@@ -155,21 +318,319 @@ def delete_user(user_id):
         cursor.execute('DELETE FROM user_sessions WHERE user_id = ?', (user_id,))
         cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
         conn.commit()
-        return cursor.rowcount > 0
+    session_cache.evict_user(user_id)
+    revocation_filter.revoke_user(user_id)
+    return cursor.rowcount > 0
 
 # ==================== SESSION MANAGEMENT ====================
 
-def create_session(user_id, ip_address=None, user_agent=None, expires_hours=24):
-    """Create a new session for a user"""
-    token = generate_token()
-    expires_at = datetime.now() + timedelta(hours=expires_hours)
+class SessionCache:
+    """Bounded LRU cache of validated sessions with a short time-to-live
+    
+    Every protected request validates its token, so repeat requests are
+    answered from here instead of joining user_sessions and users again. An
+    entry is trusted for at most ttl seconds and never past the session's own
+    expiry. Invalidations in this process evict at once; changes made by other
+    processes are seen within ttl.
+    """
+    
+    def __init__(self, ttl=SESSION_CACHE_TTL, max_size=SESSION_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # token -> (user, valid until, database)
+        self._generation = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    @property
+    def enabled(self):
+        """Whether sessions are cached at all"""
+        return self.ttl > 0 and self.max_size > 0
+    
+    def get(self, token):
+        """Get the cached user for a token, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            user, valid_until, database = entry
+            if time.time() >= valid_until or database != get_storage_backend().location():
+                del self._entries[token]
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(token)
+            self.stats['hits'] += 1
+            return dict(user)
+    
+    def generation(self):
+        """Eviction counter, read before loading a session for put()"""
+        return self._generation
+    
+    def put(self, token, user, expires_at, generation):
+        """Cache a validated session unless something was evicted since generation was read
+        
+        The check stops a validation that raced an invalidation from caching
+        the session it read before the delete.
+        """
+        if not self.enabled:
+            return
+        valid_until = min(time.time() + self.ttl, expires_at.timestamp())
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[token] = (dict(user), valid_until, get_storage_backend().location())
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def evict(self, token):
+        """Drop one session"""
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(token, None) is not None:
+                self.stats['evictions'] += 1
+    
+    def evict_user(self, user_id):
+        """Drop every session of a user"""
+        with self._lock:
+            self._generation += 1
+            for token in [t for t, entry in self._entries.items() if entry[0]['id'] == user_id]:
+                del self._entries[token]
+                self.stats['evictions'] += 1
+    
+    def clear(self):
+        """Drop every session"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+    
+    def __len__(self):
+        """Number of cached sessions"""
+        return len(self._entries)
+
+# Global session cache
+session_cache = SessionCache()
+
+# ==================== SIGNED TOKENS ====================
+
+SIGNED_TOKEN_PREFIX = 's1.'
+
+if SESSION_SIGNING_KEY:
+    _signing_key = SESSION_SIGNING_KEY.encode()
+else:
+    _signing_key = secrets.token_bytes(32)
+    if SESSION_TOKEN_MODE == 'signed':
+        print("⚠️ SESSION_SIGNING_KEY is not set; signed tokens will not survive a restart or validate in other workers")
+
+def _b64encode(data):
+    """Unpadded URL-safe base64"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def _token_signature(signed_part):
+    """HMAC-SHA256 of the prefix and payload of a signed token"""
+    return _b64encode(hmac.digest(_signing_key, signed_part.encode(), 'sha256'))
+
+def issue_signed_token(user, expires_at):
+    """Create a signed token carrying the user's id, username and role
+    
+    The token is 's1.' + base64 JSON claims + '.' + signature. iat is in
+    microseconds so revoke_user() can cut off tokens issued before a given
+    moment without catching a login right after it.
+    """
+    claims = {
+        'uid': user['id'],
+        'usr': user['username'],
+        'role': user['role'],
+        'iat': int(time.time() * 1_000_000),
+        'exp': int(expires_at.timestamp()),
+        'jti': secrets.token_urlsafe(12)
+    }
+    signed_part = SIGNED_TOKEN_PREFIX + _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f"{signed_part}.{_token_signature(signed_part)}"
+
+def decode_signed_token(token):
+    """Get the claims of a signed token, or None if it is malformed or its signature is wrong
+    
+    Expiry and revocation are not checked (see validate_session()).
+    """
+    signed_part, _, signature = token.rpartition('.')
+    if not signed_part.startswith(SIGNED_TOKEN_PREFIX):
+        return None
+    if not hmac.compare_digest(signature.encode(), _token_signature(signed_part).encode()):
+        return None
+    payload = signed_part[len(SIGNED_TOKEN_PREFIX):]
+    try:
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except ValueError:
+        return None
+
+def _validate_signed_token(token):
+    """Validate a signed token from its claims and the revocation filter alone"""
+    claims = decode_signed_token(token)
+    if claims is None or time.time() >= claims['exp']:
+        return None
+    if revocation_filter.is_revoked(claims['jti'], claims['uid'], claims['iat']):
+        return None
+    return {
+        'id': claims['uid'],
+        'username': claims['usr'],
+        'role': claims['role'],
+        'is_active': 1,
+        'expires_at': datetime.fromtimestamp(claims['exp']).isoformat()
+    }
+
+class RevocationFilter:
+    """Revoked signed tokens, held in memory and synced from session_revocations
+    
+    Revoked token ids go into a Bloom filter, so the check for a token that
+    was never revoked costs a few hashes. A filter hit is confirmed against
+    the table, so false positives never reject a valid token. Per-user
+    cut-offs (disabled or deleted users, invalidate_all_sessions) are few and
+    kept exactly. Revocations made by other workers are read at most every
+    sync_interval seconds. The filter is rebuilt from the table after
+    capacity revocations, once expired rows have been purged.
+    """
+    
+    def __init__(self, capacity=SESSION_REVOCATION_CAPACITY, sync_interval=SESSION_REVOCATION_SYNC_INTERVAL,
+                 error_rate=0.001):
+        self.capacity = capacity
+        self.sync_interval = sync_interval
+        self.bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._lock = threading.Lock()
+        self.stats = {'checks': 0, 'filter_hits': 0, 'false_positives': 0, 'syncs': 0}
+        self._reset()
+    
+    def _reset(self):
+        """Empty the filter so the next sync reloads every revocation"""
+        self._filter = bytearray((self.bits + 7) // 8)
+        self._users = {}  # user_id -> not_before (µs)
+        self._added = 0
+        self._last_id = 0
+        self._synced = float('-inf')
+        self._database = None
+    
+    def _positions(self, jti):
+        """Filter bit positions for a token id (double hashing of one digest)"""
+        digest = int.from_bytes(hashlib.blake2b(jti.encode(), digest_size=16).digest(), 'little')
+        h1, h2 = digest >> 64, digest & 0xFFFFFFFFFFFFFFFF | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+    
+    def _contains(self, jti):
+        """Whether a token id may have been added (caller holds the lock)"""
+        bloom = self._filter
+        for position in self._positions(jti):
+            if not bloom[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+    
+    def _add(self, jti, user_id, not_before):
+        """Record one revocation locally (caller holds the lock)"""
+        if jti is not None:
+            for position in self._positions(jti):
+                self._filter[position >> 3] |= 1 << (position & 7)
+            self._added += 1
+        else:
+            self._users[user_id] = max(self._users.get(user_id, 0), not_before)
+    
+    def is_revoked(self, jti, user_id, issued_at):
+        """Whether a token has been revoked, by id or by a cut-off for its user"""
+        self.sync()
+        with self._lock:
+            self.stats['checks'] += 1
+            if issued_at <= self._users.get(user_id, -1):
+                return True
+            if not self._contains(jti):
+                return False
+            self.stats['filter_hits'] += 1
+        
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT 1 FROM session_revocations WHERE jti = ?', (jti,)).fetchone()
+        if row is None:
+            self.stats['false_positives'] += 1
+        return row is not None
+    
+    def sync(self, force=False):
+        """Load revocations recorded since the last sync, when one is due"""
+        now = time.monotonic()
+        database = get_storage_backend().location()
+        with self._lock:
+            if not force and database == self._database and now - self._synced < self.sync_interval:
+                return
+            if database != self._database or self._added > self.capacity:
+                self._reset()
+            with get_db_connection() as conn:
+                # The table was cleared or recreated (e.g. a reset test database)
+                newest = conn.execute('SELECT MAX(id) FROM session_revocations').fetchone()[0] or 0
+                if newest < self._last_id:
+                    self._reset()
+                rows = conn.execute(
+                    'SELECT id, jti, user_id, not_before FROM session_revocations WHERE id > ? ORDER BY id',
+                    (self._last_id,)
+                ).fetchall()
+            for row in rows:
+                self._add(row['jti'], row['user_id'], row['not_before'])
+                self._last_id = row['id']
+            self._database = database
+            self._synced = now
+            self.stats['syncs'] += 1
+    
+    def revoke_token(self, jti, user_id, expires_at):
+        """Revoke one signed token until it expires (expires_at is seconds since the epoch)"""
+        self._record(jti, user_id, None, datetime.fromtimestamp(expires_at))
+    
+    def revoke_user(self, user_id):
+        """Revoke every signed token issued to a user so far"""
+        self._record(None, user_id, int(time.time() * 1_000_000),
+                     datetime.now() + timedelta(hours=SESSION_TOKEN_MAX_HOURS))
+    
+    def _record(self, jti, user_id, not_before, expires_at):
+        """Store a revocation for every worker and apply it here at once"""
+        with get_db_connection() as conn:
+            conn.execute(
+                'INSERT INTO session_revocations (jti, user_id, not_before, expires_at) VALUES (?, ?, ?, ?)',
+                (jti, user_id, not_before, expires_at.isoformat())
+            )
+            conn.commit()
+        with self._lock:
+            self._add(jti, user_id, not_before)
+    
+    def clear(self):
+        """Forget local state; the next check reloads it from the table"""
+        with self._lock:
+            self._reset()
+
+# Global revocation filter
+revocation_filter = RevocationFilter()
+
+def create_session(user_id, ip_address=None, user_agent=None, expires_hours=24, mode=None):
+    """Create a new session for a user
+    
+    mode defaults to SESSION_TOKEN_MODE. In 'signed' mode no session row is
+    stored: the token itself carries the user and expiry (capped at
+    SESSION_TOKEN_MAX_HOURS).
+    """
+    mode = mode or SESSION_TOKEN_MODE
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO user_sessions (user_id, token, expires_at, ip_address, user_agent)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, token, expires_at.isoformat(), ip_address, user_agent))
+        if mode == 'signed':
+            cursor.execute('SELECT id, username, role FROM users WHERE id = ?', (user_id,))
+            user = cursor.fetchone()
+            if not user:
+                return None
+            expires_at = datetime.now() + timedelta(hours=min(expires_hours, SESSION_TOKEN_MAX_HOURS))
+            token = issue_signed_token(user, expires_at)
+        else:
+            token = generate_token()
+            expires_at = datetime.now() + timedelta(hours=expires_hours)
+            cursor.execute('''
+                INSERT INTO user_sessions (user_id, token, expires_at, ip_address, user_agent)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, token, expires_at.isoformat(), ip_address, user_agent))
         
         # Update last login
         cursor.execute('UPDATE users SET last_login = ? WHERE id = ?', (datetime.now().isoformat(), user_id))
@@ -178,7 +639,20 @@ def create_session(user_id, ip_address=None, user_agent=None, expires_hours=24):
     return token
 
 def validate_session(token):
-    """Validate a session token and return user info"""
+    """Validate a session token and return user info
+    
+    Signed tokens are checked from their signature and the revocation filter.
+    Other sessions validated in the last SESSION_CACHE_TTL seconds are
+    answered from session_cache without touching the database.
+    """
+    if token.startswith(SIGNED_TOKEN_PREFIX):
+        return _validate_signed_token(token)
+    
+    user = session_cache.get(token)
+    if user is not None:
+        return user
+    
+    generation = session_cache.generation()
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
@@ -204,14 +678,22 @@ def validate_session(token):
         if not user['is_active']:
             return None
         
+        session_cache.put(token, user, expires_at, generation)
         return user
 
 def invalidate_session(token):
     """Invalidate a session"""
+    if token.startswith(SIGNED_TOKEN_PREFIX):
+        claims = decode_signed_token(token)
+        if claims and time.time() < claims['exp']:
+            revocation_filter.revoke_token(claims['jti'], claims['uid'], claims['exp'])
+        return
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM user_sessions WHERE token = ?', (token,))
         conn.commit()
+    session_cache.evict(token)
 
 def invalidate_all_sessions(user_id):
     """Invalidate all sessions for a user"""
@@ -219,22 +701,155 @@ def invalidate_all_sessions(user_id):
         cursor = conn.cursor()
         cursor.execute('DELETE FROM user_sessions WHERE user_id = ?', (user_id,))
         conn.commit()
+    session_cache.evict_user(user_id)
+    revocation_filter.revoke_user(user_id)
 
-def cleanup_expired_sessions():
-    """Remove expired sessions"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM user_sessions WHERE expires_at < ?', (datetime.now().isoformat(),))
-        conn.commit()
-        return cursor.rowcount
+def cleanup_expired_sessions(batch_size=SESSION_SWEEP_BATCH_SIZE, pause=SESSION_SWEEP_PAUSE):
+    """Remove expired sessions and the revocations of expired signed tokens
+    
+    Returns the number of sessions removed (see sweep_expired_sessions()).
+    """
+    return sweep_expired_sessions(batch_size, pause)['sessions']
+
+def sweep_expired_sessions(batch_size=SESSION_SWEEP_BATCH_SIZE, pause=SESSION_SWEEP_PAUSE):
+    """Delete expired sessions and revocations in batches
+    
+    Each batch of batch_size rows is found through the expires_at index and
+    deleted in its own transaction, so the write lock is only held briefly
+    and logins and audit writes run in the pauses between batches. Returns
+    the rows removed from each table and the number of batches.
+    """
+    now = datetime.now().isoformat()
+    result = {'sessions': 0, 'revocations': 0, 'batches': 0}
+    for key, table in (('sessions', 'user_sessions'), ('revocations', 'session_revocations')):
+        while True:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    DELETE FROM {table} WHERE id IN (
+                        SELECT id FROM {table} WHERE expires_at < ? ORDER BY expires_at LIMIT ?
+                    )
+                ''', (now, batch_size))
+                conn.commit()
+            result[key] += cursor.rowcount
+            result['batches'] += 1
+            if cursor.rowcount < batch_size:
+                break
+            time.sleep(pause)
+    return result
+
+# ==================== LOGIN THROTTLING ====================
+
+class LoginThrottled(Exception):
+    """Raised when login attempts from an address or for a username exceed their rate"""
+    
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBuckets:
+    """Token buckets keyed by string, in an LRU table of at most max_keys
+    
+    Each key may spend burst attempts at once and regains rate_per_minute a
+    minute. A forgotten key starts again with a full bucket, the state it
+    would have reached anyway once idle long enough.
+    """
+    
+    def __init__(self, rate_per_minute, burst, max_keys=LOGIN_THROTTLE_MAX_KEYS):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+    
+    def take(self, key, now):
+        """Spend a token for key; returns 0, or the seconds until one is available"""
+        if self.rate <= 0:
+            return 0
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0 if allowed else (1 - tokens) / self.rate
+    
+    def __len__(self):
+        """Number of keys tracked"""
+        return len(self._buckets)
+
+class LoginThrottle:
+    """Per-address and per-username login rate limits, checked before the database
+    
+    Failed attempts are also counted here, so authenticate() only writes to
+    the users table once LOGIN_LOCKOUT_THRESHOLD is reached. Counts are per
+    process, so with several workers an account takes up to the threshold
+    times the number of workers to lock, and each worker applies the rates
+    on its own.
+    """
+    
+    def __init__(self, max_keys=LOGIN_THROTTLE_MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self.stats = {'allowed': 0, 'throttled_ip': 0, 'throttled_user': 0, 'lockouts': 0}
+        self.clear()
+    
+    def check(self, ip_address, username):
+        """Spend an attempt for the address and the username, or raise LoginThrottled"""
+        now = time.monotonic()
+        with self._lock:
+            if ip_address:
+                wait = self._ips.take(ip_address, now)
+                if wait:
+                    self.stats['throttled_ip'] += 1
+                    raise LoginThrottled("Too many login attempts from this address", wait)
+            wait = self._users.take(username.lower(), now)
+            if wait:
+                self.stats['throttled_user'] += 1
+                raise LoginThrottled("Too many login attempts for this account", wait)
+            self.stats['allowed'] += 1
+    
+    def record_failure(self, username):
+        """Count a failed login; returns the failures since the last success or lockout"""
+        key = username.lower()
+        with self._lock:
+            failures = self._failures.pop(key, 0) + 1
+            self._failures[key] = failures
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+            return failures
+    
+    def clear_failures(self, username):
+        """Forget failed logins after a success or a lockout"""
+        with self._lock:
+            self._failures.pop(username.lower(), None)
+    
+    def clear(self):
+        """Reset every bucket and failure count"""
+        with self._lock:
+            self._ips = TokenBuckets(LOGIN_IP_RATE, LOGIN_IP_BURST, self.max_keys)
+            self._users = TokenBuckets(LOGIN_USER_RATE, LOGIN_USER_BURST, self.max_keys)
+            self._failures = OrderedDict()  # username -> failed logins
+
+# Global login throttle
+login_throttle = LoginThrottle()
 
 # ==================== AUTHENTICATION ====================
 
-def authenticate(username, password):
-    """Authenticate a user and return session token"""
+def authenticate(username, password, ip_address=None):
+    """Authenticate a user and return session token
+    
+    Attempts are rate limited per address and per username before the
+    database is read (raising LoginThrottled). Failed attempts are counted in
+    memory and the account is locked in the database once
+    LOGIN_LOCKOUT_THRESHOLD is reached.
+    """
+    login_throttle.check(ip_address, username)
     user = get_user_by_username(username)
     
     if not user:
+        # Hash anyway, so the response time does not tell which usernames exist
+        verify_password(password, _dummy_password_hash())
         return None, "Invalid username or password"
     
     if not user['is_active']:
@@ -247,27 +862,32 @@ def authenticate(username, password):
             return None, f"Account is locked. Try again later."
     
     if not verify_password(password, user['password_hash']):
-        # Increment failed attempts
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            new_attempts = user['failed_attempts'] + 1
-            
-            # Lock account after 5 failed attempts
-            if new_attempts >= 5:
-                locked_until = datetime.now() + timedelta(minutes=15)
+        # Only a lockout is written; earlier failures are counted in memory
+        new_attempts = user['failed_attempts'] + login_throttle.record_failure(username)
+        if new_attempts >= LOGIN_LOCKOUT_THRESHOLD:
+            locked_until = datetime.now() + timedelta(minutes=LOGIN_LOCKOUT_MINUTES)
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
                 cursor.execute('UPDATE users SET failed_attempts = ?, locked_until = ? WHERE id = ?', 
                              (new_attempts, locked_until.isoformat(), user['id']))
-            else:
-                cursor.execute('UPDATE users SET failed_attempts = ? WHERE id = ?', (new_attempts, user['id']))
-            conn.commit()
+                conn.commit()
+            login_throttle.clear_failures(username)
+            login_throttle.stats['lockouts'] += 1
         
         return None, "Invalid username or password"
     
+    login_throttle.clear_failures(username)
+    # Upgrade a legacy or outdated hash now that the password is known
+    new_hash = hash_password(password) if needs_rehash(user['password_hash']) else None
+    
     # Reset failed attempts on successful login
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('UPDATE users SET failed_attempts = 0, locked_until = NULL WHERE id = ?', (user['id'],))
-        conn.commit()
+    if new_hash or user['failed_attempts'] or user['locked_until']:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            if new_hash:
+                cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user['id']))
+            cursor.execute('UPDATE users SET failed_attempts = 0, locked_until = NULL WHERE id = ?', (user['id'],))
+            conn.commit()
     
     return user, None
 
@@ -0,0 +1,79 @@
+"""
+Endpoint Assist - Background Workers
+Start/stop plumbing and counters shared by the daemon threads started with the app
+"""
+
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """Daemon thread with idempotent start() and stop(), counters and stats()
+    
+    Subclasses set thread_name and label and implement _loop(), which runs
+    until _stop is set (running is cleared at the same time). _on_start()
+    runs before the thread starts and _on_stop() before it is told to stop.
+    The first start() registers stop() to run at exit. Shutdown is reported
+    through logging rather than print, since stdout may already be closed by
+    the time atexit handlers run.
+    """
+    
+    thread_name = 'background-worker'
+    label = 'Background worker'
+    
+    def __init__(self, counters):
+        self.running = False
+        self.thread = None
+        self.counters = dict(counters)
+        self._stop = threading.Event()
+        self._counters_lock = threading.Lock()
+        self._exit_registered = False
+    
+    def start(self):
+        """Start the worker thread"""
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self._on_start()
+        self.thread = threading.Thread(target=self._loop, name=self.thread_name, daemon=True)
+        self.thread.start()
+        if not self._exit_registered:
+            atexit.register(self.stop)
+            self._exit_registered = True
+        print(f"{self.label} started")
+    
+    def stop(self, timeout=5):
+        """Stop the worker thread, letting work in progress finish"""
+        if not self.running:
+            return
+        self._on_stop(timeout)
+        self.running = False
+        self._stop.set()
+        self.thread.join(timeout=timeout)
+        logger.info("%s stopped", self.label)
+    
+    def stats(self):
+        """Get the counters and whether the worker is running"""
+        with self._counters_lock:
+            counters = dict(self.counters)
+        counters['running'] = self.running
+        return counters
+    
+    def _count(self, name, amount=1):
+        """Increment a counter"""
+        with self._counters_lock:
+            self.counters[name] += amount
+    
+    def _on_start(self):
+        """Prepare state before the thread starts"""
+    
+    def _on_stop(self, timeout):
+        """Finish pending work before the thread is told to stop"""
+    
+    def _loop(self):
+        """Body of the worker thread"""
+        raise NotImplementedError
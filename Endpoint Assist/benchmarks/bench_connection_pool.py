@@ -0,0 +1,95 @@
+"""
+Endpoint Assist - Connection Pool Benchmark
+Compares connect-per-call against pooled connections for single-statement helpers
+
+Each wave starts --threads short-lived threads that make --calls calls and
+exit, the way the development server handles one request per thread.
+
+Usage: python benchmarks/bench_connection_pool.py [--waves N] [--threads N] [--calls N]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+def connect_per_call():
+    """The pre-pool behaviour: stat the data directory, connect, query, close"""
+    database.ensure_data_directory()
+    conn = sqlite3.connect(database.DATABASE_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute('SELECT value FROM settings WHERE key = ?', ('bench',)).fetchone()
+    finally:
+        conn.close()
+
+
+def pooled():
+    """A typical helper running through the pooled get_db_connection()"""
+    with database.get_db_connection() as conn:
+        conn.execute('SELECT value FROM settings WHERE key = ?', ('bench',)).fetchone()
+
+
+def measure(func, waves, threads, calls):
+    """Run func in waves of short-lived threads and return per-call latencies in microseconds"""
+    latencies = []
+    lock = threading.Lock()
+    
+    def request():
+        local = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            func()
+            local.append((time.perf_counter() - start) * 1e6)
+        with lock:
+            latencies.extend(local)
+    
+    start = time.perf_counter()
+    for _ in range(waves):
+        wave = [threading.Thread(target=request) for _ in range(threads)]
+        for thread in wave:
+            thread.start()
+        for thread in wave:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def report(name, latencies, elapsed):
+    """Print a latency summary line"""
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<18} mean {statistics.mean(latencies):8.1f} us   "
+          f"p50 {statistics.median(latencies):8.1f} us   p99 {p99:8.1f} us   "
+          f"{len(latencies) / elapsed:10.0f} calls/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--waves', type=int, default=500, help='waves of threads to start')
+    parser.add_argument('--threads', type=int, default=20, help='concurrent threads per wave')
+    parser.add_argument('--calls', type=int, default=3, help='calls per thread before it exits')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        
+        print(f"{args.waves} waves x {args.threads} threads x {args.calls} calls\n")
+        report('connect-per-call', *measure(connect_per_call, args.waves, args.threads, args.calls))
+        report('pooled', *measure(pooled, args.waves, args.threads, args.calls))
+        print(f"\npool stats: {database.get_pool().stats}")
+        database.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Endpoint Assist - Device Upsert Benchmark
+Simulates a fleet of endpoints checking in and compares the pages written by
+INSERT OR REPLACE with the change-detecting upsert in upsert_devices()
+
+Usage: python benchmarks/bench_device_upserts.py [--devices N] [--rounds N] [--change-rate F] [--batch N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+def insert_or_replace(devices):
+    """The check-in write used before change detection"""
+    with database.get_db_connection() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO device_inventory (id, hostname, ip_address, mac_address, os_info, notes, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(d['id'], d['hostname'], d['ip_address'], d['mac_address'], d['os_info'], d['notes'],
+               datetime.now().isoformat()) for d in devices])
+        conn.commit()
+
+
+METHODS = {
+    'insert or replace': insert_or_replace,
+    'hash upsert': database.upsert_devices,
+}
+
+
+def make_fleet(count):
+    """Build device check-in payloads"""
+    return [{
+        'id': f'device-{i:06d}',
+        'hostname': f'WS-{i:06d}',
+        'ip_address': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+        'mac_address': ':'.join(f'{(i >> shift) & 0xff:02x}' for shift in (40, 32, 24, 16, 8, 0)),
+        'os_info': 'Windows 11 Pro 23H2',
+        'notes': ''
+    } for i in range(count)]
+
+
+def wal_frames(path, page_size):
+    """Frames appended to the WAL so far (auto-checkpointing is disabled)"""
+    wal = path + '-wal'
+    size = os.path.getsize(wal) if os.path.exists(wal) else 0
+    return max(size - 32, 0) // (page_size + 24)
+
+
+def run(path, upsert, devices, rounds, change_rate, batch):
+    """Run check-in rounds, returning (pages written per check-in, ms per round)"""
+    database.close_all_connections()
+    database.DATABASE_PATH = path
+    database.init_db()
+    fleet = make_fleet(devices)
+    upsert(fleet)
+    
+    with database.get_db_connection() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        conn.execute('PRAGMA wal_autocheckpoint = 0').fetchall()
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        
+        rng = random.Random(42)
+        elapsed = 0
+        for round_number in range(rounds):
+            for device in rng.sample(fleet, int(devices * change_rate)):
+                device['ip_address'] = f'192.168.{round_number % 256}.{rng.randrange(256)}'
+            start = time.perf_counter()
+            for offset in range(0, devices, batch):
+                upsert(fleet[offset:offset + batch])
+            elapsed += time.perf_counter() - start
+        
+        frames = wal_frames(path, page_size)
+        conn.execute('PRAGMA wal_autocheckpoint = 1000').fetchall()
+    database.close_all_connections()
+    return frames / (devices * rounds), elapsed / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--devices', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--change-rate', type=float, default=0.02)
+    parser.add_argument('--batch', type=int, default=1, help='check-ins per transaction')
+    args = parser.parse_args()
+    
+    print(f"{args.devices:,} devices, {args.rounds} check-in rounds, "
+          f"{args.change_rate:.0%} changing per round, {args.batch} per transaction...\n")
+    print(f"{'method':<20}{'pages/check-in':>16}{'ms/round':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, upsert in METHODS.items():
+            path = os.path.join(tmp, f"{name.split()[0]}.db")
+            pages, ms = run(path, upsert, args.devices, args.rounds, args.change_rate, args.batch)
+            print(f"{name:<20}{pages:>16.3f}{ms:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
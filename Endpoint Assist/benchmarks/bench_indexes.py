@@ -0,0 +1,126 @@
+"""
+Endpoint Assist - Index Benchmark
+Seeds a large database and compares hot-query latency before and after the index migration
+
+Usage: python benchmarks/bench_indexes.py [--audit-rows N] [--tickets N] [--devices N]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+STATUSES = ['open', 'in-progress', 'resolved', 'closed']
+PRIORITIES = ['low', 'medium', 'high', 'critical']
+ACTIONS = ['Page View', 'Ticket', 'Login', 'Logout', 'Report', 'Health Check']
+
+QUERIES = {
+    'tickets by status': (
+        'SELECT * FROM tickets WHERE status = ? ORDER BY created_at DESC LIMIT 100', ('open',)),
+    'tickets newest': (
+        'SELECT * FROM tickets ORDER BY created_at DESC LIMIT 100', ()),
+    'ticket stats': (
+        "SELECT COUNT(*), SUM(CASE WHEN status = 'open' THEN 1 ELSE 0 END) FROM tickets", ()),
+    'audit logs newest': (
+        'SELECT * FROM audit_logs ORDER BY timestamp DESC LIMIT 100', ()),
+    'devices by last_seen': (
+        'SELECT * FROM device_inventory ORDER BY last_seen DESC LIMIT 100', ()),
+}
+
+
+def timestamps(count, start):
+    """Yield ascending timestamps spread over the last year"""
+    step = timedelta(days=365) / count
+    for i in range(count):
+        yield (start + step * i).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def seed(conn, audit_rows, tickets, devices):
+    """Fill the tables with synthetic rows"""
+    start = datetime.now() - timedelta(days=365)
+    rng = random.Random(42)
+    
+    conn.executemany(
+        'INSERT INTO tickets (id, title, description, status, priority, category, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ((str(uuid.uuid4()), f'Ticket {i}', 'Synthetic ticket', rng.choice(STATUSES), rng.choice(PRIORITIES), 'General', ts)
+         for i, ts in enumerate(timestamps(tickets, start)))
+    )
+    conn.executemany(
+        'INSERT INTO audit_logs (id, timestamp, action, details, user) VALUES (?, ?, ?, ?, ?)',
+        ((str(uuid.uuid4()), ts, rng.choice(ACTIONS), f'Synthetic event {i}', 'System')
+         for i, ts in enumerate(timestamps(audit_rows, start)))
+    )
+    conn.executemany(
+        'INSERT INTO device_inventory (id, hostname, last_seen) VALUES (?, ?, ?)',
+        ((str(uuid.uuid4()), f'host-{i}', ts) for i, ts in enumerate(timestamps(devices, start)))
+    )
+    conn.commit()
+
+
+def measure(conn, repeat):
+    """Return median latency in milliseconds for each query"""
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--audit-rows', type=int, default=1_000_000)
+    parser.add_argument('--tickets', type=int, default=100_000)
+    parser.add_argument('--devices', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    # Only the index migration is measured; later ones reshape the tables seeded here
+    database.SCHEMA_MIGRATIONS = database.SCHEMA_MIGRATIONS[:1]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        
+        with database.get_db_connection() as conn:
+            # Start from the pre-migration schema
+            indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall()
+            for (index_name,) in indexes:
+                conn.execute(f'DROP INDEX {index_name}')
+            conn.execute("DELETE FROM schema_migrations WHERE component = 'core'")
+            conn.execute('PRAGMA user_version = 0')
+            
+            print(f"Seeding {args.audit_rows:,} audit rows, {args.tickets:,} tickets, {args.devices:,} devices...")
+            start = time.perf_counter()
+            seed(conn, args.audit_rows, args.tickets, args.devices)
+            print(f"Seeded in {time.perf_counter() - start:.1f}s\n")
+            
+            before = measure(conn, args.repeat)
+            
+            start = time.perf_counter()
+            database.migrate_db(conn)
+            print(f"Migration took {time.perf_counter() - start:.1f}s\n")
+            conn.execute('ANALYZE')
+            
+            after = measure(conn, args.repeat)
+        
+        print(f"{'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name in QUERIES:
+            print(f"{name:<24}{before[name]:>12.2f}{after[name]:>12.2f}{before[name] / after[name]:>9.0f}x")
+        database.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Endpoint Assist - JSON List Benchmark
+Compares building a dict per row and encoding the list as jsonify does with
+the as_json fast path that has SQLite encode each row with json_object()
+
+Usage: python benchmarks/bench_json_lists.py [--rows N [N ...]] [--runs N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Every 100k-row read is a slow query; keep the log out of the results
+os.environ.setdefault('SLOW_QUERY_MS', '60000')
+
+import database
+
+
+def dict_rows(limit):
+    """The list route before the fast path: dict(row) per row, then jsonify"""
+    tickets, next_cursor = database.get_tickets_page(limit=limit)
+    # Flask's default provider sorts keys and encodes compactly outside debug mode
+    body = json.dumps({"status": "success", "data": tickets, "next_cursor": next_cursor},
+                      sort_keys=True, separators=(',', ':'))
+    return len(body.encode())
+
+
+def sqlite_json(limit):
+    """The as_json fast path: rows arrive as JSON text and are joined into the body"""
+    data, next_cursor = database.get_tickets_page(limit=limit, as_json=True)
+    # json_list_response() sends the envelope and the list as separate pieces
+    pieces = ['{"status":"success","data":', data, ',"next_cursor":' + json.dumps(next_cursor) + '}']
+    return sum(len(piece.encode()) for piece in pieces)
+
+
+METHODS = {
+    'dicts + jsonify': dict_rows,
+    'sqlite json_object': sqlite_json,
+}
+
+
+def seed(count):
+    """Insert count tickets with realistic text fields"""
+    database.create_tickets_bulk([{
+        'title': f'Printer on floor {i % 12} not responding',
+        'description': 'User reports the device shows offline after the latest driver update. ' * 3,
+        'priority': ('low', 'medium', 'high')[i % 3],
+        'category': 'hardware',
+        'user_name': f'user{i % 500}',
+        'user_email': f'user{i % 500}@example.com',
+    } for i in range(count)])
+
+
+def measure(method, limit, runs):
+    """Return (peak MiB, p50 ms, p99 ms, body bytes) for one method"""
+    tracemalloc.start()
+    size = method(limit)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        method(limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return peak / 1024 / 1024, timings[len(timings) // 2], p99, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_all_connections()
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        seed(max(args.rows))
+        
+        print(f"{'rows':>8}  {'method':<20}{'peak MiB':>10}{'p50 ms':>10}{'p99 ms':>10}{'body MB':>10}")
+        for rows in args.rows:
+            for name, method in METHODS.items():
+                peak, p50, p99, size = measure(method, rows, args.runs)
+                print(f"{rows:>8,}  {name:<20}{peak:>10.1f}{p50:>10.1f}{p99:>10.1f}{size / 1e6:>10.1f}")
+        database.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
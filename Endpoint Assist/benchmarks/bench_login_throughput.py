@@ -0,0 +1,120 @@
+"""
+Endpoint Assist - Login Throughput Benchmark
+Runs concurrent authenticate() calls at several scrypt costs and measures
+login throughput and latency, plus the latency of a cheap query issued
+alongside, as another route would during a login storm. Each cost runs with
+the bounded hasher and with one hashing thread per client, as if every
+request hashed on its own thread.
+
+Usage: python benchmarks/bench_login_throughput.py [--clients N] [--seconds N] [--costs N [N ...]]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Login commits queue behind each other under load; keep the slow-query log out of the results
+os.environ.setdefault('SLOW_QUERY_MS', '60000')
+
+import database
+import auth
+
+
+def percentile(timings, fraction):
+    """Value at fraction of the sorted timings"""
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))] if timings else float('nan')
+
+
+def storm(clients, seconds):
+    """Log in from clients threads while probing a cheap query every 10 ms
+    
+    Returns (logins/s, login latencies ms, probe latencies ms, rejected).
+    """
+    stop = threading.Event()
+    logins, probes, rejected = [], [], [0]
+    
+    def client():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                user, error = auth.authenticate('bench', 'correct horse battery staple')
+                assert error is None, error
+            except auth.PasswordHasherBusy:
+                rejected[0] += 1
+                continue
+            logins.append((time.perf_counter() - start) * 1000)
+    
+    def probe():
+        while not stop.wait(0.01):
+            start = time.perf_counter()
+            auth.get_user_by_username('bench')
+            probes.append((time.perf_counter() - start) * 1000)
+    
+    threads = [threading.Thread(target=client) for _ in range(clients)] + [threading.Thread(target=probe)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return len(logins) / seconds, logins, probes, rejected[0]
+
+
+def set_password(password_hash):
+    """Store the benchmark user's hash directly"""
+    with database.get_db_connection() as conn:
+        conn.execute("UPDATE users SET password_hash = ? WHERE username = 'bench'", (password_hash,))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8, help='concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--costs', type=int, nargs='+', default=[2 ** 12, 2 ** 14, 2 ** 15], help='scrypt N values')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_all_connections()
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        auth.init_auth_db()
+        auth.create_user('bench', 'correct horse battery staple')
+        # Every client logs in as the same user; the per-username limit would reject all but a handful
+        auth.LOGIN_USER_RATE = 0
+        auth.login_throttle.clear()
+        
+        print(f"{args.clients} login threads, {auth.PASSWORD_HASH_WORKERS} hashing workers, "
+              f"{os.cpu_count()} CPUs, {args.seconds:g}s per cost...\n")
+        print(f"{'hash':<18}{'workers':>8}{'logins/s':>10}{'login p50':>11}{'login p99':>11}{'query p99':>11}{'rejected':>10}")
+        
+        # Legacy single-round SHA-256, left in place for the run
+        salt = '00' * 16
+        set_password(f"{salt}${auth.hashlib.sha256(('correct horse battery staple' + salt).encode()).hexdigest()}")
+        needs_rehash = auth.needs_rehash
+        auth.needs_rehash = lambda password_hash: False
+        runs = [('sha256 (legacy)', '-', storm(args.clients, args.seconds))]
+        auth.needs_rehash = needs_rehash
+        
+        bounded = auth.password_hasher
+        for cost in args.costs:
+            auth.PASSWORD_SCRYPT_N = cost
+            set_password(auth.hash_password('correct horse battery staple'))
+            for hasher in (bounded, auth.PasswordHasher(workers=args.clients)):
+                auth.password_hasher = hasher
+                runs.append((f'scrypt N=2^{cost.bit_length() - 1}', hasher.workers, storm(args.clients, args.seconds)))
+        auth.password_hasher = bounded
+        
+        for name, workers, (rate, logins, probes, rejected) in runs:
+            print(f"{name:<18}{workers:>8}{rate:>10.1f}{percentile(logins, 0.5):>9.1f}ms{percentile(logins, 0.99):>9.1f}ms"
+                  f"{percentile(probes, 0.99):>9.1f}ms{rejected:>10}")
+        database.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Endpoint Assist - Record Id Benchmark
+Compares audit log insert throughput and database size with random UUID keys
+versus the time-ordered integer keys and ULIDs from the record id migration
+
+Usage: python benchmarks/bench_record_ids.py [--rows N] [--batch N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+SCHEMAS = {
+    # Base schema before the migration: the random TEXT id is the table key
+    'uuid4 text key': ('''
+        CREATE TABLE audit_logs (
+            id TEXT PRIMARY KEY,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            action TEXT NOT NULL,
+            details TEXT,
+            user TEXT DEFAULT 'System',
+            ip_address TEXT,
+            user_agent TEXT
+        )''', lambda: str(uuid.uuid4())),
+    'integer key + ulid': ('''
+        CREATE TABLE audit_logs (
+            seq INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            action TEXT NOT NULL,
+            details TEXT,
+            user TEXT DEFAULT 'System',
+            ip_address TEXT,
+            user_agent TEXT
+        )''', database.new_id),
+}
+
+
+def run(path, schema, make_id, rows, batch):
+    """Insert rows in committed batches and return (rows per second, file size in MB)"""
+    conn = database._open_connection(path)
+    conn.execute(schema)
+    conn.execute('CREATE INDEX idx_audit_logs_timestamp ON audit_logs (timestamp)')
+    conn.commit()
+    
+    start_ts = datetime.now() - timedelta(days=365)
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        conn.executemany(
+            'INSERT INTO audit_logs (id, timestamp, action, details, user) VALUES (?, ?, ?, ?, ?)',
+            ((make_id(), (start_ts + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S'),
+              'Ticket', f'Synthetic event {i}', 'System')
+             for i in range(offset, min(offset + batch, rows)))
+        )
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    return rows / elapsed, os.path.getsize(path) / (1024 ** 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=500)
+    args = parser.parse_args()
+    
+    print(f"Inserting {args.rows:,} audit rows in batches of {args.batch}...\n")
+    print(f"{'keys':<22}{'rows/s':>12}{'size MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (schema, make_id) in SCHEMAS.items():
+            path = os.path.join(tmp, f"{name.split()[0]}.db")
+            throughput, size = run(path, schema, make_id, args.rows, args.batch)
+            print(f"{name:<22}{throughput:>12,.0f}{size:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
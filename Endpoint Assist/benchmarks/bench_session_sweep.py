@@ -0,0 +1,95 @@
+"""
+Endpoint Assist - Session Sweep Benchmark
+Fills user_sessions with mostly expired sessions, then measures token
+validation latency before and after a batched sweep, and how long each
+sweep batch held the write lock
+
+Usage: python benchmarks/bench_session_sweep.py [--sessions N] [--expired F] [--batch N]
+"""
+
+import argparse
+import os
+import random
+import secrets
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sweep batches are timed through query_stats; keep the slow-query log out of the results
+os.environ.setdefault('SLOW_QUERY_MS', '60000')
+
+import database
+import auth
+from query_stats import query_stats
+
+
+def seed(user_id, count, expired_fraction):
+    """Insert sessions directly; returns the tokens of the live ones"""
+    now = datetime.now()
+    live = []
+    rows = []
+    for i in range(count):
+        token = secrets.token_urlsafe(32)
+        if i < count * expired_fraction:
+            expires_at = now - timedelta(minutes=random.randrange(1, 90 * 24 * 60))
+        else:
+            expires_at = now + timedelta(hours=24)
+            live.append(token)
+        rows.append((user_id, token, expires_at.isoformat()))
+    with database.get_db_connection() as conn:
+        for offset in range(0, count, 50000):
+            conn.executemany('INSERT INTO user_sessions (user_id, token, expires_at) VALUES (?, ?, ?)',
+                             rows[offset:offset + 50000])
+            conn.commit()
+    return live
+
+
+def validation_latency(tokens, count=2000):
+    """p50 and p99 validate_session() latency in µs, with the session cache off"""
+    timings = []
+    for token in random.choices(tokens, k=count):
+        start = time.perf_counter()
+        assert auth.validate_session(token)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=1_000_000)
+    parser.add_argument('--expired', type=float, default=0.95, help='fraction of sessions already expired')
+    parser.add_argument('--batch', type=int, default=auth.SESSION_SWEEP_BATCH_SIZE)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_all_connections()
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        auth.init_auth_db()
+        auth.session_cache.ttl = 0
+        user_id = auth.create_user('bench', 'password')
+        
+        print(f"Seeding {args.sessions:,} sessions, {args.expired:.0%} expired...")
+        live = seed(user_id, args.sessions, args.expired)
+        p50, p99 = validation_latency(live)
+        print(f"validate_session before sweep: p50 {p50:.1f} µs, p99 {p99:.1f} µs")
+        
+        query_stats.reset()
+        start = time.perf_counter()
+        result = auth.sweep_expired_sessions(batch_size=args.batch)
+        elapsed = time.perf_counter() - start
+        delete = next(entry for entry in query_stats.top(limit=100)
+                      if entry['sql'].startswith('DELETE FROM user_sessions'))
+        print(f"sweep: {result['sessions']:,} sessions in {result['batches']:,} batches, {elapsed:.1f}s; "
+              f"per batch p50 {delete['p50_ms']} ms, max {delete['max_ms']} ms")
+        
+        p50, p99 = validation_latency(live)
+        print(f"validate_session after sweep:  p50 {p50:.1f} µs, p99 {p99:.1f} µs")
+        database.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
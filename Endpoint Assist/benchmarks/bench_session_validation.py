@@ -0,0 +1,82 @@
+"""
+Endpoint Assist - Session Validation Benchmark
+Drives validate_session() at a fixed request rate with database sessions
+(with and without the session cache) and with signed tokens, and reports
+per-request latency
+
+Usage: python benchmarks/bench_session_validation.py [--rate N] [--seconds N] [--sessions N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import auth
+
+
+def percentile(timings, fraction):
+    """Value at fraction of the sorted timings"""
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def run(tokens, rate, seconds, ttl):
+    """Validate random tokens at rate per second, returning sorted latencies in µs"""
+    auth.session_cache.clear()
+    auth.session_cache.ttl = ttl
+    rng = random.Random(42)
+    interval = 1 / rate
+    timings = []
+    
+    start = time.perf_counter()
+    for i in range(int(rate * seconds)):
+        # Open-loop pacing: each request is due at a fixed time, as if from independent clients
+        delay = start + i * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        began = time.perf_counter()
+        assert auth.validate_session(rng.choice(tokens))
+        timings.append((time.perf_counter() - began) * 1e6)
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rate', type=int, default=1000, help='validations per second')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--sessions', type=int, default=200, help='distinct active sessions')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_all_connections()
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        auth.init_auth_db()
+        user_ids = [auth.create_user(f'user{i}', 'password') for i in range(args.sessions // 4 or 1)]
+        tokens = [auth.create_session(user_ids[i % len(user_ids)]) for i in range(args.sessions)]
+        signed = [auth.create_session(user_ids[i % len(user_ids)], mode='signed') for i in range(args.sessions)]
+        # Logouts seen by the revocation filter, as in a running deployment
+        for token in signed[:args.sessions // 10]:
+            auth.invalidate_session(token)
+        signed = signed[args.sessions // 10:]
+        
+        print(f"{args.sessions} sessions, {args.rate:,} validations/s for {args.seconds:g}s...\n")
+        print(f"{'validation':<16}{'p50 µs':>10}{'p99 µs':>10}{'max µs':>10}{'hit rate':>10}")
+        runs = (('off', tokens, 0), (f'ttl {auth.SESSION_CACHE_TTL:g}s', tokens, auth.SESSION_CACHE_TTL),
+                ('signed tokens', signed, 0))
+        for name, run_tokens, ttl in runs:
+            hits = auth.session_cache.stats['hits']
+            timings = run(run_tokens, args.rate, args.seconds, ttl)
+            hit_rate = (auth.session_cache.stats['hits'] - hits) / len(timings)
+            print(f"{name:<16}{percentile(timings, 0.5):>10.1f}{percentile(timings, 0.99):>10.1f}"
+                  f"{timings[-1]:>10.1f}{hit_rate:>10.1%}")
+        database.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Endpoint Assist - Ticket Search Benchmark
+Seeds a large ticket history and measures full-text search latency
+
+Usage: python benchmarks/bench_ticket_search.py [--tickets N] [--repeat N]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+SUBJECTS = ['printer', 'laptop', 'vpn', 'outlook', 'teams', 'monitor', 'keyboard', 'wifi',
+            'password', 'mailbox', 'docking station', 'onedrive', 'sharepoint', 'scanner']
+PROBLEMS = ['offline', 'crashes on startup', 'very slow', 'not connecting', 'shows error 0x80070005',
+            'keeps disconnecting', 'locked out', 'out of storage', 'blank screen', 'paper jam']
+FIXES = ['reinstalled driver', 'cleared cache', 'reset password', 'replaced cable', 'updated firmware',
+         'rebooted device', 'increased quota', 'reassigned license', 'escalated to vendor']
+
+QUERIES = [
+    'printer',                    # very common term (~1 in 14 tickets)
+    'printer offline',
+    'vpn disconnect*',
+    'error 0x80070005',
+    'ws-01234',                   # hostname
+    'firmware',
+    'shar*',
+    'docking station blank screen',
+]
+
+
+def vocabulary(rng, size=20000):
+    """Build pseudo-words so free text has a realistic long tail of rare terms"""
+    syllables = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pra', 'sto', 'gen', 'dor', 'bel']
+    return [''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def seed(conn, count):
+    """Insert synthetic tickets in batches so the FTS triggers index them"""
+    rng = random.Random(7)
+    words = vocabulary(rng)
+    # Zipf-like weights: a few words are common, most are rare
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    sampled = rng.choices(words, cum_weights=cum_weights, k=count * 12)
+    error_codes = [f'0x8007{rng.randint(0, 0xffff):04x}' for _ in range(200)] + ['0x80070005']
+    batch = []
+    for i in range(count):
+        subject = rng.choice(SUBJECTS)
+        problem = rng.choice(PROBLEMS)
+        notes = ' '.join(sampled[i * 12:(i + 1) * 12])
+        batch.append((
+            str(uuid.uuid4()),
+            f'{subject.title()} {problem}',
+            f'User on WS-{i % 20000:05d} reports the {subject} is {problem}. '
+            f'Error {rng.choice(error_codes)}. {notes}',
+            rng.choice(['open', 'in-progress', 'resolved', 'closed']),
+            f'{rng.choice(FIXES).capitalize()} and confirmed with user.'
+        ))
+        if len(batch) == 10000:
+            conn.executemany('INSERT INTO tickets (id, title, description, status, resolution) VALUES (?, ?, ?, ?, ?)', batch)
+            conn.commit()
+            batch = []
+    if batch:
+        conn.executemany('INSERT INTO tickets (id, title, description, status, resolution) VALUES (?, ?, ?, ?, ?)', batch)
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        
+        print(f"Seeding {args.tickets:,} tickets...")
+        start = time.perf_counter()
+        with database.get_db_connection() as conn:
+            seed(conn, args.tickets)
+            conn.execute("INSERT INTO tickets_fts (tickets_fts) VALUES ('optimize')")
+            conn.commit()
+        print(f"Seeded and indexed in {time.perf_counter() - start:.1f}s\n")
+        
+        print(f"{'query (top 20)':<32}{'p50 ms':>10}{'p95 ms':>10}{'matches':>10}")
+        for query in QUERIES:
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                database.search_tickets(query, limit=20)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+            with database.get_db_connection() as conn:
+                matches = conn.execute('SELECT COUNT(*) FROM tickets_fts WHERE tickets_fts MATCH ?',
+                                       (database.build_fts_query(query),)).fetchone()[0]
+            print(f"{query:<32}{statistics.median(samples):>10.2f}{p95:>10.2f}{matches:>10,}")
+        database.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,37 +5,492 @@ SQLite database for persistent storage of tickets, audit logs, and settings
 
 import sqlite3
 import os
-from datetime import datetime
+import re
+import shlex
+import gzip
+import base64
+import hashlib
+import html
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict, deque
 from contextlib import contextmanager
 import json
 
+from query_stats import connection_factory
+
 # Database file path
 DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'endpoint_assist.db')
 
+# Storage backend: 'sqlite' for the DATABASE_PATH file, 'memory' for an
+# in-memory database that is discarded on exit (tests and load tests)
+DB_BACKEND = os.environ.get('DB_BACKEND', 'sqlite')
+
+# Connection pool configuration
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 16))
+DB_POOL_IDLE_TIMEOUT = float(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+
+# SQLite tuning profiles applied to every new connection. The active profile
+# comes from the DB_PROFILE environment variable, then the 'db_profile'
+# setting, then DEFAULT_DB_PROFILE.
+DB_PROFILES = {
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000
+    },
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 64 * 1024 * 1024,
+        'cache_size': -16000,  # negative = KiB, so ~16 MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000
+    },
+    'throughput': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000
+    }
+}
+DEFAULT_DB_PROFILE = 'balanced'
+DB_PROFILE = os.environ.get('DB_PROFILE')
+
+_SYNCHRONOUS_NAMES = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+_TEMP_STORE_NAMES = {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'}
+
 def ensure_data_directory():
     """Ensure the data directory exists"""
     data_dir = os.path.dirname(DATABASE_PATH)
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
 
+def _open_connection(path, uri=False):
+    """Open a new SQLite connection configured for use by the pool"""
+    conn = sqlite3.connect(path, uri=uri, check_same_thread=False, factory=connection_factory())
+    conn.row_factory = sqlite3.Row
+    apply_db_profile(conn, resolve_db_profile(conn))
+    return conn
+
+# ==================== PERFORMANCE PROFILE ====================
+
+# Profile resolved for each database, so opening a connection does not query
+# settings; cleared by set_setting('db_profile', ...) and close_all_connections()
+_resolved_profiles = {}
+_warned_profiles = set()
+
+def resolve_db_profile(conn):
+    """Work out which tuning profile applies to a connection"""
+    if DB_PROFILE:
+        return _known_profile(DB_PROFILE)
+    
+    key = _database_key()
+    name = _resolved_profiles.get(key)
+    if name is None:
+        try:
+            row = conn.execute("SELECT value FROM settings WHERE key = 'db_profile'").fetchone()
+        except sqlite3.OperationalError:
+            # Settings table does not exist yet on a fresh database
+            return DEFAULT_DB_PROFILE
+        name = _resolved_profiles[key] = _known_profile(row[0] if row else None)
+    return name
+
+def _known_profile(name):
+    """The named profile, or the default (warning once) if the name is unknown"""
+    if name and name not in DB_PROFILES:
+        if name not in _warned_profiles:
+            _warned_profiles.add(name)
+            print(f"⚠️ Unknown database profile '{name}', using '{DEFAULT_DB_PROFILE}'")
+        name = None
+    return name or DEFAULT_DB_PROFILE
+
+def apply_db_profile(conn, profile_name):
+    """Apply a tuning profile's pragmas to a connection"""
+    for pragma, value in DB_PROFILES[profile_name].items():
+        try:
+            conn.execute(f'PRAGMA {pragma} = {value}').fetchall()
+        except sqlite3.OperationalError:
+            # e.g. journal_mode cannot change while another connection holds the file;
+            # get_pragma_report() shows what actually took effect
+            pass
+
+def get_pragma_report():
+    """Report the tuning profile and the pragma values actually in effect"""
+    with get_db_connection() as conn:
+        profile_name = resolve_db_profile(conn)
+        values = {}
+        for pragma in ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store', 'busy_timeout'):
+            row = conn.execute(f'PRAGMA {pragma}').fetchone()
+            # mmap_size has no value on in-memory databases
+            values[pragma] = row[0] if row else None
+    
+    values['journal_mode'] = values['journal_mode'].upper()
+    values['synchronous'] = _SYNCHRONOUS_NAMES.get(values['synchronous'], values['synchronous'])
+    values['temp_store'] = _TEMP_STORE_NAMES.get(values['temp_store'], values['temp_store'])
+    return {'profile': profile_name, 'pragmas': values}
+
+# ==================== CONNECTION POOL ====================
+
+class _PooledConnection:
+    """Bookkeeping for one connection while it is idle or checked out"""
+    
+    def __init__(self, conn, path, pooled, generation):
+        self.conn = conn
+        self.path = path
+        self.pooled = pooled
+        self.generation = generation
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+class ConnectionPool:
+    """Checkout/return pool of SQLite connections
+    
+    get_db_connection() checks a connection out of a free list of idle
+    connections and returns it on exit, so a connection is reused by whichever
+    thread asks next, including the short-lived threads a server starts per
+    request. Nested get_db_connection() calls on one thread share the outer
+    checkout. At most max_size connections are open at once; callers beyond
+    that get a connection that is closed when returned. Idle connections older
+    than idle_timeout are closed instead of handed out, and a connection idle
+    longer than health_check_interval is probed before it is handed out again.
+    """
+    
+    def __init__(self, max_size=DB_POOL_SIZE, idle_timeout=DB_POOL_IDLE_TIMEOUT,
+                 health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._returned = threading.Condition(self._lock)
+        self._idle = deque()  # least recently used first
+        self._in_use = set()
+        self._open = 0  # pooled connections, idle or checked out
+        self._generation = 0  # bumped by close_all() to retire checked-out connections
+        self.stats = {'created': 0, 'reused': 0, 'evicted': 0, 'unhealthy': 0, 'overflow': 0}
+    
+    def acquire(self):
+        """Check out a connection, or share the calling thread's current one"""
+        entry = getattr(self._local, 'entry', None)
+        if entry is not None:
+            # Nested use on the same thread shares the outer connection
+            self._local.depth += 1
+            return entry.conn
+        
+        entry = self._checkout()
+        self._local.entry = entry
+        self._local.depth = 1
+        return entry.conn
+    
+    def release(self, conn):
+        """Return the calling thread's connection once its outermost use ends"""
+        entry = getattr(self._local, 'entry', None)
+        if entry is None or entry.conn is not conn:
+            conn.close()
+            return
+        
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.entry = None
+        
+        try:
+            # Match close() semantics: uncommitted work is discarded
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._return(entry, keep=False)
+            return
+        self._return(entry, keep=True)
+    
+    def close_all(self, timeout=5.0):
+        """Close every pooled connection (used on shutdown and in tests)
+        
+        Closing a connection under a running statement crashes the sqlite3
+        module, so this waits up to timeout seconds for other threads to
+        return theirs. Any still checked out after that are closed when they
+        come back instead of rejoining the pool.
+        """
+        own = getattr(self._local, 'entry', None)
+        deadline = time.monotonic() + timeout
+        with self._returned:
+            while self._in_use - {own}:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._returned.wait(remaining)
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._generation += 1
+        self._close(idle)
+    
+    def size(self):
+        """Number of pooled connections currently open, idle or checked out"""
+        with self._lock:
+            return self._open
+    
+    def _checkout(self):
+        """Hand out an idle connection, opening a new one if none is usable"""
+        backend = get_storage_backend()
+        location = backend.location()
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                stale = self._take_stale(location, now)
+                entry = self._idle.pop() if self._idle else None
+                if entry is not None:
+                    self._in_use.add(entry)
+                    self.stats['reused'] += 1
+                else:
+                    pooled = self._open < self.max_size
+                    if pooled:
+                        self._open += 1
+                    else:
+                        self.stats['overflow'] += 1
+                    self.stats['created'] += 1
+                    generation = self._generation
+            self._close(stale)
+            
+            if entry is None:
+                try:
+                    conn = backend.connect()
+                except BaseException:
+                    if pooled:
+                        with self._lock:
+                            self._open -= 1
+                    raise
+                entry = _PooledConnection(conn, location, pooled, generation)
+                with self._lock:
+                    self._in_use.add(entry)
+                return entry
+            
+            if now - entry.last_checked <= self.health_check_interval:
+                return entry
+            entry.last_checked = now
+            try:
+                entry.conn.execute('SELECT 1').fetchone()
+                return entry
+            except sqlite3.Error:
+                with self._lock:
+                    self.stats['unhealthy'] += 1
+                self._return(entry, keep=False)
+    
+    def _take_stale(self, location, now):
+        """Remove idle connections that are too old or point at another database (lock held)"""
+        stale = []
+        # The free list is ordered by last use, so expired connections sit at the front
+        while self._idle and now - self._idle[0].last_used > self.idle_timeout:
+            stale.append(self._idle.popleft())
+        moved = [entry for entry in self._idle if entry.path != location]
+        for entry in moved:
+            self._idle.remove(entry)
+        stale.extend(moved)
+        self._open -= len(stale)
+        self.stats['evicted'] += len(stale)
+        return stale
+    
+    def _return(self, entry, keep):
+        """Put a checked-out connection back on the free list, or close it"""
+        with self._returned:
+            self._in_use.discard(entry)
+            keep = keep and entry.pooled and entry.generation == self._generation
+            if keep:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            elif entry.pooled:
+                self._open -= 1
+            self._returned.notify_all()
+        if not keep:
+            self._close([entry])
+    
+    @staticmethod
+    def _close(entries):
+        """Close connections that have left the pool"""
+        for entry in entries:
+            try:
+                entry.conn.close()
+            except sqlite3.Error:
+                pass
+
+_pool = ConnectionPool()
+
+def configure_pool(max_size=None, idle_timeout=None, health_check_interval=None):
+    """Reconfigure the connection pool, closing existing connections"""
+    global _pool
+    _pool.close_all()
+    _pool = ConnectionPool(
+        max_size=DB_POOL_SIZE if max_size is None else max_size,
+        idle_timeout=DB_POOL_IDLE_TIMEOUT if idle_timeout is None else idle_timeout,
+        health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL if health_check_interval is None else health_check_interval
+    )
+    return _pool
+
+def get_pool():
+    """Get the active connection pool"""
+    return _pool
+
+def close_all_connections():
+    """Close all pooled connections"""
+    _pool.close_all()
+    _resolved_profiles.clear()
+
+atexit.register(close_all_connections)
+
+# ==================== STORAGE BACKENDS ====================
+
+# Every repository function in this module and in auth.py (tickets, audit
+# logs, settings, devices, users, sessions) reaches storage through
+# get_db_connection(), so the backend decides where all of it lives.
+
+class SQLiteFileBackend:
+    """Stores everything in the DATABASE_PATH file (the default)"""
+    
+    name = 'sqlite'
+    
+    def location(self):
+        """Identifies the database; pooled connections to a different location are replaced"""
+        return DATABASE_PATH
+    
+    def connect(self):
+        """Open a connection for the pool"""
+        ensure_data_directory()
+        return _open_connection(DATABASE_PATH)
+    
+    def files(self):
+        """Files whose sizes make up the database size"""
+        return [DATABASE_PATH, DATABASE_PATH + '-wal']
+    
+    def reset(self):
+        """Discard all stored data"""
+        close_all_connections()
+        for path in (DATABASE_PATH, DATABASE_PATH + '-wal', DATABASE_PATH + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+class MemoryBackend:
+    """Stores everything in a named in-memory SQLite database
+    
+    Uses SQLite's memdb VFS (SQLite 3.36+), so every pooled connection sees
+    the same database with ordinary locking and busy_timeout. An anchor
+    connection keeps the data alive while pooled connections come and go.
+    Nothing touches the disk and nothing survives the process. There is no
+    WAL, so the database profile's journal_mode does not apply.
+    """
+    
+    name = 'memory'
+    
+    # Anchor connection per database name, shared by every instance
+    _anchors = {}
+    _lock = threading.Lock()
+    
+    def __init__(self, db_name='endpoint_assist'):
+        self.db_name = db_name
+    
+    def location(self):
+        """Identifies the database; pooled connections to a different location are replaced"""
+        return f'memory:{self.db_name}'
+    
+    def connect(self):
+        """Open a connection for the pool, creating the database on first use"""
+        uri = f'file:/{self.db_name}?vfs=memdb'
+        with self._lock:
+            if self.db_name not in self._anchors:
+                self._anchors[self.db_name] = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return _open_connection(uri, uri=True)
+    
+    def files(self):
+        """Files whose sizes make up the database size (none)"""
+        return []
+    
+    def reset(self):
+        """Discard all stored data"""
+        close_all_connections()
+        with self._lock:
+            anchor = self._anchors.pop(self.db_name, None)
+        if anchor is not None:
+            anchor.close()
+
+STORAGE_BACKENDS = {
+    'sqlite': SQLiteFileBackend,
+    'memory': MemoryBackend
+}
+
+_storage_backend = None
+
+def configure_storage(name):
+    """Switch storage backend, closing connections to the previous one"""
+    global _storage_backend
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}', expected one of {', '.join(STORAGE_BACKENDS)}")
+    close_all_connections()
+    _storage_backend = STORAGE_BACKENDS[name]()
+    return _storage_backend
+
+def get_storage_backend():
+    """Get the active storage backend, creating it from DB_BACKEND on first use"""
+    if _storage_backend is None:
+        return configure_storage(DB_BACKEND)
+    return _storage_backend
+
+def _database_key():
+    """Identity of the active database, for caches that must not outlive a switch"""
+    return get_storage_backend().location()
+
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections"""
-    ensure_data_directory()
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
+    """Context manager for database connections (checked out of the pool)"""
+    pool = _pool
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def get_snapshot_connection():
+    """Read-only connection for long reports and exports that never stalls writers
+    
+    In WAL mode the connection starts a read transaction straight away, so
+    every query sees the database as of that moment while writers keep
+    committing. Without WAL (the legacy profile, in-memory storage) a read
+    transaction would hold a shared lock that stalls every writer until the
+    export ends, so the connection stays in autocommit instead and callers
+    read in short batches with _stream_rows(); conn.in_transaction tells the
+    two apart. The database is never copied. query_only is set, so writes
+    raise sqlite3.OperationalError. The connection is not pooled and is
+    closed on exit.
+    """
+    conn = get_storage_backend().connect()
     try:
+        conn.execute('PRAGMA query_only = ON')
+        if conn.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal':
+            # The snapshot is taken by the first read inside the transaction
+            conn.execute('BEGIN')
+            conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
         yield conn
     finally:
         conn.close()
 
 def init_db():
     """Initialize the database with required tables"""
-    ensure_data_directory()
-    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
+        # auto_vacuum can only change before the first table exists; switching
+        # to WAL has already written the header, so VACUUM applies it. Older
+        # databases switch with `python database.py maintain --full-vacuum`
+        if conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0] == 0:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            if conn.execute('PRAGMA page_count').fetchone()[0] > 0:
+                conn.execute('VACUUM')
+        
         # Create tickets table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS tickets (
@@ -54,18 +509,20 @@ def init_db():
             )
         ''')
         
-        # Create audit_logs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS audit_logs (
-                id TEXT PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                action TEXT NOT NULL,
-                details TEXT,
-                user TEXT DEFAULT 'System',
-                ip_address TEXT,
-                user_agent TEXT
-            )
-        ''')
+        # Create audit_logs table (fresh databases only: the monthly partition
+        # migration replaces it, and it must not come back on the next start)
+        if get_schema_version(conn) == 0:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audit_logs (
+                    id TEXT PRIMARY KEY,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    action TEXT NOT NULL,
+                    details TEXT,
+                    user TEXT DEFAULT 'System',
+                    ip_address TEXT,
+                    user_agent TEXT
+                )
+            ''')
         
         # Create settings table
         cursor.execute('''
@@ -90,14 +547,686 @@ def init_db():
         ''')
         
         conn.commit()
+        _audit_partition_cache.clear()
+        migrate_db(conn)
+        _settings_cache.invalidate()
         print("✅ Database initialized successfully")
+    
+    report = get_pragma_report()
+    pragmas = ', '.join(f"{name}={value}" for name, value in report['pragmas'].items())
+    print(f"⚙️ Database profile '{report['profile']}': {pragmas}")
+
+# ==================== SCHEMA MIGRATIONS ====================
+
+# Exact ticket counts per ticket_counters row, computed from the tickets table
+_TICKET_COUNTER_SOURCE = '''
+    SELECT 'total', '', COUNT(*) FROM tickets
+    UNION ALL SELECT 'status', COALESCE(status, ''), COUNT(*) FROM tickets GROUP BY 2
+    UNION ALL SELECT 'priority', COALESCE(priority, ''), COUNT(*) FROM tickets GROUP BY 2
+    UNION ALL SELECT 'category', COALESCE(category, ''), COUNT(*) FROM tickets GROUP BY 2
+'''
+
+# Indexes and triggers hang off their table, so the table rebuild in the
+# time-ordered key migration has to create them again; they are defined once here.
+_TICKET_INDEXES = [
+    # status filter + newest-first sort
+    'CREATE INDEX IF NOT EXISTS idx_tickets_status_created ON tickets (status, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets (created_at)'
+]
+
+_AUDIT_LOG_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON audit_logs (timestamp)'
+]
+
+_TICKETS_FTS_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS tickets_fts_insert AFTER INSERT ON tickets BEGIN
+        INSERT INTO tickets_fts (rowid, title, description, resolution)
+        VALUES (new.rowid, new.title, new.description, new.resolution);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS tickets_fts_delete AFTER DELETE ON tickets BEGIN
+        INSERT INTO tickets_fts (tickets_fts, rowid, title, description, resolution)
+        VALUES ('delete', old.rowid, old.title, old.description, old.resolution);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS tickets_fts_update AFTER UPDATE OF title, description, resolution ON tickets BEGIN
+        INSERT INTO tickets_fts (tickets_fts, rowid, title, description, resolution)
+        VALUES ('delete', old.rowid, old.title, old.description, old.resolution);
+        INSERT INTO tickets_fts (rowid, title, description, resolution)
+        VALUES (new.rowid, new.title, new.description, new.resolution);
+    END'''
+]
+
+def _audit_log_fts_triggers(table):
+    """Triggers keeping {table}_fts in sync with an audit log table"""
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts (rowid, action, details, user, ip_address)
+            VALUES (new.rowid, new.action, new.details, new.user, new.ip_address);
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, action, details, user, ip_address)
+            VALUES ('delete', old.rowid, old.action, old.details, old.user, old.ip_address);
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF action, details, user, ip_address ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, action, details, user, ip_address)
+            VALUES ('delete', old.rowid, old.action, old.details, old.user, old.ip_address);
+            INSERT INTO {table}_fts (rowid, action, details, user, ip_address)
+            VALUES (new.rowid, new.action, new.details, new.user, new.ip_address);
+        END'''
+    ]
+
+def _audit_partition_schema(table):
+    """Table, timestamp index, FTS index and triggers for one monthly audit log partition"""
+    return [
+        f'''CREATE TABLE IF NOT EXISTS {table} (
+            seq INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            action TEXT NOT NULL,
+            details TEXT,
+            user TEXT DEFAULT 'System',
+            ip_address TEXT,
+            user_agent TEXT
+        )''',
+        f'CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)',
+        f'''CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+            action, details, user, ip_address,
+            content='{table}', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )'''
+    ] + _audit_log_fts_triggers(table)
+
+_TICKET_COUNTER_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS ticket_counters_insert AFTER INSERT ON tickets BEGIN
+        INSERT INTO ticket_counters (dimension, value, count) VALUES
+            ('total', '', 1),
+            ('status', COALESCE(new.status, ''), 1),
+            ('priority', COALESCE(new.priority, ''), 1),
+            ('category', COALESCE(new.category, ''), 1)
+        ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS ticket_counters_delete AFTER DELETE ON tickets BEGIN
+        UPDATE ticket_counters SET count = count - 1
+        WHERE (dimension, value) IN (VALUES
+            ('total', ''),
+            ('status', COALESCE(old.status, '')),
+            ('priority', COALESCE(old.priority, '')),
+            ('category', COALESCE(old.category, ''))
+        );
+    END'''
+] + [
+    f'''CREATE TRIGGER IF NOT EXISTS ticket_counters_update_{column} AFTER UPDATE OF {column} ON tickets
+    WHEN old.{column} IS NOT new.{column} BEGIN
+        UPDATE ticket_counters SET count = count - 1
+        WHERE dimension = '{column}' AND value = COALESCE(old.{column}, '');
+        INSERT INTO ticket_counters (dimension, value, count) VALUES ('{column}', COALESCE(new.{column}, ''), 1)
+        ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+    END'''
+    for column in ('status', 'priority', 'category')
+]
+
+_TICKET_COLUMNS = ('id, title, description, status, priority, category, assigned_to, created_by, '
+                   'created_at, updated_at, resolved_at, resolution')
+_AUDIT_LOG_COLUMNS = 'id, timestamp, action, details, user, ip_address, user_agent'
+
+# Rows a Backfill step processes per committed chunk
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 5000))
+
+class Backfill:
+    """Migration step that processes a table in rowid chunks, committing each chunk
+    
+    apply is an SQL statement taking (start, end) parameters or a callable
+    apply(conn, start, end), and must handle rows with start < rowid <= end.
+    Progress is checkpointed in schema_migrations with every commit, so the
+    write lock is only held per chunk and an interrupted run resumes where it
+    stopped.
+    """
+    
+    def __init__(self, table, apply, batch_size=None):
+        self.table = table
+        self.apply = apply
+        self.batch_size = batch_size
+    
+    def bounds(self, conn):
+        """Get the (min, max) rowid to process, or (None, None) for an empty table"""
+        return tuple(conn.execute(f'SELECT min(rowid), max(rowid) FROM {self.table}').fetchone())
+    
+    def run_chunk(self, conn, start, end):
+        """Process rows with start < rowid <= end"""
+        if callable(self.apply):
+            self.apply(conn, start, end)
+        else:
+            conn.execute(self.apply, (start, end))
+
+# Ordered schema upgrades applied on top of the base tables. Each entry is a
+# description and a list of steps: SQL statements, callables taking the
+# connection, or Backfill chunks. schema_migrations records what has run (and
+# PRAGMA user_version mirrors the count), so each migration executes once.
+SCHEMA_MIGRATIONS = [
+    ('query indexes for tickets, audit logs and device inventory', _TICKET_INDEXES + _AUDIT_LOG_INDEXES + [
+        'CREATE INDEX IF NOT EXISTS idx_device_inventory_last_seen ON device_inventory (last_seen)'
+    ]),
+    ('full-text search index over tickets', [
+        # External-content FTS5 table: the text lives only in tickets, the index
+        # maps terms to tickets.rowid. Prefix indexes keep 'term*' queries fast.
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+            title, description, resolution,
+            content='tickets', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )''',
+    ] + _TICKETS_FTS_TRIGGERS + [
+        # Title matches weigh most; setting the rank function lets FTS5 sort by it internally
+        "INSERT INTO tickets_fts (tickets_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 2.0)')",
+        "INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild')"
+    ]),
+    ('full-text search index over audit logs', [
+        # Same external-content layout as tickets_fts, keyed on audit_logs.rowid
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS audit_logs_fts USING fts5(
+            action, details, user, ip_address,
+            content='audit_logs', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )''',
+    ] + _audit_log_fts_triggers('audit_logs') + [
+        "INSERT INTO audit_logs_fts (audit_logs_fts) VALUES ('rebuild')"
+    ]),
+    ('trigger-maintained ticket counters', [
+        # One row per (dimension, value); 'total' has the single value ''.
+        # NULL columns are counted under ''.
+        '''CREATE TABLE IF NOT EXISTS ticket_counters (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID''',
+    ] + _TICKET_COUNTER_TRIGGERS + [
+        'DELETE FROM ticket_counters',
+        f'INSERT INTO ticket_counters (dimension, value, count) {_TICKET_COUNTER_SOURCE}'
+    ]),
+    ('time-ordered integer keys for tickets and audit logs', [
+        # Rows move into tables keyed by an INTEGER PRIMARY KEY assigned in time
+        # order, so inserts append to the end of the table B-tree and the rowid
+        # that the FTS indexes and keyset cursors use survives VACUUM. The
+        # public id stays TEXT; new ids are ULIDs (see new_id()).
+        '''CREATE TABLE tickets_rebuild (
+            seq INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            description TEXT,
+            status TEXT DEFAULT 'open',
+            priority TEXT DEFAULT 'medium',
+            category TEXT,
+            assigned_to TEXT,
+            created_by TEXT DEFAULT 'System',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            resolved_at TIMESTAMP,
+            resolution TEXT
+        )''',
+        f'''INSERT INTO tickets_rebuild ({_TICKET_COLUMNS})
+            SELECT {_TICKET_COLUMNS} FROM tickets ORDER BY created_at, rowid''',
+        'DROP TABLE tickets',
+        'ALTER TABLE tickets_rebuild RENAME TO tickets',
+        '''CREATE TABLE audit_logs_rebuild (
+            seq INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            action TEXT NOT NULL,
+            details TEXT,
+            user TEXT DEFAULT 'System',
+            ip_address TEXT,
+            user_agent TEXT
+        )''',
+        f'''INSERT INTO audit_logs_rebuild ({_AUDIT_LOG_COLUMNS})
+            SELECT {_AUDIT_LOG_COLUMNS} FROM audit_logs ORDER BY timestamp, rowid''',
+        'DROP TABLE audit_logs',
+        'ALTER TABLE audit_logs_rebuild RENAME TO audit_logs'
+    ] + _TICKET_INDEXES + _AUDIT_LOG_INDEXES + _TICKETS_FTS_TRIGGERS + _audit_log_fts_triggers('audit_logs') + _TICKET_COUNTER_TRIGGERS + [
+        # Every row has a new rowid; the counters do not depend on it
+        "INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild')",
+        "INSERT INTO audit_logs_fts (audit_logs_fts) VALUES ('rebuild')"
+    ]),
+    ('monthly audit log partitions', [
+        # Live partitions, one table per 'YYYY-MM' month of audit_logs timestamps
+        '''CREATE TABLE IF NOT EXISTS audit_partitions (
+            month TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        # Compressed NDJSON files of expired partitions
+        '''CREATE TABLE IF NOT EXISTS audit_archives (
+            path TEXT PRIMARY KEY,
+            month TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_audit_archives_month ON audit_archives (month)',
+        Backfill('audit_logs', lambda conn, start, end: _copy_audit_logs_to_partitions(conn, start, end)),
+        'DROP TABLE audit_logs_fts',
+        'DROP TABLE audit_logs'
+    ]),
+    ('settings version counter', [
+        # Bumped by any write to settings, from any process, so caches can
+        # revalidate with one single-row read
+        '''CREATE TABLE IF NOT EXISTS settings_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )''',
+        'INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 0)'
+    ] + [
+        f'''CREATE TRIGGER IF NOT EXISTS settings_version_{event.lower()} AFTER {event} ON settings BEGIN
+            UPDATE settings_version SET version = version + 1 WHERE id = 1;
+        END'''
+        for event in ('INSERT', 'UPDATE', 'DELETE')
+    ]),
+    ('maintenance run history', [
+        '''CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY,
+            started_at TIMESTAMP NOT NULL,
+            trigger TEXT NOT NULL,
+            duration_ms REAL,
+            bytes_before INTEGER,
+            bytes_after INTEGER,
+            bytes_reclaimed INTEGER,
+            freelist_before INTEGER,
+            freelist_after INTEGER,
+            tasks TEXT
+        )'''
+    ]),
+    ('device change tracking', [
+        # Hash of the tracked attributes, so an unchanged check-in only touches last_seen
+        'ALTER TABLE device_inventory ADD COLUMN attributes_hash TEXT',
+        '''CREATE TABLE IF NOT EXISTS device_history (
+            id INTEGER PRIMARY KEY,
+            device_id TEXT NOT NULL,
+            changed_at TIMESTAMP NOT NULL,
+            changes TEXT NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_device_history_device ON device_history (device_id, id)'
+    ])
+]
+
+def get_schema_version(conn):
+    """Get the number of schema migrations applied to a database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def _ensure_migration_ledger(conn):
+    """Create schema_migrations, seeding it from PRAGMA user_version on older databases"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            component TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            description TEXT,
+            state TEXT NOT NULL DEFAULT 'running',
+            step INTEGER NOT NULL DEFAULT 0,
+            checkpoint TEXT,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            applied_at TIMESTAMP,
+            duration_ms REAL,
+            PRIMARY KEY (component, version)
+        )
+    ''')
+    recorded = conn.execute("SELECT COUNT(*) FROM schema_migrations WHERE component = 'core'").fetchone()[0]
+    if recorded == 0:
+        # Databases migrated before the ledger existed only have the version number
+        conn.executemany(
+            "INSERT INTO schema_migrations (component, version, description, state, started_at) VALUES ('core', ?, ?, 'applied', NULL)",
+            [(version, description) for version, (description, _) in
+             enumerate(SCHEMA_MIGRATIONS[:get_schema_version(conn)], start=1)]
+        )
+    conn.commit()
+
+def _migration_steps(statements):
+    """Group a migration's statements into steps: runs of plain statements, and Backfills"""
+    steps = []
+    for statement in statements:
+        if isinstance(statement, Backfill):
+            steps.append(statement)
+        elif steps and isinstance(steps[-1], list):
+            steps[-1].append(statement)
+        else:
+            steps.append([statement])
+    return steps
+
+def _run_statements(conn, statements):
+    """Execute a group of plain migration statements on the current transaction"""
+    for statement in statements:
+        if callable(statement):
+            statement(conn)
+        else:
+            conn.execute(statement)
+
+def _pending_migrations(conn, migrations, component):
+    """List (version, description, steps, first step) for migrations not yet applied"""
+    progress = {
+        row['version']: row for row in conn.execute(
+            'SELECT version, state, step FROM schema_migrations WHERE component = ?', (component,)
+        )
+    }
+    pending = []
+    for version, (description, statements) in enumerate(migrations, start=1):
+        row = progress.get(version)
+        if row is not None and row['state'] == 'applied':
+            continue
+        pending.append((version, description, _migration_steps(statements), row['step'] if row else 0))
+    return pending
+
+def _print_progress(event):
+    """Default migration progress reporter"""
+    if event['rows_total']:
+        eta = f", ETA {event['eta_seconds']:.0f}s" if event['eta_seconds'] is not None else ''
+        print(f"🔧 Migration {event['version']} step {event['step']}/{event['steps']}: "
+              f"{event['rows_done']:,}/{event['rows_total']:,} rows{eta}")
+
+def migrate_db(conn, migrations=None, component='core', progress=_print_progress, dry_run=False):
+    """Apply pending schema migrations
+    
+    Runs of plain statements commit as one transaction; Backfill steps commit
+    per chunk. The step reached and the backfill position are saved in
+    schema_migrations in the same transactions, so a migration interrupted
+    part-way resumes from its last commit. progress is called with a dict
+    after each backfill chunk (at most once a second). With dry_run the
+    migrations are only estimated (see plan_migrations()).
+    """
+    migrations = SCHEMA_MIGRATIONS if migrations is None else migrations
+    if dry_run:
+        return plan_migrations(conn, migrations, component)
+    _ensure_migration_ledger(conn)
+    
+    for version, description, steps, first_step in _pending_migrations(conn, migrations, component):
+        conn.execute(
+            "INSERT OR IGNORE INTO schema_migrations (component, version, description) VALUES (?, ?, ?)",
+            (component, version, description)
+        )
+        conn.commit()
+        
+        for index in range(first_step, len(steps)):
+            step = steps[index]
+            if isinstance(step, Backfill):
+                _run_backfill(conn, component, version, index, steps, step, progress)
+                continue
+            conn.execute('BEGIN')
+            try:
+                _run_statements(conn, step)
+                _finish_step(conn, component, version, index, steps)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        print(f"🔧 Applied migration {version}: {description}")
+
+def _finish_step(conn, component, version, index, steps):
+    """Record a completed step on the current transaction, completing the migration after the last"""
+    if index + 1 < len(steps):
+        conn.execute(
+            'UPDATE schema_migrations SET step = ?, checkpoint = NULL WHERE component = ? AND version = ?',
+            (index + 1, component, version)
+        )
+        return
+    conn.execute('''
+        UPDATE schema_migrations
+        SET state = 'applied', step = ?, checkpoint = NULL, applied_at = CURRENT_TIMESTAMP,
+            duration_ms = (julianday('now') - julianday(started_at)) * 86400000
+        WHERE component = ? AND version = ?
+    ''', (len(steps), component, version))
+    if component == 'core':
+        conn.execute(f'PRAGMA user_version = {version}')
+
+def _run_backfill(conn, component, version, index, steps, backfill, progress):
+    """Run a Backfill step chunk by chunk, resuming from its saved checkpoint"""
+    row = conn.execute(
+        'SELECT checkpoint FROM schema_migrations WHERE component = ? AND version = ?', (component, version)
+    ).fetchone()
+    if row['checkpoint']:
+        low, high, position = json.loads(row['checkpoint'])
+    else:
+        low, high = backfill.bounds(conn)
+        position = None if low is None else low - 1
+    
+    batch_size = backfill.batch_size or MIGRATION_BATCH_SIZE
+    started = last_report = time.monotonic()
+    resumed_from = position
+    
+    while True:
+        done = position is None or position >= high
+        end = None if done else min(position + batch_size, high)
+        conn.execute('BEGIN')
+        try:
+            if done or end == high:
+                if not done:
+                    backfill.run_chunk(conn, position, end)
+                _finish_step(conn, component, version, index, steps)
+            else:
+                backfill.run_chunk(conn, position, end)
+                conn.execute(
+                    'UPDATE schema_migrations SET checkpoint = ? WHERE component = ? AND version = ?',
+                    (json.dumps([low, high, end]), component, version)
+                )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        if done or end == high:
+            break
+        
+        position = end
+        now = time.monotonic()
+        if progress and now - last_report >= 1:
+            last_report = now
+            progress(_backfill_progress(version, index, steps, low, high, position, resumed_from, now - started))
+    
+    if progress and low is not None:
+        progress(_backfill_progress(version, index, steps, low, high, high, resumed_from, time.monotonic() - started))
+
+def _backfill_progress(version, index, steps, low, high, position, resumed_from, elapsed):
+    """Progress event for a backfill; rows are measured as a span of rowids"""
+    total = high - low + 1
+    done = position - low + 1
+    this_run = position - resumed_from
+    remaining = total - done
+    eta = elapsed / this_run * remaining if this_run > 0 else None
+    return {
+        'version': version, 'step': index + 1, 'steps': len(steps),
+        'rows_done': done, 'rows_total': total, 'elapsed_seconds': elapsed, 'eta_seconds': eta
+    }
+
+def plan_migrations(conn, migrations=None, component='core', sample_batches=3):
+    """Estimate how long pending migrations would take against this database
+    
+    Every pending step runs inside one transaction that is rolled back at the
+    end. Plain statements run in full and are timed; a Backfill runs only
+    sample_batches chunks and is extrapolated over its rowid span. The write
+    lock is held while the plan is measured, so schedule dry runs like a short
+    maintenance task. Returns a list of per-migration estimates.
+    """
+    migrations = SCHEMA_MIGRATIONS if migrations is None else migrations
+    plan = []
+    conn.execute('BEGIN')
+    try:
+        # The ledger may not exist yet; creating it here is rolled back too
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                component TEXT NOT NULL, version INTEGER NOT NULL, state TEXT, step INTEGER,
+                PRIMARY KEY (component, version)
+            )
+        ''')
+        if component == 'core' and not conn.execute(
+                "SELECT 1 FROM schema_migrations WHERE component = 'core' LIMIT 1").fetchone():
+            pending = [
+                (version, description, _migration_steps(statements), 0)
+                for version, (description, statements) in enumerate(migrations, start=1)
+                if version > get_schema_version(conn)
+            ]
+        else:
+            pending = _pending_migrations(conn, migrations, component)
+        
+        for version, description, steps, first_step in pending:
+            estimates = []
+            for step in steps[first_step:]:
+                started = time.perf_counter()
+                if isinstance(step, Backfill):
+                    estimates.append(_sample_backfill(conn, step, sample_batches))
+                else:
+                    _run_statements(conn, step)
+                    estimates.append({'kind': 'statements', 'count': len(step),
+                                      'seconds': time.perf_counter() - started})
+            plan.append({
+                'version': version, 'description': description, 'steps': estimates,
+                'estimated_seconds': sum(step['seconds'] for step in estimates)
+            })
+    finally:
+        conn.rollback()
+    return plan
+
+def _sample_backfill(conn, backfill, sample_batches):
+    """Time a few chunks of a backfill and extrapolate to the whole table"""
+    low, high = backfill.bounds(conn)
+    if low is None:
+        return {'kind': 'backfill', 'table': backfill.table, 'rows': 0, 'seconds': 0.0}
+    
+    batch_size = backfill.batch_size or MIGRATION_BATCH_SIZE
+    position = low - 1
+    started = time.perf_counter()
+    for _ in range(sample_batches):
+        if position >= high:
+            break
+        end = min(position + batch_size, high)
+        backfill.run_chunk(conn, position, end)
+        position = end
+    elapsed = time.perf_counter() - started
+    total = high - low + 1
+    return {
+        'kind': 'backfill', 'table': backfill.table, 'rows': total,
+        'seconds': elapsed * total / (position - low + 1)
+    }
+
+def get_migration_status(component=None):
+    """List recorded migrations with their state, progress and timing"""
+    with get_db_connection() as conn:
+        _ensure_migration_ledger(conn)
+        query = 'SELECT * FROM schema_migrations'
+        params = []
+        if component:
+            query += ' WHERE component = ?'
+            params.append(component)
+        rows = conn.execute(query + ' ORDER BY component, version', params).fetchall()
+        return [dict(row) for row in rows]
+
+# ==================== PAGINATION ====================
+
+# Columns returned for tickets and audit logs, in pages, lookups and exports.
+# The seq row key stays internal; cursors already carry it as the rowid.
+TICKET_COLUMNS = ['id', 'title', 'description', 'status', 'priority', 'category', 'assigned_to', 'created_by',
+                  'created_at', 'updated_at', 'resolved_at', 'resolution']
+AUDIT_LOG_COLUMNS = ['id', 'timestamp', 'action', 'details', 'user', 'ip_address', 'user_agent']
+
+def encode_cursor(sort_value, row_id):
+    """Encode a (sort value, rowid) keyset position as an opaque cursor"""
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor(), raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(sort_value, str) or not isinstance(row_id, int):
+        raise ValueError('Invalid cursor')
+    return sort_value, row_id
+
+def _keyset_page(conn, table, columns, query, params, limit, sort_column, as_json=False):
+    """Run a newest-first keyset query and split off the next cursor
+    
+    The query must select {columns} from table and order by
+    (sort_column, rowid) DESC. Indexes on sort_column already hold the rowid,
+    so the tiebreak needs no extra index column and keeps insertion order for
+    rows sharing a timestamp. One extra row is fetched to tell whether another
+    page exists. With as_json the page is returned as a JSON array string
+    (see _page_columns()).
+    """
+    db_cursor = conn.cursor()
+    if as_json:
+        db_cursor.row_factory = None
+    db_cursor.execute(query.format(columns=_page_columns(conn, table, columns, sort_column, as_json)), params + [limit + 1])
+    rows = db_cursor.fetchall()
+    if as_json:
+        return _split_json_page(rows, limit)
+    return _split_page([dict(row) for row in rows], limit, sort_column)
+
+def _page_columns(conn, table, columns, sort_column, as_json):
+    """Select list for a keyset page query
+    
+    Normally the given columns plus rowid AS _rowid. With as_json, SQLite encodes
+    each row itself with json_object(), so no Row or dict is built per row and
+    the page is joined into the response as text; the sort value and rowid
+    follow for the next cursor.
+    """
+    if as_json:
+        return f'{json_object_sql(conn, table, columns)}, {sort_column}, rowid'
+    return 'rowid AS _rowid, ' + ', '.join(columns)
+
+def _split_page(rows, limit, sort_column):
+    """Trim up to limit + 1 keyset rows to one page and work out the next cursor"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][sort_column], rows[-1]['_rowid'])
+    for row in rows:
+        del row['_rowid']
+    return rows, next_cursor
+
+def _split_json_page(rows, limit):
+    """_split_page() for (JSON text, sort value, rowid) rows, returning the page as a JSON array string"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][2])
+    return '[' + ','.join(row[0] for row in rows) + ']', next_cursor
+
+def json_object_sql(conn, table, columns=None):
+    """SQL expression that encodes a row of table as JSON object text
+    
+    columns defaults to every column of the table, in SELECT * order, so the
+    objects match dict(row) for SELECT *.
+    """
+    if columns is None:
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+    return 'json_object(' + ', '.join(f"'{column}', \"{column}\"" for column in columns) + ')'
+
+# ==================== RECORD IDS ====================
+
+_CROCKFORD_BASE32 = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+def new_id():
+    """Generate a ULID for a new ticket or audit log entry
+    
+    26 Crockford base32 characters: a 48-bit millisecond timestamp followed
+    by 80 random bits, so ids sort in creation order and new ones land at
+    the end of the id index instead of at random pages.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    chars = []
+    for _ in range(26):
+        value, digit = divmod(value, 32)
+        chars.append(_CROCKFORD_BASE32[digit])
+    return ''.join(reversed(chars))
+
+def display_id(record_id):
+    """Short upper-case form of an id for audit messages and the UI
+    
+    A ULID's leading characters are its timestamp and repeat for ids created
+    close together, so ULIDs are shortened to their last 8 (random)
+    characters. Older UUID ids keep their first 8, as before.
+    """
+    if len(record_id) == 26:
+        return record_id[-8:].upper()
+    return record_id[:8].upper()
 
 # ==================== TICKET OPERATIONS ====================
 
 def create_ticket(ticket_data):
     """Create a new ticket"""
-    import uuid
-    ticket_id = str(uuid.uuid4())
+    ticket_id = new_id()
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
@@ -118,28 +1247,122 @@ def create_ticket(ticket_data):
     
     return ticket_id
 
+TICKET_STATUSES = ('open', 'in-progress', 'resolved', 'closed')
+TICKET_PRIORITIES = ('low', 'medium', 'high', 'critical')
+
+# Tickets inserted per transaction by create_tickets_bulk()
+TICKET_BULK_BATCH_SIZE = int(os.environ.get('TICKET_BULK_BATCH_SIZE', 1000))
+
+_TICKET_TEXT_FIELDS = ('title', 'description', 'category', 'assigned_to', 'created_by')
+
+def validate_ticket(ticket_data):
+    """Check one ticket for bulk import, returning its column values in insert order
+    
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(ticket_data, dict):
+        raise ValueError('Ticket must be a JSON object')
+    for field in _TICKET_TEXT_FIELDS:
+        value = ticket_data.get(field)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"'{field}' must be a string")
+    
+    title = (ticket_data.get('title') or '').strip()
+    if not title:
+        raise ValueError("'title' is required")
+    status = ticket_data.get('status') or 'open'
+    if status not in TICKET_STATUSES:
+        raise ValueError(f"'status' must be one of {', '.join(TICKET_STATUSES)}")
+    priority = ticket_data.get('priority') or 'medium'
+    if priority not in TICKET_PRIORITIES:
+        raise ValueError(f"'priority' must be one of {', '.join(TICKET_PRIORITIES)}")
+    
+    return (
+        title,
+        ticket_data.get('description') or '',
+        status,
+        priority,
+        ticket_data.get('category') or 'General',
+        ticket_data.get('assigned_to') or '',
+        ticket_data.get('created_by') or 'System'
+    )
+
+def create_tickets_bulk(tickets, batch_size=None):
+    """Validate and insert many tickets, one transaction per batch
+    
+    Returns one result per input ticket, in order: {'index', 'status': 'created',
+    'id'} or {'index', 'status': 'error', 'message'}. Invalid tickets are
+    reported and skipped without affecting the rest; if a batch fails to
+    insert, every ticket in that batch is reported as failed.
+    """
+    batch_size = batch_size or TICKET_BULK_BATCH_SIZE
+    results = []
+    valid = []  # (result, row)
+    for index, ticket_data in enumerate(tickets):
+        try:
+            row = (new_id(),) + validate_ticket(ticket_data)
+        except ValueError as e:
+            results.append({'index': index, 'status': 'error', 'message': str(e)})
+            continue
+        result = {'index': index, 'status': 'created', 'id': row[0]}
+        results.append(result)
+        valid.append((result, row))
+    
+    with get_db_connection() as conn:
+        for start in range(0, len(valid), batch_size):
+            batch = valid[start:start + batch_size]
+            try:
+                conn.executemany('''
+                    INSERT INTO tickets (id, title, description, status, priority, category, assigned_to, created_by)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [row for _, row in batch])
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                for result, _ in batch:
+                    del result['id']
+                    result.update(status='error', message=f'Insert failed: {e}')
+    
+    return results
+
 def get_all_tickets(status_filter=None, limit=100):
     """Get all tickets, optionally filtered by status"""
+    tickets, _ = get_tickets_page(status_filter=status_filter, limit=limit)
+    return tickets
+
+def get_tickets_page(status_filter=None, limit=100, cursor=None, as_json=False):
+    """Get one page of tickets, newest first, and the cursor for the next page
+    
+    Pages are addressed by an opaque (created_at, rowid) cursor rather than an
+    OFFSET, so every page costs the same index range scan regardless of depth.
+    With as_json the page is a JSON array string instead of a list of dicts.
+    """
+    conditions = []
+    params = []
+    
+    if status_filter:
+        conditions.append('status = ?')
+        params.append(status_filter)
+    
+    if cursor:
+        created_at, rowid = decode_cursor(cursor)
+        conditions.append('(created_at, rowid) < (?, ?)')
+        params.extend([created_at, rowid])
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        if status_filter:
-            cursor.execute('''
-                SELECT * FROM tickets WHERE status = ? ORDER BY created_at DESC LIMIT ?
-            ''', (status_filter, limit))
-        else:
-            cursor.execute('''
-                SELECT * FROM tickets ORDER BY created_at DESC LIMIT ?
-            ''', (limit,))
-        
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        return _keyset_page(
+            conn, 'tickets', TICKET_COLUMNS,
+            f'SELECT {{columns}} FROM tickets {where} ORDER BY created_at DESC, rowid DESC LIMIT ?',
+            params, limit, 'created_at', as_json
+        )
 
 def get_ticket_by_id(ticket_id):
     """Get a single ticket by ID"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM tickets WHERE id = ?', (ticket_id,))
+        cursor.execute(f"SELECT {', '.join(TICKET_COLUMNS)} FROM tickets WHERE id = ?", (ticket_id,))
         row = cursor.fetchone()
         return dict(row) if row else None
 
@@ -179,77 +1402,777 @@ def delete_ticket(ticket_id):
         conn.commit()
         return cursor.rowcount > 0
 
+def build_fts_query(text):
+    """Turn free text into a safe FTS5 MATCH expression
+    
+    Every whitespace-separated term is quoted so punctuation and FTS5
+    operators in user input are matched literally; a trailing * keeps the
+    term as a prefix query (e.g. 'print*' matches 'printer').
+    """
+    terms = [term for term in map(_quote_fts_term, text.split()) if term]
+    if not terms:
+        raise ValueError('Search query is empty')
+    return ' '.join(terms)
+
+def _quote_fts_term(word):
+    """Quote one search term for FTS5, keeping a trailing * as a prefix query"""
+    prefix = word.endswith('*')
+    word = word.rstrip('*').replace('"', '')
+    if not word:
+        return None
+    return f'"{word}"*' if prefix else f'"{word}"'
+
+# snippet() delimiters; the text is HTML-escaped before they become <mark> tags
+SNIPPET_OPEN = '\x02'
+SNIPPET_CLOSE = '\x03'
+
+def _highlight_snippet(snippet):
+    """HTML-escape a snippet and wrap its matched terms in <mark> tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(SNIPPET_OPEN, '<mark>').replace(SNIPPET_CLOSE, '</mark>')
+
+def search_tickets(query, limit=20, status_filter=None):
+    """Full-text search over ticket titles, descriptions and resolutions
+    
+    Results are ranked by bm25 with title matches weighted highest, and each
+    carries an HTML-escaped snippet with the matched terms wrapped in <mark>
+    tags, safe to insert as markup.
+    """
+    params = [build_fts_query(query)]
+    status_clause = ''
+    if status_filter:
+        status_clause = 'AND t.status = ?'
+        params.append(status_filter)
+    params.append(limit)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        # ORDER BY the hidden rank column is sorted inside FTS5, so only the
+        # rows that survive the LIMIT are joined and get a snippet
+        cursor.execute(f'''
+            SELECT {', '.join(f't.{column}' for column in TICKET_COLUMNS)},
+                   tickets_fts.rank AS rank,
+                   snippet(tickets_fts, -1, ?, ?, '…', 12) AS snippet
+            FROM tickets_fts
+            JOIN tickets t ON t.rowid = tickets_fts.rowid
+            WHERE tickets_fts MATCH ? {status_clause}
+            ORDER BY tickets_fts.rank
+            LIMIT ?
+        ''', [SNIPPET_OPEN, SNIPPET_CLOSE] + params)
+        rows = cursor.fetchall()
+    results = []
+    for row in rows:
+        result = dict(row)
+        result['snippet'] = _highlight_snippet(result['snippet'])
+        results.append(result)
+    return results
+
 def get_ticket_stats():
-    """Get ticket statistics"""
+    """Get ticket statistics
+    
+    Reads the trigger-maintained ticket_counters table, so the cost depends on
+    the number of distinct statuses, priorities and categories rather than the
+    number of tickets.
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'open' THEN 1 ELSE 0 END) as open,
-                SUM(CASE WHEN status = 'in-progress' THEN 1 ELSE 0 END) as in_progress,
-                SUM(CASE WHEN status = 'resolved' THEN 1 ELSE 0 END) as resolved,
-                SUM(CASE WHEN status = 'closed' THEN 1 ELSE 0 END) as closed
-            FROM tickets
-        ''')
-        
-        row = cursor.fetchone()
-        return dict(row) if row else {}
+        cursor.execute('SELECT dimension, value, count FROM ticket_counters WHERE count != 0')
+        rows = cursor.fetchall()
+    
+    breakdown = {'status': {}, 'priority': {}, 'category': {}}
+    total = 0
+    for row in rows:
+        if row['dimension'] == 'total':
+            total = row['count']
+        else:
+            breakdown[row['dimension']][row['value']] = row['count']
+    
+    by_status = breakdown['status']
+    return {
+        'total': total,
+        'open': by_status.get('open', 0),
+        'in_progress': by_status.get('in-progress', 0),
+        'resolved': by_status.get('resolved', 0),
+        'closed': by_status.get('closed', 0),
+        'by_status': by_status,
+        'by_priority': breakdown['priority'],
+        'by_category': breakdown['category']
+    }
+
+def reconcile_ticket_counters():
+    """Rebuild ticket_counters from the tickets table and report any drift
+    
+    Returns the rows whose stored count differed from the real one, as
+    {'dimension', 'value', 'stored', 'actual'} dicts. The rebuild runs in an
+    IMMEDIATE transaction so no ticket write can slip in between the recount
+    and the rewrite.
+    """
+    with get_db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            stored = {
+                (row[0], row[1]): row[2]
+                for row in conn.execute('SELECT dimension, value, count FROM ticket_counters')
+            }
+            actual = {(row[0], row[1]): row[2] for row in conn.execute(_TICKET_COUNTER_SOURCE)}
+            
+            conn.execute('DELETE FROM ticket_counters')
+            conn.executemany(
+                'INSERT INTO ticket_counters (dimension, value, count) VALUES (?, ?, ?)',
+                [(dimension, value, count) for (dimension, value), count in actual.items()]
+            )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    
+    drift = []
+    for key in sorted(stored.keys() | actual.keys()):
+        if stored.get(key, 0) != actual.get(key, 0):
+            drift.append({
+                'dimension': key[0], 'value': key[1],
+                'stored': stored.get(key, 0), 'actual': actual.get(key, 0)
+            })
+    return drift
 
 # ==================== AUDIT LOG OPERATIONS ====================
 
 def add_audit_log(action, details, user="System", ip_address=None, user_agent=None):
     """Add an entry to the audit log"""
-    import uuid
-    log_id = str(uuid.uuid4())
+    log_id = new_id()
+    timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    insert_audit_logs([(log_id, timestamp, action, details, user, ip_address, user_agent)])
+    return log_id
+
+def insert_audit_logs(entries):
+    """Insert a batch of audit log entries in one transaction
+    
+    Each entry is an (id, timestamp, action, details, user, ip_address, user_agent) tuple.
+    Entries are routed to the partition for their timestamp's month, which is
+    created on first use.
+    """
+    by_month = {}
+    for entry in entries:
+        by_month.setdefault(_audit_month(entry[1]), []).append(entry)
     
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO audit_logs (id, action, details, user, ip_address, user_agent)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (log_id, action, details, user, ip_address, user_agent))
+        created = []
+        for month, month_entries in by_month.items():
+            table, is_new = _ensure_audit_partition(conn, month)
+            if is_new:
+                created.append(month)
+            conn.executemany(f'''
+                INSERT INTO {table} (id, timestamp, action, details, user, ip_address, user_agent)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', month_entries)
         conn.commit()
+    # Only remember partitions once their CREATE has been committed
+    _audit_partition_cache.update((_database_key(), month) for month in created)
+
+# Field names accepted in audit search queries, mapped to audit_logs_fts columns
+AUDIT_SEARCH_FIELDS = {
+    'action': 'action',
+    'details': 'details',
+    'user': 'user',
+    'ip': 'ip_address',
+    'ip_address': 'ip_address'
+}
+
+def build_audit_search_query(text):
+    """Turn an audit search string into an FTS5 MATCH expression
     
-    return log_id
+    Terms may be scoped to one field, e.g. 'user:admin details:"disk full"';
+    bare terms match any of action, details, user and IP address. Double
+    quotes group a phrase. Only a known field name before the first colon is
+    interpreted; anything else, such as '10:30' or 'fe80::1', is searched for
+    literally. Terms are quoted as in build_fts_query().
+    """
+    lexer = shlex.shlex(text, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ''
+    # Only double quotes group, so apostrophes and backslashes stay literal
+    lexer.quotes = '"'
+    lexer.escape = ''
+    try:
+        words = list(lexer)
+    except ValueError as e:
+        raise ValueError('Unbalanced quotes in search query') from e
+    
+    terms = []
+    for word in words:
+        field, sep, value = word.partition(':')
+        column = AUDIT_SEARCH_FIELDS.get(field.lower()) if sep else None
+        if column is not None:
+            term = _quote_fts_term(value)
+            if term:
+                terms.append(f'{column} : {term}')
+        else:
+            term = _quote_fts_term(word)
+            if term:
+                terms.append(term)
+    
+    if not terms:
+        raise ValueError('Search query is empty')
+    return ' '.join(terms)
 
-def get_audit_logs(limit=100, action_filter=None):
+def _normalize_timestamp(value, sep=' '):
+    """Convert an ISO 8601 date or datetime to the UTC format stored in audit_logs"""
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid timestamp '{value}'") from e
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime(f'%Y-%m-%d{sep}%H:%M:%S')
+
+def get_audit_logs(limit=100, action_filter=None, include_archived=False):
     """Get audit logs, optionally filtered by action"""
+    logs, _ = get_audit_logs_page(limit=limit, action_filter=action_filter, include_archived=include_archived)
+    return logs
+
+def get_audit_logs_page(limit=100, action_filter=None, cursor=None, search=None, since=None, until=None,
+                        include_archived=False, as_json=False):
+    """Get one page of audit logs, newest first, and the cursor for the next page
+    
+    search is a full-text query (see build_audit_search_query()) answered from
+    each partition's FTS index. since (inclusive) and until (exclusive) bound the
+    timestamp, so the page is read from a range of the timestamp index and
+    partitions outside the range are never opened. With include_archived,
+    archived months are read back from their NDJSON files as well. With as_json
+    the page is a JSON array string instead of a list of dicts.
+    """
+    conditions = []
+    params = []
+    first_month = last_month = None
+    
+    if action_filter:
+        conditions.append('action LIKE ?')
+        params.append(f'%{action_filter}%')
+    
+    if search:
+        # With a time range, unary + stops the planner driving the query from the
+        # FTS match list, so it walks the timestamp index range and stops at LIMIT
+        rowid_column = '+rowid' if since or until else 'rowid'
+        conditions.append(f'{rowid_column} IN (SELECT rowid FROM {{fts}} WHERE {{fts}} MATCH ?)')
+        params.append(build_audit_search_query(search))
+    
+    if since:
+        since = _normalize_timestamp(since)
+        conditions.append('timestamp >= ?')
+        params.append(since)
+        first_month = since[:7]
+    
+    if until:
+        until = _normalize_timestamp(until)
+        conditions.append('timestamp < ?')
+        params.append(until)
+        last_month = until[:7]
+    
+    if cursor:
+        timestamp, rowid = decode_cursor(cursor)
+        conditions.append('(timestamp, rowid) < (?, ?)')
+        params.extend([timestamp, rowid])
+        last_month = min(last_month or timestamp[:7], timestamp[:7])
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    query = f'SELECT {{columns}} FROM {{table}} {where} ORDER BY timestamp DESC, rowid DESC LIMIT ?'
+    
+    rows = []
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        if action_filter:
-            cursor.execute('''
-                SELECT * FROM audit_logs WHERE action LIKE ? ORDER BY timestamp DESC LIMIT ?
-            ''', (f'%{action_filter}%', limit))
+        for month, table, archive_path in _audit_sources(conn, first_month, last_month, include_archived):
+            wanted = limit + 1 - len(rows)
+            if wanted <= 0:
+                break
+            if archive_path:
+                archive = _load_audit_archive(archive_path)
+                with archive.lock:
+                    found = _audit_page_rows(archive.conn, table, query, params + [wanted], as_json)
+            else:
+                found = _audit_page_rows(conn, table, query, params + [wanted], as_json)
+            rows.extend(found)
+    
+    if as_json:
+        return _split_json_page(rows, limit)
+    return _split_page(rows, limit, 'timestamp')
+
+def _audit_page_rows(conn, table, query, params, as_json):
+    """Rows of one audit source for get_audit_logs_page()"""
+    db_cursor = conn.cursor()
+    if as_json:
+        db_cursor.row_factory = None
+    columns = _page_columns(conn, table, AUDIT_LOG_COLUMNS, 'timestamp', as_json)
+    db_cursor.execute(query.format(columns=columns, table=table, fts=f'{table}_fts'), params)
+    if as_json:
+        return db_cursor.fetchall()
+    return [dict(row) for row in db_cursor.fetchall()]
+
+def clear_old_audit_logs(days=30, archive=None):
+    """Expire audit logs older than specified days
+    
+    Retention is by whole month: every partition whose month ended before the
+    cutoff is dropped, while the month containing the cutoff is kept until it
+    has expired completely. Returns the number of rows removed.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    expired = expire_audit_partitions(cutoff.strftime('%Y-%m'), archive=archive)
+    return sum(partition['rows'] for partition in expired)
+
+# ==================== AUDIT LOG PARTITIONS ====================
+
+# Whether expired partitions are written to compressed NDJSON before they are dropped
+AUDIT_ARCHIVE_EXPIRED = os.environ.get('AUDIT_ARCHIVE_EXPIRED', 'true').lower() in ('1', 'true', 'yes')
+# Directory for the archives; defaults to data/audit_archive next to the database
+AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR')
+# Archived months kept decompressed in memory for repeat queries
+AUDIT_ARCHIVE_CACHE_SIZE = int(os.environ.get('AUDIT_ARCHIVE_CACHE_SIZE', 2))
+
+_MONTH_PATTERN = re.compile(r'^\d{4}-\d{2}$')
+
+# (database path, month) pairs whose partition table is known to exist
+_audit_partition_cache = set()
+
+class _AuditArchive:
+    """An archived month loaded into an in-memory database for querying"""
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+_archive_cache = OrderedDict()  # archive path -> _AuditArchive
+_archive_cache_lock = threading.Lock()
+
+def _audit_month(timestamp):
+    """Get the 'YYYY-MM' partition month for an audit log timestamp"""
+    month = (timestamp or '')[:7]
+    if not _MONTH_PATTERN.match(month):
+        raise ValueError(f"Invalid audit log timestamp '{timestamp}'")
+    return month
+
+def _audit_partition_table(month):
+    """Name of the table holding one month of audit logs"""
+    return f"audit_logs_p{month.replace('-', '')}"
+
+def _ensure_audit_partition(conn, month):
+    """Create a month's partition if needed, returning (table name, whether it was created)
+    
+    Raises ValueError for a month that has already been archived: a second
+    live partition would be read as a separate source alongside the archive
+    and break newest-first ordering and cursors.
+    """
+    table = _audit_partition_table(month)
+    if (_database_key(), month) in _audit_partition_cache:
+        return table, False
+    if conn.execute('SELECT 1 FROM audit_archives WHERE month = ?', (month,)).fetchone():
+        raise ValueError(f"Audit logs for {month} have been archived and cannot be added to")
+    for statement in _audit_partition_schema(table):
+        conn.execute(statement)
+    conn.execute('INSERT OR IGNORE INTO audit_partitions (month, table_name) VALUES (?, ?)', (month, table))
+    return table, True
+
+# Audit logs whose timestamp has no usable month when migrated to partitions;
+# kept here rather than dropped with the old table
+AUDIT_QUARANTINE_TABLE = 'audit_logs_quarantine'
+
+def _copy_audit_logs_to_partitions(conn, start, end):
+    """Migration backfill: copy one rowid chunk of the old audit_logs table into monthly partitions"""
+    months = [row[0] for row in conn.execute(
+        "SELECT DISTINCT substr(timestamp, 1, 7) FROM audit_logs WHERE rowid > ? AND rowid <= ?", (start, end)
+    )]
+    for month in months:
+        try:
+            table = _audit_partition_table(_audit_month(month))
+        except ValueError:
+            table = AUDIT_QUARANTINE_TABLE
+        for statement in _audit_partition_schema(table):
+            conn.execute(statement)
+        # IS rather than = so rows with a NULL timestamp are copied too
+        copied = conn.execute(f'''
+            INSERT INTO {table} (id, timestamp, action, details, user, ip_address, user_agent)
+            SELECT id, timestamp, action, details, user, ip_address, user_agent
+            FROM audit_logs WHERE rowid > ? AND rowid <= ? AND substr(timestamp, 1, 7) IS ? ORDER BY seq
+        ''', (start, end, month)).rowcount
+        if table == AUDIT_QUARANTINE_TABLE:
+            print(f"⚠️ Moved {copied} audit logs with unrecognised timestamp month '{month}' to {table}")
         else:
-            cursor.execute('''
-                SELECT * FROM audit_logs ORDER BY timestamp DESC LIMIT ?
-            ''', (limit,))
+            conn.execute('INSERT OR IGNORE INTO audit_partitions (month, table_name) VALUES (?, ?)', (month, table))
+
+def _audit_sources(conn, first_month, last_month, include_archived):
+    """List (month, table, archive path) sources for a month range, newest first
+    
+    Live partitions are read from the database (archive path None); archives
+    are loaded into a table named audit_logs.
+    """
+    sources = [
+        (row[0], row[1], None)
+        for row in conn.execute('SELECT month, table_name FROM audit_partitions')
+    ]
+    if include_archived:
+        sources.extend(
+            (row[0], 'audit_logs', row[1])
+            for row in conn.execute('SELECT month, path FROM audit_archives ORDER BY archived_at')
+        )
+    # Months sort newest first; within a month the live partition comes first
+    sources.sort(key=lambda source: (source[0], source[2] is None), reverse=True)
+    return [
+        source for source in sources
+        if (first_month is None or source[0] >= first_month) and (last_month is None or source[0] <= last_month)
+    ]
+
+def get_audit_partitions():
+    """List live audit log partitions and archived months"""
+    with get_db_connection() as conn:
+        live = [dict(row) for row in conn.execute('SELECT month, table_name, created_at FROM audit_partitions ORDER BY month')]
+        archived = [dict(row) for row in conn.execute('SELECT month, path, row_count, archived_at FROM audit_archives ORDER BY month')]
+    return {'live': live, 'archived': archived}
+
+def expire_audit_partitions(before_month, archive=None):
+    """Drop every live audit log partition for a month before before_month ('YYYY-MM')
+    
+    Each month is removed with DROP TABLE rather than a row-by-row DELETE, so
+    the write lock is held briefly however many rows the month holds. When
+    archive is true (default AUDIT_ARCHIVE_EXPIRED) the partition is first
+    written to a gzip-compressed NDJSON file, which get_audit_logs() can read
+    with include_archived.
+    """
+    archive = AUDIT_ARCHIVE_EXPIRED if archive is None else archive
+    expired = []
+    
+    with get_db_connection() as conn:
+        partitions = conn.execute(
+            'SELECT month, table_name FROM audit_partitions WHERE month < ? ORDER BY month', (before_month,)
+        ).fetchall()
         
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        for month, table in partitions:
+            replaced = []
+            if archive:
+                path, row_count, replaced = _archive_audit_month(conn, month, table)
+            else:
+                path = None
+                row_count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(f'DROP TABLE {table}_fts')
+                conn.execute(f'DROP TABLE {table}')
+                conn.execute('DELETE FROM audit_partitions WHERE month = ?', (month,))
+                if path:
+                    _replace_audit_archives(conn, month, path, row_count)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            
+            _audit_partition_cache.discard((_database_key(), month))
+            _discard_audit_archives(replaced)
+            expired.append({'month': month, 'rows': row_count, 'archive': path})
+    
+    merge_audit_archives()
+    return expired
 
-def clear_old_audit_logs(days=30):
-    """Clear audit logs older than specified days"""
+def merge_audit_archives():
+    """Merge months that have more than one archive file into a single file
+    
+    Older versions could archive a month twice; two archives of one month are
+    read as separate sources, out of order and with clashing seq values.
+    Returns the months merged.
+    """
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            DELETE FROM audit_logs WHERE timestamp < datetime('now', ?)
-        ''', (f'-{days} days',))
-        conn.commit()
-        return cursor.rowcount
+        months = [row[0] for row in conn.execute(
+            'SELECT month FROM audit_archives GROUP BY month HAVING COUNT(*) > 1 ORDER BY month'
+        )]
+        for month in months:
+            path, row_count, replaced = _archive_audit_month(conn, month)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                _replace_audit_archives(conn, month, path, row_count)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            _discard_audit_archives(replaced)
+    return months
+
+def _replace_audit_archives(conn, month, path, row_count):
+    """Record path as the one archive of a month (inside the caller's transaction)"""
+    conn.execute('DELETE FROM audit_archives WHERE month = ?', (month,))
+    conn.execute('INSERT INTO audit_archives (path, month, row_count) VALUES (?, ?, ?)', (path, month, row_count))
+
+def _discard_audit_archives(paths):
+    """Delete archive files that have been merged into a newer one"""
+    for path in paths:
+        with _archive_cache_lock:
+            cached = _archive_cache.pop(path, None)
+        if cached is not None:
+            with cached.lock:
+                cached.conn.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+def _archive_dir():
+    """Directory that expired audit log partitions are archived to"""
+    return AUDIT_ARCHIVE_DIR or os.path.join(os.path.dirname(DATABASE_PATH), 'audit_archive')
+
+def _archive_audit_month(conn, month, table=None):
+    """Write a month to a new compressed NDJSON file, returning (path, row count, replaced paths)
+    
+    The file holds the live partition table, if given, together with any
+    existing archives of the month, which it replaces. File names carry a
+    ULID, so an archive is never overwritten.
+    """
+    replaced = [row[0] for row in conn.execute(
+        'SELECT path FROM audit_archives WHERE month = ? ORDER BY archived_at, path', (month,)
+    )]
+    sources = [_read_audit_archive(path) for path in replaced]
+    if table is not None:
+        sources.append(dict(row) for row in conn.execute(f'SELECT * FROM {table} ORDER BY seq'))
+    rows = sources[0] if len(sources) == 1 else _merge_audit_rows(sources)
+    
+    directory = _archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'audit_logs_{month}.{new_id()}.ndjson.gz')
+    
+    row_count = 0
+    with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(',', ':')) + '\n')
+            row_count += 1
+    # Only a complete file is ever visible under the final name
+    os.replace(path + '.tmp', path)
+    return path, row_count, replaced
+
+def _read_audit_archive(path):
+    """Yield the rows of an archive file in seq order"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def _merge_audit_rows(sources):
+    """Interleave several sources of one month by timestamp, numbering seq afresh
+    
+    Each source numbers seq from 1, so the merged rows are renumbered. The
+    rows are sorted in a temporary on-disk database rather than in memory.
+    """
+    scratch = sqlite3.connect('')
+    try:
+        scratch.execute('CREATE TABLE merged (timestamp TEXT, source INTEGER, seq INTEGER, line TEXT)')
+        for index, rows in enumerate(sources):
+            scratch.executemany(
+                'INSERT INTO merged VALUES (?, ?, ?, ?)',
+                ((row['timestamp'], index, row['seq'], json.dumps(row)) for row in rows)
+            )
+        ordered = scratch.execute('SELECT line FROM merged ORDER BY timestamp, source, seq')
+        for seq, (line,) in enumerate(ordered, 1):
+            row = json.loads(line)
+            row['seq'] = seq
+            yield row
+    finally:
+        scratch.close()
+
+def _load_audit_archive(path):
+    """Load an archived month into memory with the same schema as a live partition"""
+    with _archive_cache_lock:
+        archive = _archive_cache.get(path)
+        if archive is not None:
+            _archive_cache.move_to_end(path)
+            return archive
+    
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for statement in _audit_partition_schema('audit_logs'):
+        conn.execute(statement)
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        # seq is kept so cursors issued from the archive stay valid
+        conn.executemany(
+            '''INSERT INTO audit_logs (seq, id, timestamp, action, details, user, ip_address, user_agent)
+               VALUES (:seq, :id, :timestamp, :action, :details, :user, :ip_address, :user_agent)''',
+            (json.loads(line) for line in f)
+        )
+    conn.commit()
+    archive = _AuditArchive(conn)
+    
+    with _archive_cache_lock:
+        _archive_cache[path] = archive
+        while len(_archive_cache) > AUDIT_ARCHIVE_CACHE_SIZE:
+            _, evicted = _archive_cache.popitem(last=False)
+            with evicted.lock:
+                evicted.conn.close()
+    return archive
+
+# ==================== STREAMING EXPORTS ====================
+
+# Each iter_* function checks its arguments immediately (raising ValueError)
+# and returns a generator that reads rows lazily, oldest first, so an export
+# uses the same memory however large the table is. Rows come from a snapshot
+# connection, so a long export never blocks writes made while it runs; in WAL
+# mode it does not see them either.
+
+# Rows read per short read transaction when exporting without WAL
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+
+def _time_range(column, since, until, sep=' '):
+    """SQL conditions and parameters bounding a timestamp column"""
+    conditions, params = [], []
+    if since:
+        conditions.append(f'{column} >= ?')
+        params.append(_normalize_timestamp(since, sep))
+    if until:
+        conditions.append(f'{column} < ?')
+        params.append(_normalize_timestamp(until, sep))
+    return conditions, params
+
+def _stream_query(table, columns, conditions, params, sort_column):
+    """Yield a table's rows as dicts from a snapshot connection"""
+    with get_snapshot_connection() as conn:
+        yield from _stream_rows(conn, table, columns, conditions, params, sort_column)
+
+def _stream_rows(conn, table, columns, conditions, params, sort_column):
+    """Yield rows ordered by (sort_column, rowid) from a snapshot connection
+    
+    On a WAL snapshot this is one statement. Otherwise the rows are read in
+    keyset batches of EXPORT_BATCH_SIZE, each a statement of its own, so the
+    shared lock is held only while one batch is read; rows committed between
+    batches may then appear in the export.
+    """
+    select = ', '.join(columns)
+    order = f'ORDER BY {sort_column}, rowid'
+    if conn.in_transaction:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        for row in conn.execute(f'SELECT {select} FROM {table} {where} {order}', params):
+            yield dict(row)
+        return
+    
+    after = []
+    while True:
+        batch_conditions, batch_params = list(conditions), list(params)
+        if after:
+            value, rowid = after
+            if value is None:
+                # NULLs sort first
+                batch_conditions.append(f'({sort_column} IS NULL AND rowid > ? OR {sort_column} IS NOT NULL)')
+                batch_params.append(rowid)
+            else:
+                batch_conditions.append(f'({sort_column}, rowid) > (?, ?)')
+                batch_params += [value, rowid]
+        where = f"WHERE {' AND '.join(batch_conditions)}" if batch_conditions else ''
+        rows = conn.execute(
+            f'SELECT rowid AS _rowid, {select} FROM {table} {where} {order} LIMIT ?',
+            batch_params + [EXPORT_BATCH_SIZE]
+        ).fetchall()
+        for row in rows:
+            row = dict(row)
+            after = [row[sort_column], row.pop('_rowid')]
+            yield row
+        if len(rows) < EXPORT_BATCH_SIZE:
+            return
+
+def iter_tickets(since=None, until=None, status_filter=None):
+    """Stream tickets created in [since, until), oldest first"""
+    conditions, params = _time_range('created_at', since, until)
+    if status_filter:
+        conditions.append('status = ?')
+        params.append(status_filter)
+    return _stream_query('tickets', TICKET_COLUMNS, conditions, params, 'created_at')
+
+def iter_devices(since=None, until=None):
+    """Stream devices last seen in [since, until), oldest first"""
+    # last_seen is written with datetime.isoformat(), which separates date and time with 'T'
+    conditions, params = _time_range('last_seen', since, until, sep='T')
+    return _stream_query('device_inventory', ['*'], conditions, params, 'last_seen')
+
+def iter_audit_logs(since=None, until=None, include_archived=False):
+    """Stream audit logs in [since, until), oldest first, month by month
+    
+    Archived months are read line by line from their compressed files rather
+    than loaded into memory.
+    """
+    conditions, params = _time_range('timestamp', since, until)
+    first_month = params[0][:7] if since else None
+    last_month = params[-1][:7] if until else None
+    return _stream_audit_logs(conditions, params, since and params[0], until and params[-1],
+                              first_month, last_month, include_archived)
+
+def _stream_audit_logs(conditions, params, since, until, first_month, last_month, include_archived):
+    """Generator behind iter_audit_logs()"""
+    with get_snapshot_connection() as conn:
+        sources = _audit_sources(conn, first_month, last_month, include_archived)
+        for month, table, archive_path in reversed(sources):
+            if archive_path:
+                with gzip.open(archive_path, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        row = json.loads(line)
+                        if (since is None or row['timestamp'] >= since) and (until is None or row['timestamp'] < until):
+                            # Archives keep seq for reloading; exports leave it out
+                            row.pop('seq', None)
+                            yield row
+            else:
+                yield from _stream_rows(conn, table, AUDIT_LOG_COLUMNS, conditions, params, 'timestamp')
 
 # ==================== SETTINGS OPERATIONS ====================
 
+# Longest time a cached copy of the settings is trusted before settings_version
+# is checked again; writes from this process invalidate it immediately
+SETTINGS_CACHE_CHECK_INTERVAL = float(os.environ.get('SETTINGS_CACHE_CHECK_INTERVAL', 1.0))
+
+class SettingsCache:
+    """Read-through, in-process cache of the whole settings table
+    
+    Settings are few and read far more often than written, so the table is
+    cached as one dict. set_setting() invalidates it; changes made by other
+    processes are noticed through the trigger-maintained settings_version
+    counter, which is read at most once per check_interval.
+    """
+    
+    def __init__(self, check_interval=SETTINGS_CACHE_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._path = None
+        self._checked = 0.0
+        self.stats = {'hits': 0, 'revalidations': 0, 'loads': 0}
+    
+    def get_all(self):
+        """Get the settings dict, reloading it if it may be stale (do not modify it)"""
+        now = time.monotonic()
+        with self._lock:
+            fresh = self._values is not None and self._path == _database_key()
+            if fresh and now - self._checked < self.check_interval:
+                self.stats['hits'] += 1
+                return self._values
+        
+        with get_db_connection() as conn:
+            version = conn.execute('SELECT version FROM settings_version WHERE id = 1').fetchone()[0]
+            with self._lock:
+                if fresh and self._values is not None and version == self._version:
+                    self._checked = now
+                    self.stats['revalidations'] += 1
+                    return self._values
+            rows = conn.execute('SELECT key, value FROM settings').fetchall()
+        
+        values = {row['key']: row['value'] for row in rows}
+        with self._lock:
+            self._values = values
+            self._version = version
+            self._path = _database_key()
+            self._checked = now
+            self.stats['loads'] += 1
+        return values
+    
+    def invalidate(self):
+        """Drop the cached settings so the next read reloads them"""
+        with self._lock:
+            self._values = None
+
+_settings_cache = SettingsCache()
+
+def get_settings_cache():
+    """Get the process-wide settings cache"""
+    return _settings_cache
+
 def get_setting(key, default=None):
     """Get a setting value"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
-        row = cursor.fetchone()
-        return row['value'] if row else default
+    return _settings_cache.get_all().get(key, default)
 
 def set_setting(key, value):
     """Set a setting value"""
@@ -260,39 +2183,131 @@ def set_setting(key, value):
             VALUES (?, ?, ?)
         ''', (key, value, datetime.now().isoformat()))
         conn.commit()
+    _settings_cache.invalidate()
+    if key == 'db_profile':
+        _resolved_profiles.clear()
 
 def get_all_settings():
     """Get all settings"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT key, value FROM settings')
-        rows = cursor.fetchall()
-        return {row['key']: row['value'] for row in rows}
+    return dict(_settings_cache.get_all())
 
 # ==================== DEVICE INVENTORY OPERATIONS ====================
 
+# Attributes compared on each check-in; last_seen changes on every report
+DEVICE_ATTRIBUTES = ('hostname', 'ip_address', 'mac_address', 'os_info', 'notes')
+# Devices whose stored hashes are looked up with one query
+DEVICE_UPSERT_CHUNK_SIZE = 500
+
+def _device_fingerprint(values):
+    """Hash of a device's attribute values, stored to detect changes cheaply"""
+    return hashlib.blake2b(json.dumps(values).encode('utf-8'), digest_size=16).hexdigest()
+
 def add_device(device_data):
     """Add or update a device in inventory"""
+    return upsert_devices([device_data])['ids'][0]
+
+def upsert_devices(devices):
+    """Record device check-ins in one transaction
+    
+    Each device's attributes are hashed and compared with the stored hash, so
+    an unchanged device only has last_seen updated. A changed device is
+    updated in place and a diff of the changed attributes ({"field": [old,
+    new]}) is appended to device_history. Returns the device ids in input
+    order with inserted/changed/unchanged counts.
+    """
     import uuid
-    device_id = device_data.get('id', str(uuid.uuid4()))
+    now = datetime.now().isoformat()
+    columns = ', '.join(DEVICE_ATTRIBUTES)
+    assignments = ', '.join(f'{field} = ?' for field in DEVICE_ATTRIBUTES)
+    result = {'ids': [], 'inserted': 0, 'changed': 0, 'unchanged': 0}
     
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO device_inventory (id, hostname, ip_address, mac_address, os_info, notes, last_seen)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            device_id,
-            device_data.get('hostname', ''),
-            device_data.get('ip_address', ''),
-            device_data.get('mac_address', ''),
-            device_data.get('os_info', ''),
-            device_data.get('notes', ''),
-            datetime.now().isoformat()
-        ))
-        conn.commit()
-    
-    return device_id
+        try:
+            # One device checking in unchanged, the usual case, is a single UPDATE
+            if len(devices) == 1 and devices[0].get('id'):
+                device_id = devices[0]['id']
+                fingerprint = _device_fingerprint([devices[0].get(field, '') for field in DEVICE_ATTRIBUTES])
+                touched = conn.execute(
+                    'UPDATE device_inventory SET last_seen = ? WHERE id = ? AND attributes_hash = ?',
+                    (now, device_id, fingerprint)
+                ).rowcount
+                if touched:
+                    conn.commit()
+                    result['ids'].append(device_id)
+                    result['unchanged'] += 1
+                    return result
+            
+            for offset in range(0, len(devices), DEVICE_UPSERT_CHUNK_SIZE):
+                chunk = [
+                    (device_data.get('id') or str(uuid.uuid4()),
+                     [device_data.get(field, '') for field in DEVICE_ATTRIBUTES])
+                    for device_data in devices[offset:offset + DEVICE_UPSERT_CHUNK_SIZE]
+                ]
+                ids = [device_id for device_id, _ in chunk]
+                stored = {
+                    row['id']: dict(row) for row in conn.execute(
+                        f'SELECT id, attributes_hash, {columns} FROM device_inventory '
+                        f'WHERE id IN ({", ".join("?" * len(ids))})', ids
+                    )
+                }
+                inserts, updates, touches, history = [], [], [], []
+                
+                for device_id, values in chunk:
+                    fingerprint = _device_fingerprint(values)
+                    current = stored.get(device_id)
+                    if current is None:
+                        inserts.append([device_id] + values + [fingerprint, now])
+                        result['inserted'] += 1
+                    elif current['attributes_hash'] == fingerprint:
+                        touches.append((now, device_id))
+                        result['unchanged'] += 1
+                    else:
+                        changes = {
+                            field: [current[field], value]
+                            for field, value in zip(DEVICE_ATTRIBUTES, values) if current[field] != value
+                        }
+                        updates.append(values + [fingerprint, now, device_id])
+                        # Rows written before hashing existed get their hash here without a diff
+                        if changes:
+                            history.append((device_id, now, json.dumps(changes, separators=(',', ':'))))
+                            result['changed'] += 1
+                        else:
+                            result['unchanged'] += 1
+                    # A device reported twice in one call is compared with its first report
+                    stored[device_id] = dict(zip(DEVICE_ATTRIBUTES, values), attributes_hash=fingerprint)
+                    result['ids'].append(device_id)
+                
+                # Only statements with rows are run; a single check-in costs the
+                # lookup plus one write, not four mostly empty executemany calls
+                statements = [
+                    (f'INSERT INTO device_inventory (id, {columns}, attributes_hash, last_seen) '
+                     f'VALUES (?, {", ".join("?" * len(DEVICE_ATTRIBUTES))}, ?, ?)', inserts),
+                    (f'UPDATE device_inventory SET {assignments}, attributes_hash = ?, last_seen = ? WHERE id = ?',
+                     updates),
+                    ('UPDATE device_inventory SET last_seen = ? WHERE id = ?', touches),
+                    ('INSERT INTO device_history (device_id, changed_at, changes) VALUES (?, ?, ?)', history)
+                ]
+                for statement, rows in statements:
+                    if rows:
+                        conn.executemany(statement, rows)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return result
+
+def get_device_history(device_id, limit=100):
+    """Get a device's attribute changes, newest first"""
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            'SELECT * FROM device_history WHERE device_id = ? ORDER BY id DESC LIMIT ?', (device_id, limit)
+        ).fetchall()
+    history = []
+    for row in rows:
+        entry = dict(row)
+        entry['changes'] = json.loads(entry['changes'])
+        history.append(entry)
+    return history
 
 def get_all_devices():
     """Get all devices from inventory"""
@@ -302,6 +2317,181 @@ def get_all_devices():
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
 
+# ==================== MAINTENANCE ====================
+
+# Longest a maintenance run may take; tasks not started by then are skipped
+MAINTENANCE_TIME_BUDGET = float(os.environ.get('MAINTENANCE_TIME_BUDGET', 30))
+# Free pages returned to the filesystem per incremental_vacuum step
+MAINTENANCE_VACUUM_PAGES = int(os.environ.get('MAINTENANCE_VACUUM_PAGES', 2000))
+# Rows sampled per index by ANALYZE and PRAGMA optimize (0 = no limit)
+MAINTENANCE_ANALYSIS_LIMIT = int(os.environ.get('MAINTENANCE_ANALYSIS_LIMIT', 1000))
+# Runs kept in maintenance_runs
+MAINTENANCE_HISTORY_SIZE = int(os.environ.get('MAINTENANCE_HISTORY_SIZE', 200))
+
+_AUTO_VACUUM_INCREMENTAL = 2
+
+def _database_bytes(conn):
+    """Size of the database file plus its write-ahead log"""
+    files = get_storage_backend().files()
+    if not files:
+        # In-memory database: the pages it holds
+        return conn.execute('PRAGMA page_count').fetchone()[0] * conn.execute('PRAGMA page_size').fetchone()[0]
+    return sum(os.path.getsize(path) for path in files if os.path.exists(path))
+
+def run_maintenance(time_budget=None, trigger='manual', full_vacuum=False):
+    """Refresh planner statistics, reclaim free pages and checkpoint the WAL
+    
+    Runs PRAGMA optimize, ANALYZE, incremental vacuum and a truncating WAL
+    checkpoint in that order, starting each only while time_budget seconds
+    have not run out. Incremental vacuum needs auto_vacuum=INCREMENTAL, which
+    new databases get from init_db(); full_vacuum converts an older database
+    with one blocking VACUUM instead. The run is recorded in maintenance_runs
+    and returned.
+    """
+    time_budget = MAINTENANCE_TIME_BUDGET if time_budget is None else time_budget
+    started = time.monotonic()
+    deadline = started + time_budget
+    started_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    tasks = []
+    
+    def task(name, action):
+        if time.monotonic() >= deadline:
+            tasks.append({'task': name, 'status': 'skipped', 'detail': 'time budget exhausted', 'duration_ms': 0})
+            return
+        task_started = time.monotonic()
+        status, detail = action()
+        tasks.append({'task': name, 'status': status, 'detail': detail,
+                      'duration_ms': round((time.monotonic() - task_started) * 1000, 1)})
+    
+    with get_db_connection() as conn:
+        conn.commit()
+        bytes_before = _database_bytes(conn)
+        freelist_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        conn.execute(f'PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}').fetchall()
+        
+        task('optimize', lambda: _run_pragma(conn, 'PRAGMA optimize'))
+        task('analyze', lambda: _run_pragma(conn, 'ANALYZE'))
+        if full_vacuum:
+            task('vacuum', lambda: _full_vacuum(conn))
+        else:
+            task('incremental_vacuum', lambda: _incremental_vacuum(conn, deadline))
+        task('checkpoint', lambda: _checkpoint(conn))
+        
+        freelist_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        bytes_after = _database_bytes(conn)
+        run = {
+            'started_at': started_at,
+            'trigger': trigger,
+            'duration_ms': round((time.monotonic() - started) * 1000, 1),
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'bytes_reclaimed': max(bytes_before - bytes_after, 0),
+            'freelist_before': freelist_before,
+            'freelist_after': freelist_after,
+            'tasks': tasks
+        }
+        cursor = conn.execute('''
+            INSERT INTO maintenance_runs (started_at, trigger, duration_ms, bytes_before, bytes_after,
+                                          bytes_reclaimed, freelist_before, freelist_after, tasks)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (started_at, trigger, run['duration_ms'], bytes_before, bytes_after, run['bytes_reclaimed'],
+              freelist_before, freelist_after, json.dumps(tasks)))
+        run['id'] = cursor.lastrowid
+        conn.execute('DELETE FROM maintenance_runs WHERE id <= ?', (run['id'] - MAINTENANCE_HISTORY_SIZE,))
+        conn.commit()
+    return run
+
+def _run_pragma(conn, statement):
+    """Run a maintenance statement to completion"""
+    conn.executescript(statement)
+    return 'done', None
+
+def _incremental_vacuum(conn, deadline):
+    """Free pages in steps until none are left or the deadline passes"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != _AUTO_VACUUM_INCREMENTAL:
+        return 'skipped', 'auto_vacuum is not INCREMENTAL (run `python database.py maintain --full-vacuum` once)'
+    freed = 0
+    while time.monotonic() < deadline:
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if free_pages == 0:
+            break
+        # execute() would step the pragma once and free a single page
+        conn.executescript(f'PRAGMA incremental_vacuum({MAINTENANCE_VACUUM_PAGES})')
+        freed += min(free_pages, MAINTENANCE_VACUUM_PAGES)
+    return 'done', f'{freed} pages freed'
+
+def _full_vacuum(conn):
+    """Rebuild the database file, switching it to incremental auto-vacuum"""
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return 'done', 'database rebuilt with auto_vacuum=INCREMENTAL'
+
+def _checkpoint(conn):
+    """Copy the WAL into the database file and truncate it"""
+    if conn.execute('PRAGMA journal_mode').fetchone()[0].lower() != 'wal':
+        return 'skipped', 'not in WAL mode'
+    wal_path = DATABASE_PATH + '-wal'
+    wal_bytes = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    busy, wal_frames, checkpointed = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+    if busy:
+        return 'partial', f'{checkpointed} of {wal_frames} frames checkpointed, readers still active'
+    return 'done', f'WAL truncated from {wal_bytes:,} bytes'
+
+def get_maintenance_history(limit=50):
+    """Get recorded maintenance runs, newest first"""
+    with get_db_connection() as conn:
+        rows = conn.execute('SELECT * FROM maintenance_runs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    runs = []
+    for row in rows:
+        run = dict(row)
+        run['tasks'] = json.loads(run['tasks'])
+        runs.append(run)
+    return runs
+
 # Initialize database on module import
 if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Initialize or maintain the Endpoint Assist database')
+    parser.add_argument('command', nargs='?', default='init',
+                        choices=['init', 'migrate', 'migrations', 'reconcile-counters', 'expire-audit-logs', 'maintain'])
+    parser.add_argument('--dry-run', action='store_true', help='migrate: estimate pending migrations without applying them')
+    parser.add_argument('--days', type=int, default=30, help='expire-audit-logs: retention in days')
+    parser.add_argument('--no-archive', action='store_true', help='expire-audit-logs: drop without archiving')
+    parser.add_argument('--budget', type=float, default=None, help='maintain: time budget in seconds')
+    parser.add_argument('--full-vacuum', action='store_true', help='maintain: rebuild with VACUUM instead of incremental vacuum')
+    args = parser.parse_args()
+    
+    if args.command == 'migrate' and args.dry_run:
+        with get_db_connection() as conn:
+            plan = plan_migrations(conn)
+        for migration in plan:
+            print(f"🔧 Migration {migration['version']}: {migration['description']} "
+                  f"(~{migration['estimated_seconds']:.1f}s)")
+            for step in migration['steps']:
+                detail = f"{step['rows']:,} rows of {step['table']}" if step['kind'] == 'backfill' else f"{step['count']} statements"
+                print(f"   {step['kind']}: {detail}, ~{step['seconds']:.1f}s")
+        print(f"✅ {len(plan)} pending, ~{sum(m['estimated_seconds'] for m in plan):.1f}s estimated")
+        raise SystemExit(0)
+    
     init_db()
+    if args.command == 'migrations':
+        for migration in get_migration_status():
+            print(f"{migration['component']:<6}{migration['version']:>4}  {migration['state']:<8} "
+                  f"{migration['applied_at'] or '-':<20} {migration['description']}")
+    elif args.command == 'expire-audit-logs':
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=args.days)).strftime('%Y-%m')
+        for partition in expire_audit_partitions(cutoff, archive=False if args.no_archive else None):
+            print(f"🗄️ Expired {partition['month']}: {partition['rows']} rows" +
+                  (f" archived to {partition['archive']}" if partition['archive'] else ''))
+    elif args.command == 'maintain':
+        run = run_maintenance(args.budget, trigger='cli', full_vacuum=args.full_vacuum)
+        for task in run['tasks']:
+            print(f"🧹 {task['task']}: {task['status']}" + (f" ({task['detail']})" if task['detail'] else '') +
+                  f", {task['duration_ms']:.0f} ms")
+        print(f"✅ Maintenance finished in {run['duration_ms']:.0f} ms, {run['bytes_reclaimed']:,} bytes reclaimed")
+    elif args.command == 'reconcile-counters':
+        drift = reconcile_ticket_counters()
+        for row in drift:
+            print(f"⚠️ {row['dimension']}={row['value']!r}: stored {row['stored']}, actual {row['actual']}")
+        print(f"✅ Ticket counters rebuilt, {len(drift)} drifted")
@@ -0,0 +1,72 @@
+"""
+Endpoint Assist - Data Export
+Streams tickets, audit logs and devices as NDJSON or CSV without building the whole file in memory
+"""
+
+import csv
+import io
+import json
+
+from database import iter_tickets, iter_audit_logs, iter_devices
+
+# Bytes collected before a chunk is handed to the response
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+EXPORT_DATASETS = {
+    'tickets': iter_tickets,
+    'audit-logs': iter_audit_logs,
+    'devices': iter_devices
+}
+
+
+def stream_ndjson(rows):
+    """Encode rows as newline-delimited JSON, yielding chunks of about EXPORT_CHUNK_SIZE"""
+    chunk = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, default=str, separators=(',', ':')) + '\n'
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def stream_csv(rows):
+    """Encode rows as CSV with a header taken from the first row's keys
+    
+    An export with no rows produces an empty body.
+    """
+    buffer = io.StringIO()
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_export(dataset, fmt, **filters):
+    """Start an export, returning a generator of text chunks
+    
+    Raises KeyError for an unknown dataset and ValueError for an unknown
+    format or invalid filters, before anything has been streamed.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+    rows = EXPORT_DATASETS[dataset](**filters)
+    return stream_ndjson(rows) if fmt == 'ndjson' else stream_csv(rows)
@@ -0,0 +1,140 @@
+"""
+Endpoint Assist - Database Maintenance Scheduler
+Runs ANALYZE, PRAGMA optimize, incremental vacuum and WAL checkpoints while the machine is idle
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import psutil
+
+from background import BackgroundWorker
+from database import run_maintenance, get_maintenance_history
+
+# Scheduler configuration
+MAINTENANCE_ENABLED = os.environ.get('MAINTENANCE_ENABLED', 'true').lower() == 'true'
+MAINTENANCE_CHECK_INTERVAL = float(os.environ.get('MAINTENANCE_CHECK_INTERVAL', 60))
+MAINTENANCE_MIN_INTERVAL = float(os.environ.get('MAINTENANCE_MIN_INTERVAL', 6 * 3600))
+MAINTENANCE_IDLE_CPU_PERCENT = float(os.environ.get('MAINTENANCE_IDLE_CPU_PERCENT', 25))
+MAINTENANCE_IDLE_IO_BYTES = float(os.environ.get('MAINTENANCE_IDLE_IO_BYTES', 2 * 1024 * 1024))
+MAINTENANCE_IDLE_SAMPLES = int(os.environ.get('MAINTENANCE_IDLE_SAMPLES', 3))
+
+
+class MaintenanceScheduler(BackgroundWorker):
+    """Background thread that runs database maintenance in idle windows
+    
+    Every check_interval seconds the system CPU percentage and disk I/O rate
+    are sampled. Once idle_samples consecutive samples are below both
+    thresholds, and at least min_interval seconds have passed since the last
+    recorded run, run_maintenance() is called with the configured time budget.
+    """
+    
+    thread_name = 'db-maintenance'
+    label = '🧹 Database maintenance scheduler'
+    
+    def __init__(self, check_interval=MAINTENANCE_CHECK_INTERVAL, min_interval=MAINTENANCE_MIN_INTERVAL,
+                 idle_cpu_percent=MAINTENANCE_IDLE_CPU_PERCENT, idle_io_bytes=MAINTENANCE_IDLE_IO_BYTES,
+                 idle_samples=MAINTENANCE_IDLE_SAMPLES, time_budget=None):
+        super().__init__({'checks': 0, 'idle_checks': 0, 'runs': 0, 'failed': 0})
+        self.check_interval = check_interval
+        self.min_interval = min_interval
+        self.idle_cpu_percent = idle_cpu_percent
+        self.idle_io_bytes = idle_io_bytes
+        self.idle_samples = idle_samples
+        self.time_budget = time_budget
+        # Serializes scheduled and manual runs
+        self._lock = threading.Lock()
+        self._idle_streak = 0
+        self._last_io = None
+        self._last_load = None
+        self._last_run = None
+    
+    def run_now(self, trigger='manual'):
+        """Run maintenance immediately, whatever the load"""
+        with self._lock:
+            try:
+                run = run_maintenance(self.time_budget, trigger=trigger)
+            except Exception:
+                self._count('failed')
+                raise
+            self._count('runs')
+            self._last_run = time.time()
+            return run
+    
+    def stats(self):
+        """Get scheduler state, the latest load sample and counters"""
+        counters = super().stats()
+        counters['idle_streak'] = self._idle_streak
+        counters['last_load'] = self._last_load
+        counters['last_run'] = (datetime.fromtimestamp(self._last_run, timezone.utc).isoformat()
+                                if self._last_run else None)
+        return counters
+    
+    def is_idle(self, load):
+        """Whether a load sample is below both idle thresholds"""
+        return load['cpu_percent'] < self.idle_cpu_percent and load['io_bytes_per_sec'] < self.idle_io_bytes
+    
+    def _on_start(self):
+        """Pick up the last recorded run and prime the load counters"""
+        self._last_run = self._last_recorded_run()
+        # Prime the counters so the first sample measures a full interval
+        psutil.cpu_percent(interval=None)
+        self._last_io = self._io_bytes()
+    
+    def _loop(self):
+        """Sample load every check_interval and run maintenance when idle and due"""
+        while not self._stop.wait(self.check_interval):
+            load = self._sample_load()
+            self._last_load = load
+            self._count('checks')
+            if self.is_idle(load):
+                self._count('idle_checks')
+                self._idle_streak += 1
+            else:
+                self._idle_streak = 0
+            
+            due = self._last_run is None or time.time() - self._last_run >= self.min_interval
+            if due and self._idle_streak >= self.idle_samples:
+                self._idle_streak = 0
+                try:
+                    self.run_now(trigger='idle')
+                except Exception as e:
+                    print(f"Database maintenance error: {e}")
+    
+    def _sample_load(self):
+        """System CPU percentage and disk I/O rate since the previous sample"""
+        io_bytes = self._io_bytes()
+        io_rate = max(io_bytes - self._last_io, 0) / self.check_interval
+        self._last_io = io_bytes
+        return {'cpu_percent': psutil.cpu_percent(interval=None), 'io_bytes_per_sec': round(io_rate)}
+    
+    @staticmethod
+    def _io_bytes():
+        """Total bytes read and written by all disks"""
+        counters = psutil.disk_io_counters()
+        # None on systems without disk statistics
+        return counters.read_bytes + counters.write_bytes if counters else 0
+    
+    @staticmethod
+    def _last_recorded_run():
+        """Start time of the newest run in maintenance_runs, so restarts do not run again early"""
+        history = get_maintenance_history(limit=1)
+        if not history:
+            return None
+        started = datetime.strptime(history[0]['started_at'], '%Y-%m-%d %H:%M:%S')
+        return started.replace(tzinfo=timezone.utc).timestamp()
+
+
+# Global scheduler instance
+maintenance_scheduler = MaintenanceScheduler()
+
+def start_maintenance_scheduler():
+    """Start the background maintenance scheduler unless disabled"""
+    if MAINTENANCE_ENABLED:
+        maintenance_scheduler.start()
+
+def stop_maintenance_scheduler():
+    """Stop the background maintenance scheduler"""
+    maintenance_scheduler.stop()
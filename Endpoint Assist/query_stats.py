@@ -0,0 +1,352 @@
+"""
+Endpoint Assist - Query Instrumentation
+Times every SQL statement run through pooled connections, keeps rolling per-statement
+latency histograms and a slow-query log with EXPLAIN QUERY PLAN output
+"""
+
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+# Instrumentation configuration
+QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+QUERY_STATS_WINDOW = float(os.environ.get('QUERY_STATS_WINDOW', 300))
+QUERY_STATS_WINDOWS = int(os.environ.get('QUERY_STATS_WINDOWS', 12))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 200))
+# One statement in this many records its caller; slow statements always do
+QUERY_STATS_CALLER_SAMPLE = max(1, int(os.environ.get('QUERY_STATS_CALLER_SAMPLE', 100)))
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is unbounded
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Fields top() can rank statements by
+SORT_FIELDS = ('total_ms', 'count', 'max_ms', 'rows')
+
+# Distinct callers remembered per statement
+_MAX_CALLERS = 8
+# Raw SQL strings whose normalized form is cached
+_NORMALIZE_CACHE_SIZE = 2048
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+# Frames in these files are skipped when working out who issued a statement
+_INTERNAL_FILES = (os.path.abspath(__file__), os.path.abspath(sys.modules['contextlib'].__file__))
+
+# Statements executed so far, for sampling callers
+_executions = itertools.count()
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape: literals become ?, IN lists collapse, whitespace folds"""
+    normalized = _STRING_LITERAL.sub('?', sql)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _PLACEHOLDER_LIST.sub('(?, ...)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+
+class _StatementStats:
+    """Counters and latency histogram for one normalized statement in one window"""
+    
+    __slots__ = ('count', 'total_ms', 'max_ms', 'rows', 'buckets', 'callers')
+    
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.callers = Counter()
+    
+    def add(self, duration_ms, rows, caller):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.rows += rows
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS_MS) and duration_ms > HISTOGRAM_BOUNDS_MS[bucket]:
+            bucket += 1
+        self.buckets[bucket] += 1
+        if caller is not None and (caller in self.callers or len(self.callers) < _MAX_CALLERS):
+            self.callers[caller] += 1
+    
+    def merge(self, other):
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.rows += other.rows
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.callers.update(other.callers)
+
+
+def _percentile(buckets, count, fraction):
+    """Upper bound (ms) of the histogram bucket holding the given fraction of executions"""
+    target = count * fraction
+    seen = 0
+    for index, bucket_count in enumerate(buckets):
+        seen += bucket_count
+        if seen >= target:
+            return HISTOGRAM_BOUNDS_MS[index] if index < len(HISTOGRAM_BOUNDS_MS) else None
+    return None
+
+
+class QueryStats:
+    """Rolling per-statement statistics and the slow-query log
+    
+    Executions are aggregated by normalized SQL into windows of window_seconds;
+    only the newest max_windows windows are kept, so the figures cover roughly
+    the last window_seconds * max_windows seconds. Statements slower than
+    slow_query_ms are also appended to a bounded slow-query log.
+    """
+    
+    def __init__(self, window_seconds=QUERY_STATS_WINDOW, max_windows=QUERY_STATS_WINDOWS,
+                 slow_query_ms=SLOW_QUERY_MS, slow_log_size=SLOW_QUERY_LOG_SIZE):
+        self.window_seconds = window_seconds
+        self.max_windows = max_windows
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._windows = deque(maxlen=max_windows)  # (window start, {normalized sql: _StatementStats})
+        self._slow = deque(maxlen=slow_log_size)
+        self._normalized = {}
+    
+    def record(self, sql, duration_ms, rows, caller):
+        """Add one statement execution"""
+        normalized = self._normalize(sql)
+        window_start = time.time() // self.window_seconds * self.window_seconds
+        with self._lock:
+            if not self._windows or self._windows[-1][0] != window_start:
+                self._windows.append((window_start, {}))
+            statements = self._windows[-1][1]
+            stats = statements.get(normalized)
+            if stats is None:
+                stats = statements[normalized] = _StatementStats()
+            stats.add(duration_ms, rows, caller)
+    
+    def record_slow(self, sql, duration_ms, rows, caller, plan):
+        """Add a statement to the slow-query log"""
+        entry = {
+            'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            'sql': self._normalize(sql),
+            'duration_ms': round(duration_ms, 2),
+            'rows': rows,
+            'caller': caller,
+            'plan': plan
+        }
+        with self._lock:
+            self._slow.append(entry)
+        logger.warning("Slow query (%.0f ms, %s): %s", duration_ms, caller, entry['sql'][:200])
+    
+    def top(self, limit=20, sort='total_ms'):
+        """The statements with the largest total (or count, max_ms, rows) over the retained windows"""
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field '{sort}', expected one of {', '.join(SORT_FIELDS)}")
+        merged = {}
+        with self._lock:
+            for _, statements in self._windows:
+                for normalized, stats in statements.items():
+                    if normalized not in merged:
+                        merged[normalized] = _StatementStats()
+                    merged[normalized].merge(stats)
+        
+        ranked = sorted(merged.items(), key=lambda item: getattr(item[1], sort), reverse=True)[:limit]
+        return [{
+            'sql': normalized,
+            'count': stats.count,
+            'total_ms': round(stats.total_ms, 2),
+            'mean_ms': round(stats.total_ms / stats.count, 3),
+            'max_ms': round(stats.max_ms, 2),
+            'p50_ms': _percentile(stats.buckets, stats.count, 0.5),
+            'p95_ms': _percentile(stats.buckets, stats.count, 0.95),
+            'p99_ms': _percentile(stats.buckets, stats.count, 0.99),
+            'rows': stats.rows,
+            'histogram': dict(zip([f'<={bound}' for bound in HISTOGRAM_BOUNDS_MS] + ['inf'], stats.buckets)),
+            'callers': dict(stats.callers.most_common())
+        } for normalized, stats in ranked]
+    
+    def slow_queries(self, limit=50):
+        """Recent slow statements, newest first"""
+        with self._lock:
+            return list(self._slow)[::-1][:limit]
+    
+    def reset(self):
+        """Discard all statistics and the slow-query log"""
+        with self._lock:
+            self._windows.clear()
+            self._slow.clear()
+    
+    def _normalize(self, sql):
+        """normalize_sql() with a bounded cache, since the same SQL strings repeat"""
+        # dict reads are atomic, so hits skip the lock
+        normalized = self._normalized.get(sql)
+        if normalized is not None:
+            return normalized
+        normalized = normalize_sql(sql)
+        with self._lock:
+            if len(self._normalized) >= _NORMALIZE_CACHE_SIZE:
+                # Statements are overwhelmingly the same few hundred strings, so
+                # starting over is rare and cheaper than LRU bookkeeping per hit
+                self._normalized.clear()
+            self._normalized[sql] = normalized
+        return normalized
+
+
+# Global statistics instance
+query_stats = QueryStats()
+
+
+def _sampled_caller():
+    """The issuing code for one statement in QUERY_STATS_CALLER_SAMPLE, otherwise None"""
+    if next(_executions) % QUERY_STATS_CALLER_SAMPLE:
+        return None
+    return _caller()
+
+
+def _caller():
+    """file:line function of the code that issued the statement"""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_filename in _INTERNAL_FILES:
+        frame = frame.f_back
+    if frame is None:
+        return 'unknown'
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement's duration and row count to query_stats
+    
+    A SELECT is timed from execute() until its rows are exhausted, the cursor
+    is reused or closed, or the cursor is released, so fetch time counts too.
+    """
+    
+    _pending = None  # [sql, parameters, elapsed seconds, rows, caller]
+    
+    def execute(self, sql, parameters=()):
+        self._finish()
+        caller = _sampled_caller()
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._begin(sql, parameters, time.perf_counter() - start, caller)
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        caller = _sampled_caller()
+        # Generators are passed through untouched; the plan then cannot be explained
+        first = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else ()
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._begin(sql, first, time.perf_counter() - start, caller)
+        return self
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 0 if row is None else 1, row is None)
+        return row
+    
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), not rows)
+        return rows
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+    
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            # Module globals may already be gone at interpreter shutdown
+            pass
+    
+    def _begin(self, sql, parameters, elapsed, caller):
+        """Start tracking a statement; ones that return no rows are complete already"""
+        if caller is None and elapsed * 1000 >= query_stats.slow_query_ms:
+            # Unsampled statements learn their caller once they turn out slow,
+            # while the issuing code is still on the stack
+            caller = _caller()
+        self._pending = [sql, parameters, elapsed, 0, caller]
+        if self.description is None:
+            self._pending[3] = max(self.rowcount, 0)
+            self._finish()
+    
+    def _fetched(self, start, rows, exhausted):
+        """Add fetch time and rows to the statement in progress"""
+        pending = self._pending
+        if pending is None:
+            return
+        pending[2] += time.perf_counter() - start
+        pending[3] += rows
+        if pending[4] is None and pending[2] * 1000 >= query_stats.slow_query_ms:
+            pending[4] = _caller()
+        if exhausted:
+            self._finish()
+    
+    def _finish(self):
+        """Report the statement in progress, if any"""
+        pending = self._pending
+        if pending is None:
+            return
+        self._pending = None
+        sql, parameters, elapsed, rows, caller = pending
+        duration_ms = elapsed * 1000
+        if duration_ms >= query_stats.slow_query_ms and sql.lstrip()[:6].upper() != 'PRAGMA':
+            # Connection setup pragmas have no plan worth logging
+            query_stats.record_slow(sql, duration_ms, rows, caller, self._query_plan(sql, parameters))
+        query_stats.record(sql, duration_ms, rows, caller)
+    
+    def _query_plan(self, sql, parameters):
+        """EXPLAIN QUERY PLAN lines for a statement, or the error that prevented it"""
+        try:
+            plan = self.connection.cursor(sqlite3.Cursor).execute(f'EXPLAIN QUERY PLAN {sql}', parameters)
+            return [row[3] for row in plan.fetchall()]
+        except (sqlite3.Error, ValueError) as e:
+            return [f'unavailable: {e}']
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, and execute() shortcuts, are instrumented"""
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    """Connection class for sqlite3.connect(factory=...), honouring QUERY_STATS_ENABLED"""
+    return InstrumentedConnection if QUERY_STATS_ENABLED else sqlite3.Connection
@@ -0,0 +1,83 @@
+"""
+Endpoint Assist - Expired Session Sweeper
+Deletes expired sessions and signed-token revocations on a schedule, in small batches
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from auth import sweep_expired_sessions
+from background import BackgroundWorker
+
+# Sweeper configuration
+SESSION_SWEEP_ENABLED = os.environ.get('SESSION_SWEEP_ENABLED', 'true').lower() == 'true'
+SESSION_SWEEP_INTERVAL = float(os.environ.get('SESSION_SWEEP_INTERVAL', 300))
+
+
+class SessionSweeper(BackgroundWorker):
+    """Background thread that removes expired sessions every interval seconds
+    
+    Each sweep runs sweep_expired_sessions(), which deletes in batches through
+    the expires_at index, so user_sessions stays at roughly the number of live
+    sessions and a sweep never holds the write lock for long.
+    """
+    
+    thread_name = 'session-sweeper'
+    label = '🧹 Session sweeper'
+    
+    def __init__(self, interval=SESSION_SWEEP_INTERVAL):
+        super().__init__({'sweeps': 0, 'failed': 0, 'sessions_removed': 0, 'revocations_removed': 0})
+        self.interval = interval
+        # Serializes scheduled and manual sweeps
+        self._lock = threading.Lock()
+        self._last_sweep = None
+    
+    def sweep_now(self):
+        """Sweep immediately; returns the rows removed and how long it took"""
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                result = sweep_expired_sessions()
+            except Exception:
+                self._count('failed')
+                raise
+            result['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            self._count('sweeps')
+            self._count('sessions_removed', result['sessions'])
+            self._count('revocations_removed', result['revocations'])
+            self._last_sweep = dict(result, finished_at=datetime.now(timezone.utc).isoformat())
+            return result
+    
+    def stats(self):
+        """Get sweeper state, totals and the latest sweep"""
+        counters = super().stats()
+        counters['interval'] = self.interval
+        counters['last_sweep'] = self._last_sweep
+        return counters
+    
+    def _loop(self):
+        """Sweep every interval until stopped"""
+        while not self._stop.wait(self.interval):
+            try:
+                result = self.sweep_now()
+            except Exception as e:
+                print(f"Session sweep error: {e}")
+                continue
+            if result['sessions'] or result['revocations']:
+                print(f"🧹 Removed {result['sessions']:,} expired sessions and "
+                      f"{result['revocations']:,} revocations in {result['duration_ms']} ms")
+
+
+# Global sweeper instance
+session_sweeper = SessionSweeper()
+
+def start_session_sweeper():
+    """Start the background session sweeper unless disabled"""
+    if SESSION_SWEEP_ENABLED:
+        session_sweeper.start()
+
+def stop_session_sweeper():
+    """Stop the background session sweeper"""
+    session_sweeper.stop()
@@ -7,11 +7,36 @@ import pytest
 import json
 import sys
 import os
+import tempfile
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Keep the import-time init_db() off the real data/endpoint_assist.db
+import database
+database.DATABASE_PATH = os.path.join(tempfile.gettempdir(), 'test_endpoint_assist.db')
+
 from app import app
+from audit_writer import audit_writer
+import auth
+
+
+@pytest.fixture(autouse=True)
+def memory_database(monkeypatch):
+    """Run each test against a fresh in-memory database, restoring the previous backend after"""
+    # Cheap password hashing keeps logins fast
+    monkeypatch.setattr(auth, 'PASSWORD_SCRYPT_N', 1024)
+    monkeypatch.setattr(database, '_storage_backend', database.get_storage_backend())
+    database.configure_storage('memory')
+    auth.session_cache.clear()
+    auth.login_throttle.clear()
+    database.init_db()
+    auth.init_auth_db()
+    yield
+    # Audit events still queued by this test belong to its database
+    audit_writer.flush()
+    auth.session_cache.clear()
+    database.get_storage_backend().reset()
 
 
 @pytest.fixture
@@ -22,6 +47,27 @@ def client():
         yield client
 
 
+def login(client, username, password):
+    """Log in and return the Authorization header for the new session"""
+    response = client.post('/api/auth/login', json={'username': username, 'password': password})
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {response.get_json()['data']['token']}"}
+
+
+@pytest.fixture
+def admin_headers(client):
+    """Authorization header for the default admin"""
+    return login(client, 'admin', 'admin123')
+
+
+@pytest.fixture
+def technician_headers():
+    """Authorization header for a technician, from a client of its own"""
+    auth.create_user('tech', 'secret123')
+    with app.test_client() as other:
+        return login(other, 'tech', 'secret123')
+
+
 class TestHealthEndpoints:
     """Test system health endpoints"""
     
@@ -85,6 +131,25 @@ class TestNetworkEndpoints:
         assert 'open' in data['data']
 
 
+class TestAuthEndpoints:
+    """Test login and current user endpoints"""
+    
+    def test_login_rejects_bad_password(self, client):
+        """Test a wrong password gets 401"""
+        response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'wrong'})
+        assert response.status_code == 401
+    
+    def test_me_served_from_session(self, client, admin_headers, monkeypatch):
+        """Test the current user comes from the validated session without another user lookup"""
+        def lookup(user_id):
+            raise AssertionError("get_user_by_id called")
+        monkeypatch.setattr(sys.modules['app'], 'get_user_by_id', lookup)
+        response = client.get('/api/auth/me', headers=admin_headers)
+        assert response.status_code == 200
+        data = response.get_json()['data']
+        assert (data['username'], data['email'], data['role']) == ('admin', 'admin@localhost', 'admin')
+
+
 class TestTicketEndpoints:
     """Test ticket management endpoints"""
     
@@ -96,6 +161,45 @@ class TestTicketEndpoints:
         assert data['status'] == 'success'
         assert isinstance(data['data'], list)
     
+    def test_get_tickets_paginated(self, client):
+        """Test ticket listing returns a next_cursor"""
+        response = client.get('/api/tickets?limit=1')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert len(data['data']) <= 1
+        assert 'next_cursor' in data
+    
+    def test_get_tickets_limit_bounds(self, client, monkeypatch):
+        """Test oversized limits are clamped and non-positive ones rejected"""
+        database.create_tickets_bulk([{"title": f"Ticket {i}"} for i in range(3)])
+        monkeypatch.setattr(sys.modules['app'], 'PAGE_SIZE_MAX', 2)
+        data = client.get('/api/tickets?limit=100000').get_json()
+        assert len(data['data']) == 2
+        assert data['next_cursor']
+        for limit in (0, -5):
+            response = client.get(f'/api/tickets?limit={limit}')
+            assert response.status_code == 400
+            assert response.get_json()['status'] == 'error'
+    
+    def test_get_tickets_invalid_cursor(self, client):
+        """Test an invalid cursor is rejected"""
+        response = client.get('/api/tickets?cursor=bogus')
+        assert response.status_code == 400
+    
+    def test_search_tickets(self, client):
+        """Test ticket search endpoint"""
+        response = client.get('/api/tickets/search?q=test')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+        assert isinstance(data['data'], list)
+    
+    def test_search_tickets_requires_query(self, client):
+        """Test ticket search rejects an empty query"""
+        response = client.get('/api/tickets/search')
+        assert response.status_code == 400
+    
     def test_create_ticket(self, client):
         """Test create ticket endpoint"""
         ticket_data = {
@@ -139,6 +243,198 @@ class TestAuditEndpoints:
         assert response.status_code == 200
         data = json.loads(response.data)
         assert data['status'] == 'success'
+    
+    def test_audit_logs_limit_bounds(self, client, monkeypatch):
+        """Test oversized limits are clamped and non-positive ones rejected"""
+        for i in range(3):
+            database.add_audit_log("Action", f"Event {i}")
+        monkeypatch.setattr(sys.modules['app'], 'PAGE_SIZE_MAX', 2)
+        assert len(client.get('/api/audit-logs?limit=100000').get_json()['data']) == 2
+        assert client.get('/api/audit-logs?limit=0').status_code == 400
+    
+    def test_search_audit_logs(self, client):
+        """Test field-scoped audit log search with a time range"""
+        response = client.get('/api/audit-logs?q=user:admin&since=2024-01-01')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['status'] == 'success'
+    
+    def test_audit_logs_including_archives(self, client):
+        """Test audit logs can include archived months"""
+        response = client.get('/api/audit-logs?archived=true')
+        assert response.status_code == 200
+    
+    def test_search_audit_logs_colons_are_literal(self, client):
+        """Test terms like times and IPv6 addresses are searched for rather than rejected"""
+        for query in ('10:30', 'fe80::1', 'bogus:value'):
+            response = client.get('/api/audit-logs', query_string={'q': query})
+            assert response.status_code == 200
+    
+    def test_search_audit_logs_rejects_unbalanced_quotes(self, client):
+        """Test an unterminated quoted phrase returns 400"""
+        response = client.get('/api/audit-logs', query_string={'q': 'details:"disk full'})
+        assert response.status_code == 400
+
+
+class TestBulkImportEndpoints:
+    """Test bulk ticket import"""
+    
+    def test_bulk_import_requires_login(self, client):
+        """Test bulk ticket import requires authentication"""
+        response = client.post('/api/tickets/bulk', json=[{"title": "Imported"}])
+        assert response.status_code == 401
+    
+    def test_bulk_import_reports_each_ticket(self, client, admin_headers):
+        """Test valid tickets are created and invalid ones reported by index"""
+        response = client.post('/api/tickets/bulk', headers=admin_headers,
+                               json=[{"title": "Imported"}, {"description": "No title"}, {"title": "Also imported"}])
+        assert response.status_code == 200
+        data = response.get_json()['data']
+        assert (data['created'], data['failed']) == (2, 1)
+        assert [r['status'] for r in data['results']] == ['created', 'error', 'created']
+        created = database.get_ticket_by_id(data['results'][0]['id'])
+        assert (created['title'], created['created_by']) == ("Imported", "admin")
+    
+    def test_bulk_import_ndjson(self, client, admin_headers):
+        """Test an NDJSON body is accepted and malformed lines are reported"""
+        body = '{"title": "First"}\nnot json\n{"title": "Second"}\n'
+        response = client.post('/api/tickets/bulk', headers=admin_headers, data=body,
+                               content_type='application/x-ndjson')
+        data = response.get_json()['data']
+        assert (data['created'], data['failed']) == (2, 1)
+        assert data['results'][1]['index'] == 1
+
+
+class TestExportEndpoints:
+    """Test streaming data exports"""
+    
+    def test_export_requires_login(self, client):
+        """Test data exports require authentication"""
+        response = client.get('/api/export/tickets?format=csv')
+        assert response.status_code == 401
+    
+    def test_export_tickets_csv(self, client, admin_headers):
+        """Test a CSV export has a header row and one line per ticket"""
+        database.create_tickets_bulk([{"title": "First"}, {"title": "Second", "status": "closed"}])
+        response = client.get('/api/export/tickets?format=csv', headers=admin_headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert 'attachment; filename=tickets_' in response.headers['Content-Disposition']
+        lines = response.get_data(as_text=True).splitlines()
+        assert lines[0].split(',') == database.TICKET_COLUMNS
+        assert [line.split(',')[1] for line in lines[1:]] == ["First", "Second"]
+    
+    def test_export_audit_logs_ndjson(self, client, admin_headers):
+        """Test an NDJSON export has one JSON object per line, filtered by time"""
+        database.insert_audit_logs([
+            ("a", "2024-01-10 00:00:00", "Login", "january", "admin", None, None),
+            ("b", "2024-02-10 00:00:00", "Login", "february", "admin", None, None)
+        ])
+        response = client.get('/api/export/audit-logs?since=2024-02-01&until=2024-03-01', headers=admin_headers)
+        assert response.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [row['details'] for row in rows] == ["february"]
+    
+    def test_export_rejects_unknown_dataset_and_format(self, client, admin_headers):
+        """Test unknown datasets get 404 and unknown formats 400"""
+        assert client.get('/api/export/passwords', headers=admin_headers).status_code == 404
+        assert client.get('/api/export/tickets?format=xml', headers=admin_headers).status_code == 400
+
+
+class TestAuditWriterEndpoints:
+    """Test the background audit writer endpoint"""
+    
+    def test_audit_writer_stats_requires_admin(self, client, technician_headers):
+        """Test audit writer stats are admin only"""
+        assert client.get('/api/admin/audit-writer').status_code == 401
+        assert client.get('/api/admin/audit-writer', headers=technician_headers).status_code == 403
+    
+    def test_audit_writer_stats(self, client, admin_headers):
+        """Test the writer reports its queue and counters"""
+        data = client.get('/api/admin/audit-writer', headers=admin_headers).get_json()['data']
+        assert data['running'] is True
+        assert data['queue_size'] > 0
+        assert data['lost'] == data['dropped'] + data['sampled_out'] + data['failed']
+
+
+class TestQueryStatsEndpoints:
+    """Test the query statistics endpoints"""
+    
+    def test_query_stats_requires_admin(self, client):
+        """Test query statistics are admin only"""
+        assert client.get('/api/admin/query-stats').status_code == 401
+        assert client.post('/api/admin/query-stats/reset').status_code == 401
+    
+    def test_query_stats_lists_statements(self, client, admin_headers):
+        """Test recorded statements are listed, and a reset discards them"""
+        client.get('/api/tickets', headers=admin_headers)
+        data = client.get('/api/admin/query-stats?limit=500', headers=admin_headers).get_json()['data']
+        assert any('FROM tickets' in statement['sql'] for statement in data['statements'])
+        assert {'slow_queries', 'slow_query_ms'} <= set(data)
+        
+        assert client.post('/api/admin/query-stats/reset', headers=admin_headers).status_code == 200
+        data = client.get('/api/admin/query-stats?limit=500', headers=admin_headers).get_json()['data']
+        assert not any('FROM tickets' in statement['sql'] for statement in data['statements'])
+    
+    def test_query_stats_rejects_unknown_sort(self, client, admin_headers):
+        """Test an unknown sort key returns 400"""
+        assert client.get('/api/admin/query-stats?sort=bogus', headers=admin_headers).status_code == 400
+
+
+class TestMaintenanceEndpoints:
+    """Test database maintenance endpoints"""
+    
+    def test_maintenance_requires_admin(self, client, technician_headers):
+        """Test maintenance history, runs and counter reconciles are admin only"""
+        assert client.get('/api/admin/maintenance').status_code == 401
+        assert client.post('/api/admin/maintenance/run').status_code == 401
+        assert client.post('/api/admin/ticket-counters/reconcile').status_code == 401
+        assert client.post('/api/admin/maintenance/run', headers=technician_headers).status_code == 403
+    
+    def test_run_is_recorded_in_history(self, client, admin_headers):
+        """Test a manual run returns its tasks and shows up in the history"""
+        response = client.post('/api/admin/maintenance/run', headers=admin_headers)
+        assert response.status_code == 200
+        run = response.get_json()['data']
+        assert run['trigger'] == 'admin'
+        assert [task['task'] for task in run['tasks']] == ['optimize', 'analyze', 'incremental_vacuum', 'checkpoint']
+        
+        data = client.get('/api/admin/maintenance', headers=admin_headers).get_json()['data']
+        assert data['runs'][0]['id'] == run['id']
+        assert 'running' in data['scheduler']
+    
+    def test_reconcile_ticket_counters(self, client, admin_headers):
+        """Test a reconcile repairs drifted counters and reports the drift"""
+        database.create_tickets_bulk([{"title": "Counted"}])
+        with database.get_db_connection() as conn:
+            conn.execute("UPDATE ticket_counters SET count = 5 WHERE dimension = 'total'")
+            conn.commit()
+        response = client.post('/api/admin/ticket-counters/reconcile', headers=admin_headers)
+        drift = response.get_json()['data']['drift']
+        assert {'dimension': 'total', 'value': '', 'stored': 5, 'actual': 1} in drift
+        assert client.get('/api/tickets/stats').get_json()['data']['total'] == 1
+
+
+class TestSessionSweeperEndpoints:
+    """Test expired-session sweeper endpoints"""
+    
+    def test_session_sweeper_requires_admin(self, client):
+        """Test session sweeper stats and sweeps are admin only"""
+        assert client.get('/api/admin/session-sweeper').status_code == 401
+        assert client.post('/api/admin/session-sweeper/run').status_code == 401
+    
+    def test_sweep_removes_expired_sessions(self, client, admin_headers):
+        """Test a manual sweep deletes expired sessions and keeps live ones"""
+        admin = auth.get_user_by_username('admin')
+        auth.create_session(admin['id'], expires_hours=-1, mode='database')
+        auth.create_session(admin['id'], expires_hours=-1, mode='database')
+        response = client.post('/api/admin/session-sweeper/run', headers=admin_headers)
+        assert response.status_code == 200
+        assert response.get_json()['data']['sessions'] == 2
+        
+        data = client.get('/api/admin/session-sweeper', headers=admin_headers).get_json()['data']
+        assert data['last_sweep']['sessions'] == 2
+        assert client.get('/api/auth/me', headers=admin_headers).status_code == 200
 
 
 class TestSecurityEndpoints:
@@ -0,0 +1,502 @@
+"""
+Endpoint Assist - Authentication Tests
+Unit tests for users, sessions and the session cache
+"""
+
+import pytest
+import sys
+import os
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Override database path for testing
+import database
+database.DATABASE_PATH = os.path.join(tempfile.gettempdir(), 'test_endpoint_assist.db')
+
+from database import init_db
+import auth
+from auth import (
+    init_auth_db, create_user, update_user, delete_user, get_user_by_username, authenticate,
+    hash_password, verify_password, needs_rehash,
+    create_session, validate_session, invalidate_session, invalidate_all_sessions, cleanup_expired_sessions,
+    session_cache, revocation_filter, login_throttle, sweep_expired_sessions
+)
+import session_sweeper
+
+
+@pytest.fixture(autouse=True)
+def setup_database(monkeypatch):
+    """Setup clean auth tables and an empty session cache for each test"""
+    # Cheap password hashing keeps the tests fast
+    monkeypatch.setattr(auth, 'PASSWORD_SCRYPT_N', 1024)
+    database.get_storage_backend().reset()
+    session_cache.clear()
+    revocation_filter.clear()
+    login_throttle.clear()
+    init_db()
+    init_auth_db()
+    yield
+    session_cache.clear()
+    revocation_filter.clear()
+    database.get_storage_backend().reset()
+
+
+@pytest.fixture
+def user_token():
+    """A technician with one session"""
+    user_id = create_user("tech", "secret123")
+    return user_id, create_session(user_id)
+
+
+class TestSessionCache:
+    """Test validated sessions are cached and evicted"""
+    
+    def test_repeat_validation_is_cached(self, user_token):
+        """Test a second validation is answered from the cache"""
+        user_id, token = user_token
+        first = validate_session(token)
+        hits = session_cache.stats['hits']
+        second = validate_session(token)
+        assert first == second
+        assert first['id'] == user_id
+        assert session_cache.stats['hits'] == hits + 1
+    
+    def test_cached_user_is_a_copy(self, user_token):
+        """Test callers cannot modify the cached entry"""
+        _, token = user_token
+        validate_session(token)['role'] = 'admin'
+        assert validate_session(token)['role'] == 'technician'
+    
+    def test_invalidate_session_evicts(self, user_token):
+        """Test logging out takes effect immediately"""
+        _, token = user_token
+        assert validate_session(token)
+        invalidate_session(token)
+        assert validate_session(token) is None
+    
+    def test_invalidate_all_sessions_evicts(self, user_token):
+        """Test every session of the user is dropped"""
+        user_id, token = user_token
+        other = create_session(user_id)
+        assert validate_session(token) and validate_session(other)
+        invalidate_all_sessions(user_id)
+        assert validate_session(token) is None
+        assert validate_session(other) is None
+    
+    def test_deactivating_user_evicts(self, user_token):
+        """Test update_user(is_active=0) rejects the cached session"""
+        user_id, token = user_token
+        assert validate_session(token)
+        update_user(user_id, is_active=0)
+        assert validate_session(token) is None
+    
+    def test_role_change_evicts(self, user_token):
+        """Test the cached role does not outlive a role change"""
+        user_id, token = user_token
+        assert validate_session(token)['role'] == 'technician'
+        update_user(user_id, role='viewer')
+        assert validate_session(token)['role'] == 'viewer'
+    
+    def test_delete_user_evicts(self, user_token):
+        """Test deleting the user rejects the cached session"""
+        user_id, token = user_token
+        assert validate_session(token)
+        delete_user(user_id)
+        assert validate_session(token) is None
+    
+    def test_entries_expire_after_ttl(self, user_token, monkeypatch):
+        """Test the database is read again once the TTL has passed"""
+        _, token = user_token
+        validate_session(token)
+        now = auth.time.time()
+        monkeypatch.setattr(auth.time, 'time', lambda: now + session_cache.ttl + 1)
+        misses = session_cache.stats['misses']
+        assert validate_session(token)
+        assert session_cache.stats['misses'] == misses + 1
+    
+    def test_entries_never_outlive_session(self, user_token):
+        """Test a session expiring within the TTL is cached only until it expires"""
+        user_id, _ = user_token
+        token = create_session(user_id, expires_hours=1 / 3600)
+        assert validate_session(token)
+        valid_until = session_cache._entries[token][1]
+        assert valid_until < auth.time.time() + min(session_cache.ttl, 1.5)
+    
+    def test_size_is_bounded(self):
+        """Test the least recently used sessions are dropped"""
+        cache = auth.SessionCache(ttl=60, max_size=2)
+        expires = auth.datetime.now() + auth.timedelta(hours=1)
+        for i, token in enumerate(["a", "b", "c"]):
+            cache.put(token, {'id': i}, expires, cache.generation())
+        assert len(cache) == 2
+        assert cache.get("a") is None
+        assert cache.get("c") == {'id': 2}
+    
+    def test_put_after_eviction_is_ignored(self):
+        """Test a validation that raced an invalidation is not cached"""
+        cache = auth.SessionCache(ttl=60, max_size=10)
+        expires = auth.datetime.now() + auth.timedelta(hours=1)
+        generation = cache.generation()
+        cache.evict("a")
+        cache.put("a", {'id': 1}, expires, generation)
+        assert cache.get("a") is None
+    
+    def test_disabled_with_zero_ttl(self, user_token, monkeypatch):
+        """Test SESSION_CACHE_TTL=0 always reads the database"""
+        _, token = user_token
+        monkeypatch.setattr(session_cache, 'ttl', 0)
+        validate_session(token)
+        assert validate_session(token)
+        assert len(session_cache) == 0
+
+
+class TestSignedTokens:
+    """Test stateless signed session tokens and their revocation"""
+    
+    @pytest.fixture
+    def signed(self):
+        """A technician with one signed token"""
+        user_id = create_user("tech", "secret123")
+        return user_id, create_session(user_id, mode='signed')
+    
+    def count_sessions(self):
+        with database.get_db_connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM user_sessions').fetchone()[0]
+    
+    def test_token_carries_user(self, signed):
+        """Test a signed token validates to its user without a session row"""
+        user_id, token = signed
+        assert token.startswith(auth.SIGNED_TOKEN_PREFIX)
+        user = validate_session(token)
+        assert user['id'] == user_id
+        assert user['username'] == "tech"
+        assert user['role'] == "technician"
+        assert self.count_sessions() == 0
+    
+    def test_tampered_tokens_rejected(self, signed):
+        """Test changing the claims or signature invalidates the token"""
+        _, token = signed
+        payload, signature = token[len(auth.SIGNED_TOKEN_PREFIX):].split('.')
+        forged = auth.SIGNED_TOKEN_PREFIX + auth._b64encode(
+            auth.base64.urlsafe_b64decode(payload + '==').replace(b'technician', b'admin')
+        )
+        assert validate_session(f"{forged}.{signature}") is None
+        assert validate_session(token[:-4] + "AAAA") is None
+        assert validate_session(auth.SIGNED_TOKEN_PREFIX + "garbage") is None
+    
+    def test_other_key_rejected(self, signed, monkeypatch):
+        """Test tokens signed with another key do not validate"""
+        _, token = signed
+        monkeypatch.setattr(auth, '_signing_key', b'another key')
+        assert validate_session(token) is None
+    
+    def test_expired_token_rejected(self):
+        """Test the expiry claim is enforced"""
+        user_id = create_user("tech", "secret123")
+        assert validate_session(create_session(user_id, expires_hours=-1, mode='signed')) is None
+    
+    def test_logout_revokes_only_that_token(self, signed):
+        """Test invalidate_session revokes one signed token"""
+        user_id, token = signed
+        other = create_session(user_id, mode='signed')
+        invalidate_session(token)
+        assert validate_session(token) is None
+        assert validate_session(other)['id'] == user_id
+    
+    def test_invalidate_all_sessions_revokes_earlier_tokens(self, signed):
+        """Test a per-user cut-off rejects old tokens but not new logins"""
+        user_id, token = signed
+        invalidate_all_sessions(user_id)
+        assert validate_session(token) is None
+        assert validate_session(create_session(user_id, mode='signed'))
+    
+    def test_disable_and_role_change_revoke(self, signed):
+        """Test tokens carrying a stale is_active or role stop validating"""
+        user_id, token = signed
+        update_user(user_id, role='viewer')
+        assert validate_session(token) is None
+        token = create_session(user_id, mode='signed')
+        assert validate_session(token)['role'] == 'viewer'
+        update_user(user_id, is_active=0)
+        assert validate_session(token) is None
+    
+    def test_unchanged_role_does_not_revoke(self, signed):
+        """Test updates that leave the role and is_active as they were keep tokens valid"""
+        user_id, token = signed
+        update_user(user_id, role='technician', email='tech@example.com')
+        update_user(user_id, is_active=1)
+        assert validate_session(token)['id'] == user_id
+        with database.get_db_connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM session_revocations').fetchone()[0] == 0
+    
+    def test_delete_user_revokes(self, signed):
+        """Test tokens of a deleted user stop validating"""
+        user_id, token = signed
+        delete_user(user_id)
+        assert validate_session(token) is None
+    
+    def test_other_workers_sync_revocations(self, signed):
+        """Test a revocation recorded elsewhere is seen after a sync"""
+        user_id, token = signed
+        worker = auth.RevocationFilter(sync_interval=3600)
+        claims = auth.decode_signed_token(token)
+        assert not worker.is_revoked(claims['jti'], user_id, claims['iat'])
+        invalidate_session(token)
+        assert not worker.is_revoked(claims['jti'], user_id, claims['iat'])
+        worker.sync(force=True)
+        assert worker.is_revoked(claims['jti'], user_id, claims['iat'])
+    
+    def test_filter_hits_are_confirmed(self, signed):
+        """Test a Bloom filter false positive does not reject a valid token"""
+        user_id, token = signed
+        claims = auth.decode_signed_token(token)
+        worker = auth.RevocationFilter(capacity=10, sync_interval=3600)
+        worker.sync()
+        worker._filter[:] = b'\xff' * len(worker._filter)
+        assert not worker.is_revoked(claims['jti'], user_id, claims['iat'])
+        assert worker.stats['false_positives'] == 1
+    
+    def test_cleanup_purges_expired_revocations(self, signed):
+        """Test revocations go once the revoked token has expired"""
+        user_id, _ = signed
+        revocation_filter.revoke_token("old", user_id, auth.time.time() - 60)
+        revocation_filter.revoke_token("current", user_id, auth.time.time() + 60)
+        cleanup_expired_sessions()
+        with database.get_db_connection() as conn:
+            remaining = [row[0] for row in conn.execute('SELECT jti FROM session_revocations')]
+        assert remaining == ["current"]
+
+
+class TestPasswordHashing:
+    """Test scrypt hashing, the bounded hasher and upgrades of old hashes"""
+    
+    def set_legacy_hash(self, user_id, password):
+        """Store a pre-scrypt salt$sha256 hash"""
+        salt = "ab" * 16
+        legacy = f"{salt}${auth.hashlib.sha256((password + salt).encode()).hexdigest()}"
+        with database.get_db_connection() as conn:
+            conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (legacy, user_id))
+            conn.commit()
+        return legacy
+    
+    def test_hash_format_and_verify(self):
+        """Test hashes record their cost and verify only the right password"""
+        password_hash = hash_password("secret123")
+        assert password_hash.startswith(f"scrypt${auth.PASSWORD_SCRYPT_N}$8$1$")
+        assert verify_password("secret123", password_hash)
+        assert not verify_password("wrong", password_hash)
+        assert hash_password("secret123") != password_hash
+        assert not needs_rehash(password_hash)
+    
+    def test_malformed_hash_rejected(self):
+        """Test unparseable hashes fail verification instead of raising"""
+        assert not verify_password("x", "scrypt$notanumber$8$1$00$00")
+        assert not verify_password("x", "no-separator")
+        assert not verify_password("x", None)
+    
+    def test_legacy_hash_upgraded_on_login(self):
+        """Test a salt$sha256 hash is replaced by scrypt after a successful login"""
+        user_id = create_user("tech", "secret123")
+        legacy = self.set_legacy_hash(user_id, "secret123")
+        assert needs_rehash(legacy)
+        
+        user, error = authenticate("tech", "wrong")
+        assert error
+        assert get_user_by_username("tech")['password_hash'] == legacy
+        
+        user, error = authenticate("tech", "secret123")
+        assert error is None
+        upgraded = get_user_by_username("tech")['password_hash']
+        assert upgraded.startswith("scrypt$")
+        assert authenticate("tech", "secret123")[1] is None
+    
+    def test_cost_change_rehashes(self, monkeypatch):
+        """Test raising the cost upgrades hashes as users log in"""
+        create_user("tech", "secret123")
+        monkeypatch.setattr(auth, 'PASSWORD_SCRYPT_N', auth.PASSWORD_SCRYPT_N * 2)
+        assert needs_rehash(get_user_by_username("tech")['password_hash'])
+        authenticate("tech", "secret123")
+        assert not needs_rehash(get_user_by_username("tech")['password_hash'])
+    
+    def test_hasher_limits_concurrency(self):
+        """Test callers beyond the workers and queue are turned away"""
+        import threading
+        hasher = auth.PasswordHasher(workers=1, queue_size=0, wait=0.05)
+        release = threading.Event()
+        holder = threading.Thread(target=hasher.run, args=(release.wait,))
+        holder.start()
+        try:
+            while hasher._slots._value:
+                auth.time.sleep(0.001)
+            with pytest.raises(auth.PasswordHasherBusy):
+                hasher.run(lambda: None)
+            assert hasher.stats['rejected'] == 1
+        finally:
+            release.set()
+            holder.join()
+        assert hasher.run(lambda: 42) == 42
+        assert hasher.stats['hashed'] == 2
+    
+    def test_hasher_counts_failures_apart(self):
+        """Test a hash that raises is counted as failed, not hashed"""
+        hasher = auth.PasswordHasher(workers=1)
+        with pytest.raises(ValueError):
+            hasher.run(auth._scrypt, "secret123", "not-hex", 1024, 8, 1)
+        assert hasher.stats['failed'] == 1
+        assert hasher.stats['hashed'] == 0
+    
+    def test_unknown_username_still_hashes(self):
+        """Test a login for a missing user does the same scrypt work as a wrong password"""
+        create_user("tech", "secret123")
+        # The dummy hash is made on first use
+        assert authenticate("nobody", "wrong") == (None, "Invalid username or password")
+        
+        hashed = auth.password_hasher.stats['hashed']
+        assert authenticate("tech", "wrong") == (None, "Invalid username or password")
+        assert auth.password_hasher.stats['hashed'] - hashed == 1
+        assert authenticate("nobody", "wrong") == (None, "Invalid username or password")
+        assert auth.password_hasher.stats['hashed'] - hashed == 2
+
+
+class TestLoginThrottle:
+    """Test token-bucket login throttling and deferred lockout writes"""
+    
+    def count_updates(self):
+        """UPDATE statements against users recorded so far"""
+        import query_stats
+        return sum(entry['count'] for entry in query_stats.query_stats.top(limit=1000)
+                   if entry['sql'].startswith('UPDATE users'))
+    
+    def test_ip_burst_then_throttled(self, monkeypatch):
+        """Test an address is limited after its burst, before the database is read"""
+        create_user("tech", "secret123")
+        monkeypatch.setattr(auth, 'get_user_by_username', lambda username: pytest.fail("database read"))
+        login_throttle.clear()
+        for i in range(auth.LOGIN_IP_BURST):
+            login_throttle.check("10.0.0.1", f"user{i}")
+        with pytest.raises(auth.LoginThrottled) as excinfo:
+            authenticate("tech", "secret123", ip_address="10.0.0.1")
+        assert excinfo.value.retry_after > 0
+        assert login_throttle.stats['throttled_ip'] == 1
+    
+    def test_username_limited_across_addresses(self):
+        """Test one account is limited however many addresses try it"""
+        create_user("tech", "secret123")
+        for i in range(auth.LOGIN_USER_BURST):
+            authenticate("tech", "wrong" if i < 3 else "secret123", ip_address=f"10.0.0.{i}")
+        with pytest.raises(auth.LoginThrottled):
+            authenticate("TECH", "secret123", ip_address="10.0.1.1")
+        assert login_throttle.stats['throttled_user'] == 1
+    
+    def test_tokens_refill(self, monkeypatch):
+        """Test attempts are allowed again once the bucket refills"""
+        buckets = auth.TokenBuckets(rate_per_minute=60, burst=2)
+        assert buckets.take("a", 0) == 0
+        assert buckets.take("a", 0) == 0
+        assert buckets.take("a", 0) == pytest.approx(1)
+        assert buckets.take("a", 1.0) == 0
+    
+    def test_key_table_is_bounded(self):
+        """Test the least recently seen keys are forgotten"""
+        buckets = auth.TokenBuckets(rate_per_minute=1, burst=1, max_keys=3)
+        for key in ["a", "b", "c", "d"]:
+            buckets.take(key, 0)
+        assert len(buckets) == 3
+        # "a" was evicted, so it starts over with a full bucket
+        assert buckets.take("a", 0) == 0
+        assert buckets.take("d", 0) > 0
+    
+    def test_failures_below_threshold_do_not_write(self):
+        """Test failed logins only write to the database at the lockout threshold"""
+        user_id = create_user("tech", "secret123")
+        updates = self.count_updates()
+        for i in range(auth.LOGIN_LOCKOUT_THRESHOLD - 1):
+            authenticate("tech", "wrong", ip_address=f"10.0.0.{i}")
+        assert self.count_updates() == updates
+        assert get_user_by_username("tech")['locked_until'] is None
+        
+        authenticate("tech", "wrong")
+        user = get_user_by_username("tech")
+        assert user['locked_until'] is not None
+        assert user['failed_attempts'] == auth.LOGIN_LOCKOUT_THRESHOLD
+        login_throttle.clear()
+        assert authenticate("tech", "secret123")[1] == "Account is locked. Try again later."
+    
+    def test_success_resets_failures(self):
+        """Test a successful login clears the in-memory failure count"""
+        create_user("tech", "secret123")
+        authenticate("tech", "wrong")
+        authenticate("tech", "secret123")
+        assert login_throttle.record_failure("tech") == 1
+
+
+class TestSessionSweeper:
+    """Test batched deletion of expired sessions"""
+    
+    def add_sessions(self, user_id, expired, live):
+        """Create expired and live database sessions"""
+        for _ in range(expired):
+            create_session(user_id, expires_hours=-1, mode='database')
+        return [create_session(user_id, mode='database') for _ in range(live)]
+    
+    def count_sessions(self):
+        with database.get_db_connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM user_sessions').fetchone()[0]
+    
+    def test_sweep_removes_only_expired(self):
+        """Test expired sessions go in batches and live ones stay valid"""
+        user_id = create_user("tech", "secret123")
+        live = self.add_sessions(user_id, expired=5, live=2)
+        
+        result = sweep_expired_sessions(batch_size=2, pause=0)
+        assert result['sessions'] == 5
+        assert result['batches'] == 3 + 1  # 2 + 2 + 1 sessions, then one empty revocation batch
+        assert self.count_sessions() == 2
+        assert all(validate_session(token) for token in live)
+        assert cleanup_expired_sessions() == 0
+    
+    def test_sweep_removes_expired_revocations(self):
+        """Test revocations of expired signed tokens are swept too"""
+        user_id = create_user("tech", "secret123")
+        revocation_filter.revoke_token("old", user_id, auth.time.time() - 60)
+        revocation_filter.revoke_token("current", user_id, auth.time.time() + 60)
+        assert sweep_expired_sessions(pause=0)['revocations'] == 1
+    
+    def test_sweep_uses_expiry_index(self):
+        """Test batches are found through idx_user_sessions_expires"""
+        with database.get_db_connection() as conn:
+            plan = ' '.join(row[3] for row in conn.execute(
+                'EXPLAIN QUERY PLAN SELECT id FROM user_sessions WHERE expires_at < ? ORDER BY expires_at LIMIT ?',
+                ("2024-01-01", 10)
+            ))
+        assert 'idx_user_sessions_expires' in plan
+    
+    def test_sweep_now_counts_rows(self):
+        """Test the sweeper reports what it removed"""
+        user_id = create_user("tech", "secret123")
+        self.add_sessions(user_id, expired=3, live=1)
+        sweeper = session_sweeper.SessionSweeper(interval=3600)
+        result = sweeper.sweep_now()
+        assert result['sessions'] == 3
+        stats = sweeper.stats()
+        assert stats['sweeps'] == 1
+        assert stats['sessions_removed'] == 3
+        assert stats['last_sweep']['sessions'] == 3
+    
+    def test_background_sweeps(self):
+        """Test the thread sweeps on its interval and stops cleanly"""
+        user_id = create_user("tech", "secret123")
+        self.add_sessions(user_id, expired=2, live=1)
+        sweeper = session_sweeper.SessionSweeper(interval=0.05)
+        sweeper.start()
+        try:
+            deadline = auth.time.time() + 5
+            while sweeper.counters['sweeps'] == 0 and auth.time.time() < deadline:
+                auth.time.sleep(0.01)
+        finally:
+            sweeper.stop()
+        assert not sweeper.running
+        assert sweeper.counters['sessions_removed'] == 2
+        assert self.count_sessions() == 1
@@ -7,6 +7,7 @@ import pytest
 import sys
 import os
 import tempfile
+import json
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -17,23 +18,24 @@ database.DATABASE_PATH = os.path.join(tempfile.gettempdir(), 'test_endpoint_assi
 
 from database import (
     init_db,
-    create_ticket, get_all_tickets, get_ticket_by_id, update_ticket, delete_ticket, get_ticket_stats,
-    add_audit_log, get_audit_logs,
+    create_ticket, get_all_tickets, get_tickets_page, get_ticket_by_id, update_ticket, delete_ticket, get_ticket_stats,
+    search_tickets, reconcile_ticket_counters,
+    add_audit_log, get_audit_logs, get_audit_logs_page,
     get_setting, set_setting
 )
+import exports
+import query_stats
 
 
 @pytest.fixture(autouse=True)
 def setup_database():
     """Setup clean database for each test"""
-    # Remove test database if exists
-    if os.path.exists(database.DATABASE_PATH):
-        os.remove(database.DATABASE_PATH)
+    # Closes pooled connections and removes the test database files
+    database.get_storage_backend().reset()
     init_db()
     yield
     # Cleanup after test
-    if os.path.exists(database.DATABASE_PATH):
-        os.remove(database.DATABASE_PATH)
+    database.get_storage_backend().reset()
 
 
 class TestTicketOperations:
@@ -48,7 +50,7 @@ class TestTicketOperations:
             "category": "testing"
         })
         assert ticket_id is not None
-        assert len(ticket_id) == 36  # UUID length
+        assert len(ticket_id) == 26  # ULID length
     
     def test_get_ticket_by_id(self):
         """Test retrieving a ticket by ID"""
@@ -117,6 +119,235 @@ class TestTicketOperations:
             assert ticket['status'] == "open"
 
 
+class TestBulkTicketImport:
+    """Test bulk ticket creation"""
+    
+    def test_valid_and_invalid_rows(self):
+        """Test invalid rows are reported without blocking valid ones"""
+        results = database.create_tickets_bulk([
+            {"title": "Printer offline", "priority": "high"},
+            {"description": "No title"},
+            {"title": "Bad priority", "priority": "urgent"},
+            "not an object",
+            {"title": "VPN drops", "status": "resolved"}
+        ])
+        assert [r['status'] for r in results] == ["created", "error", "error", "error", "created"]
+        assert [r['index'] for r in results] == [0, 1, 2, 3, 4]
+        assert "title" in results[1]['message']
+        assert get_ticket_by_id(results[0]['id'])['priority'] == "high"
+        
+        stats = get_ticket_stats()
+        assert stats['total'] == 2
+        assert stats['resolved'] == 1
+    
+    def test_batches_cover_all_rows(self):
+        """Test rows spanning several batches are all inserted and searchable"""
+        results = database.create_tickets_bulk(
+            [{"title": f"Imported ticket {i}"} for i in range(25)], batch_size=10
+        )
+        assert all(r['status'] == "created" for r in results)
+        assert get_ticket_stats()['total'] == 25
+        assert len(search_tickets("imported", limit=50)) == 25
+
+
+class TestTicketCounters:
+    """Test trigger-maintained ticket counters"""
+    
+    def test_counters_follow_writes(self):
+        """Test inserts, updates and deletes keep the counters exact"""
+        first = create_ticket({"title": "A", "status": "open", "priority": "high", "category": "Network"})
+        create_ticket({"title": "B", "status": "open", "priority": "low", "category": "Hardware"})
+        update_ticket(first, {"status": "resolved", "category": "Hardware"})
+        
+        stats = get_ticket_stats()
+        assert stats['total'] == 2
+        assert stats['open'] == 1
+        assert stats['resolved'] == 1
+        assert stats['by_priority'] == {"high": 1, "low": 1}
+        assert stats['by_category'] == {"Hardware": 2}
+        
+        delete_ticket(first)
+        stats = get_ticket_stats()
+        assert stats['total'] == 1
+        assert stats['resolved'] == 0
+        assert stats['by_status'] == {"open": 1}
+    
+    def test_empty_stats(self):
+        """Test stats are zero with no tickets"""
+        stats = get_ticket_stats()
+        assert stats['total'] == 0
+        assert stats['open'] == 0
+    
+    def test_reconcile_reports_and_repairs_drift(self):
+        """Test reconcile rebuilds counters and lists drifted rows"""
+        create_ticket({"title": "A", "status": "open"})
+        assert reconcile_ticket_counters() == []
+        
+        with database.get_db_connection() as conn:
+            conn.execute("UPDATE ticket_counters SET count = 5 WHERE dimension = 'status' AND value = 'open'")
+            conn.commit()
+        
+        drift = reconcile_ticket_counters()
+        assert drift == [{"dimension": "status", "value": "open", "stored": 5, "actual": 1}]
+        assert get_ticket_stats()['open'] == 1
+
+
+class TestTicketSearch:
+    """Test full-text ticket search"""
+    
+    def test_search_title_and_description(self):
+        """Test matches are found in titles and descriptions"""
+        printer = create_ticket({"title": "Printer offline", "description": "Floor 2"})
+        vpn = create_ticket({"title": "VPN drops", "description": "Printer works fine"})
+        create_ticket({"title": "Email quota", "description": "Mailbox full"})
+        
+        results = search_tickets("printer")
+        assert {r['id'] for r in results} == {printer, vpn}
+        # Title matches rank above description matches
+        assert results[0]['id'] == printer
+    
+    def test_prefix_query(self):
+        """Test a trailing * matches term prefixes"""
+        create_ticket({"title": "Printer offline"})
+        assert len(search_tickets("print")) == 0
+        assert len(search_tickets("print*")) == 1
+    
+    def test_snippet_highlights_match(self):
+        """Test results carry a highlighted snippet"""
+        create_ticket({"title": "Outlook crashes on startup"})
+        result = search_tickets("outlook")[0]
+        assert '<mark>Outlook</mark>' in result['snippet']
+    
+    def test_snippet_escapes_ticket_text(self):
+        """Test markup in ticket text is escaped and only the highlight is HTML"""
+        create_ticket({"title": "Outlook <img src=x onerror=alert(1)> & <b>crash</b>"})
+        snippet = search_tickets("outlook")[0]['snippet']
+        assert '<img' not in snippet and '<b>' not in snippet
+        assert snippet == '<mark>Outlook</mark> &lt;img src=x onerror=alert(1)&gt; &amp; &lt;b&gt;crash&lt;/b&gt;'
+    
+    def test_index_follows_updates_and_deletes(self):
+        """Test triggers keep the search index in sync"""
+        ticket_id = create_ticket({"title": "Slow laptop"})
+        update_ticket(ticket_id, {"resolution": "Replaced the SSD"})
+        assert [r['id'] for r in search_tickets("ssd")] == [ticket_id]
+        
+        delete_ticket(ticket_id)
+        assert search_tickets("ssd") == []
+        assert search_tickets("laptop") == []
+    
+    def test_operators_in_input_are_literal(self):
+        """Test FTS5 syntax in user input does not raise"""
+        create_ticket({"title": "Printer offline"})
+        assert search_tickets('printer" OR NEAR(') == []
+    
+    def test_empty_query_rejected(self):
+        """Test an empty query raises ValueError"""
+        with pytest.raises(ValueError):
+            search_tickets("  * ")
+
+
+class TestPagination:
+    """Test keyset pagination of tickets and audit logs"""
+    
+    def test_ticket_pages_cover_all_rows_once(self):
+        """Test walking every page returns each ticket exactly once"""
+        created = {create_ticket({"title": f"Ticket {i}"}) for i in range(7)}
+        
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = get_tickets_page(limit=3, cursor=cursor)
+            assert len(page) <= 3
+            seen.extend(ticket['id'] for ticket in page)
+            if not cursor:
+                break
+        
+        assert len(seen) == len(created)
+        assert set(seen) == created
+    
+    def test_last_page_has_no_cursor(self):
+        """Test next_cursor is None when there are no more rows"""
+        create_ticket({"title": "Only"})
+        page, cursor = get_tickets_page(limit=1)
+        assert len(page) == 1
+        assert cursor is None
+    
+    def test_ticket_pages_respect_status_filter(self):
+        """Test the status filter applies on every page"""
+        for i in range(4):
+            create_ticket({"title": f"Open {i}", "status": "open"})
+            create_ticket({"title": f"Closed {i}", "status": "closed"})
+        
+        page, cursor = get_tickets_page(status_filter="open", limit=2)
+        page2, _ = get_tickets_page(status_filter="open", limit=2, cursor=cursor)
+        for ticket in page + page2:
+            assert ticket['status'] == "open"
+        assert not {t['id'] for t in page} & {t['id'] for t in page2}
+    
+    def test_audit_log_pages(self):
+        """Test audit logs page newest first without overlap"""
+        for i in range(5):
+            add_audit_log(f"Action {i}", "Details")
+        
+        page, cursor = get_audit_logs_page(limit=3)
+        page2, cursor2 = get_audit_logs_page(limit=3, cursor=cursor)
+        assert len(page) == 3
+        assert len(page2) == 2
+        assert cursor2 is None
+        assert page[0]['action'] == "Action 4"
+        assert page2[-1]['action'] == "Action 0"
+    
+    def test_invalid_cursor_rejected(self):
+        """Test a malformed cursor raises ValueError"""
+        with pytest.raises(ValueError):
+            get_tickets_page(cursor="not-a-cursor")
+    
+    def test_json_ticket_pages_match_dict_pages(self):
+        """Test as_json pages decode to the same rows and cursors"""
+        for i in range(5):
+            create_ticket({"title": f"Ticket é {i}", "description": 'quote " and \\ slash'})
+        
+        cursor = None
+        while True:
+            page, next_cursor = get_tickets_page(limit=2, cursor=cursor)
+            data, json_cursor = get_tickets_page(limit=2, cursor=cursor, as_json=True)
+            assert json.loads(data) == page
+            assert json_cursor == next_cursor
+            if not next_cursor:
+                break
+            cursor = next_cursor
+    
+    def test_json_audit_log_pages_match_dict_pages(self):
+        """Test as_json audit log pages decode to the same rows and cursors"""
+        for i in range(5):
+            add_audit_log(f"Action {i}", "Details", ip_address="10.0.0.1")
+        
+        page, cursor = get_audit_logs_page(limit=3, action_filter="Action")
+        data, json_cursor = get_audit_logs_page(limit=3, action_filter="Action", as_json=True)
+        assert json.loads(data) == page
+        assert json_cursor == cursor
+        
+        data, json_cursor = get_audit_logs_page(limit=3, cursor=cursor, as_json=True)
+        assert json.loads(data) == get_audit_logs_page(limit=3, cursor=cursor)[0]
+        assert json_cursor is None
+    
+    def test_internal_row_key_not_returned(self):
+        """Test the seq row key stays out of pages, lookups, search results and exports"""
+        ticket_id = create_ticket({"title": "Printer offline"})
+        add_audit_log("Login", "Details")
+        
+        rows = [
+            get_ticket_by_id(ticket_id), get_tickets_page()[0][0], json.loads(get_tickets_page(as_json=True)[0])[0],
+            search_tickets("printer")[0], next(database.iter_tickets()),
+            get_audit_logs_page()[0][0], json.loads(get_audit_logs_page(as_json=True)[0])[0],
+            next(database.iter_audit_logs())
+        ]
+        for row in rows:
+            assert 'seq' not in row
+        assert list(get_ticket_by_id(ticket_id)) == database.TICKET_COLUMNS
+        assert list(get_audit_logs_page()[0][0]) == database.AUDIT_LOG_COLUMNS
+
+
 class TestAuditLogOperations:
     """Test audit log database operations"""
     
@@ -155,6 +386,975 @@ class TestAuditLogOperations:
             assert "Login" in log['action']
 
 
+class TestStorageBackends:
+    """Test selecting the in-memory storage backend"""
+    
+    @pytest.fixture
+    def memory(self):
+        backend = database.configure_storage('memory')
+        init_db()
+        yield backend
+        backend.reset()
+        database.configure_storage('sqlite')
+    
+    def test_memory_backend_is_separate_and_disposable(self, memory):
+        """Test the in-memory database holds its own data and is emptied by reset()"""
+        create_ticket({"title": "Disk-free ticket", "description": "Stored in memory"})
+        assert [t['title'] for t in search_tickets("disk")] == ["Disk-free ticket"]
+        assert get_ticket_stats()['total'] == 1
+        assert memory.files() == []
+        
+        memory.reset()
+        init_db()
+        assert get_ticket_stats()['total'] == 0
+    
+    def test_memory_backend_shared_across_threads(self, memory):
+        """Test every pooled connection sees the same in-memory database"""
+        import threading
+        ticket_ids = []
+        threads = [threading.Thread(target=lambda: ticket_ids.append(create_ticket({"title": "Threaded"})))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(get_ticket_by_id(ticket_id) for ticket_id in ticket_ids)
+        assert get_ticket_stats()['total'] == 4
+    
+    def test_unknown_backend(self):
+        """Test an unknown backend name is rejected"""
+        with pytest.raises(ValueError):
+            database.configure_storage('postgres')
+
+
+class TestConnectionPool:
+    """Test pooled database connections"""
+    
+    def test_connection_reused_within_thread(self):
+        """Test the same thread gets the same connection back"""
+        with database.get_db_connection() as first:
+            pass
+        with database.get_db_connection() as second:
+            pass
+        assert first is second
+    
+    def test_nested_use_shares_connection(self):
+        """Test nested context managers share the outer connection"""
+        with database.get_db_connection() as outer:
+            with database.get_db_connection() as inner:
+                assert inner is outer
+            # Inner release must not hand the connection back early
+            outer.execute('SELECT 1')
+    
+    def test_separate_connection_per_thread(self):
+        """Test each thread gets its own connection"""
+        import threading
+        
+        connections = []
+        
+        def worker():
+            with database.get_db_connection() as conn:
+                connections.append(conn)
+        
+        with database.get_db_connection() as main_conn:
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        
+        assert connections[0] is not main_conn
+    
+    def test_connection_reused_across_threads(self):
+        """Test a connection returned by one thread is handed to the next"""
+        import threading
+        
+        connections = []
+        
+        def worker():
+            with database.get_db_connection() as conn:
+                connections.append(conn)
+        
+        for _ in range(2):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        
+        assert connections[0] is connections[1]
+    
+    def test_short_lived_threads_reuse_connections(self):
+        """Test thread-per-request traffic does not open a connection per thread"""
+        import threading
+        
+        pool = database.configure_pool(max_size=20)
+        try:
+            def request():
+                for _ in range(3):
+                    with database.get_db_connection() as conn:
+                        conn.execute('SELECT 1').fetchone()
+            
+            for _ in range(10):
+                wave = [threading.Thread(target=request) for _ in range(20)]
+                for thread in wave:
+                    thread.start()
+                for thread in wave:
+                    thread.join()
+            
+            assert pool.stats['overflow'] == 0
+            assert pool.stats['created'] <= 20
+            assert pool.stats['created'] + pool.stats['reused'] == 600
+            assert pool.size() <= 20
+        finally:
+            database.configure_pool()
+    
+    def test_uncommitted_work_rolled_back_on_release(self):
+        """Test a released connection does not leak an open transaction"""
+        with database.get_db_connection() as conn:
+            conn.execute("INSERT INTO settings (key, value) VALUES ('uncommitted', 'x')")
+        
+        assert get_setting('uncommitted') is None
+    
+    def test_overflow_connections_are_closed(self):
+        """Test threads beyond max_size get unpooled connections"""
+        import threading
+        
+        pool = database.configure_pool(max_size=1)
+        try:
+            with database.get_db_connection():
+                overflow = []
+                
+                def worker():
+                    with database.get_db_connection() as conn:
+                        overflow.append(conn)
+                
+                thread = threading.Thread(target=worker)
+                thread.start()
+                thread.join()
+            
+            assert pool.size() == 1
+            assert pool.stats['overflow'] == 1
+            import sqlite3
+            with pytest.raises(sqlite3.ProgrammingError):
+                overflow[0].execute('SELECT 1')
+        finally:
+            database.configure_pool()
+    
+    def test_idle_connections_evicted(self):
+        """Test idle connections are replaced after idle_timeout"""
+        pool = database.configure_pool(idle_timeout=0)
+        try:
+            with database.get_db_connection() as first:
+                pass
+            with database.get_db_connection() as second:
+                pass
+            assert first is not second
+            assert pool.stats['created'] == 2
+        finally:
+            database.configure_pool()
+    
+    def test_close_all_waits_for_busy_connections(self):
+        """Test close_all() lets another thread finish with its connection first"""
+        import sqlite3
+        import threading
+        import time
+        
+        in_use = threading.Event()
+        held = []
+        results = []
+        
+        def worker():
+            with database.get_db_connection() as conn:
+                held.append(conn)
+                in_use.set()
+                time.sleep(0.2)
+                results.append(conn.execute('SELECT 1').fetchone()[0])
+        
+        thread = threading.Thread(target=worker)
+        thread.start()
+        in_use.wait(5)
+        database.close_all_connections()
+        thread.join()
+        
+        assert results == [1]
+        assert database.get_pool().size() == 0
+        with pytest.raises(sqlite3.ProgrammingError):
+            held[0].execute('SELECT 1')
+    
+    def test_close_all_leaves_busy_connections_to_their_thread(self):
+        """Test a connection still in use after the timeout is closed on release"""
+        import sqlite3
+        import threading
+        
+        pool = database.get_pool()
+        in_use = threading.Event()
+        closed = threading.Event()
+        held = []
+        
+        def worker():
+            with database.get_db_connection() as conn:
+                held.append(conn)
+                in_use.set()
+                closed.wait(5)
+                # Still usable until this thread releases it
+                conn.execute('SELECT 1').fetchone()
+        
+        thread = threading.Thread(target=worker)
+        thread.start()
+        in_use.wait(5)
+        pool.close_all(timeout=0)
+        closed.set()
+        thread.join()
+        
+        assert pool.size() == 0
+        with pytest.raises(sqlite3.ProgrammingError):
+            held[0].execute('SELECT 1')
+
+
+class TestPerformanceProfile:
+    """Test the SQLite tuning profile applied to connections"""
+    
+    def test_default_profile_in_effect(self):
+        """Test new connections use the default profile"""
+        report = database.get_pragma_report()
+        assert report['profile'] == database.DEFAULT_DB_PROFILE
+        assert report['pragmas']['journal_mode'] == 'WAL'
+        assert report['pragmas']['synchronous'] == 'NORMAL'
+        assert report['pragmas']['temp_store'] == 'MEMORY'
+    
+    def test_profile_selected_from_settings(self):
+        """Test the db_profile setting applies to new connections"""
+        set_setting('db_profile', 'throughput')
+        database.close_all_connections()
+        report = database.get_pragma_report()
+        assert report['profile'] == 'throughput'
+        assert report['pragmas']['busy_timeout'] == database.DB_PROFILES['throughput']['busy_timeout']
+    
+    def test_environment_overrides_settings(self, monkeypatch):
+        """Test DB_PROFILE takes precedence over the setting"""
+        set_setting('db_profile', 'throughput')
+        monkeypatch.setattr(database, 'DB_PROFILE', 'legacy')
+        database.close_all_connections()
+        report = database.get_pragma_report()
+        assert report['profile'] == 'legacy'
+        assert report['pragmas']['synchronous'] == 'FULL'
+    
+    def test_unknown_profile_falls_back(self):
+        """Test an unknown profile name falls back to the default"""
+        set_setting('db_profile', 'does-not-exist')
+        database.close_all_connections()
+        assert database.get_pragma_report()['profile'] == database.DEFAULT_DB_PROFILE
+    
+    def test_profile_resolved_once(self, capsys):
+        """Test new connections reuse the resolved profile and an unknown name warns once"""
+        set_setting('db_profile', 'not-a-profile')
+        query_stats.query_stats.reset()
+        for _ in range(3):
+            database.get_storage_backend().connect().close()
+        
+        lookups = [entry for entry in query_stats.query_stats.top(limit=100) if entry['sql'] == "SELECT value FROM settings WHERE key = ?"]
+        assert sum(entry['count'] for entry in lookups) == 1
+        assert capsys.readouterr().out.count('not-a-profile') == 1
+
+
+class TestSchemaMigrations:
+    """Test schema migrations and query indexes"""
+    
+    def test_all_migrations_applied(self):
+        """Test init_db brings the schema to the latest version"""
+        with database.get_db_connection() as conn:
+            assert database.get_schema_version(conn) == len(database.SCHEMA_MIGRATIONS)
+    
+    def test_migrate_is_idempotent(self):
+        """Test running migrations again is a no-op"""
+        init_db()
+        with database.get_db_connection() as conn:
+            database.migrate_db(conn)
+            assert database.get_schema_version(conn) == len(database.SCHEMA_MIGRATIONS)
+    
+    def test_hot_queries_use_indexes(self):
+        """Test the ticket and audit log listings avoid full scans"""
+        add_audit_log("Login", "User logged in")
+        partition = database.get_audit_partitions()['live'][0]['table_name']
+        queries = [
+            "SELECT * FROM tickets WHERE status = 'open' ORDER BY created_at DESC LIMIT 100",
+            f"SELECT * FROM {partition} ORDER BY timestamp DESC LIMIT 100",
+            "SELECT * FROM device_inventory ORDER BY last_seen DESC"
+        ]
+        with database.get_db_connection() as conn:
+            for query in queries:
+                plan = ' '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}'))
+                assert 'USING INDEX' in plan
+                assert 'TEMP B-TREE' not in plan
+
+
+class TestAuditLogPartitions:
+    """Test monthly audit log partitions, expiry and archives"""
+    
+    @pytest.fixture(autouse=True)
+    def archive_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(database, 'AUDIT_ARCHIVE_DIR', str(tmp_path))
+        return tmp_path
+    
+    def seed_months(self):
+        database.insert_audit_logs([
+            ("a", "2024-01-10 00:00:00", "Login", "january", "admin", None, None),
+            ("b", "2024-02-10 00:00:00", "Ticket", "february", "bob", None, None),
+            ("c", "2024-03-10 00:00:00", "Login", "march", "admin", None, None)
+        ])
+    
+    def test_rows_routed_by_month(self):
+        """Test each month gets its own partition"""
+        self.seed_months()
+        months = [p['month'] for p in database.get_audit_partitions()['live']]
+        assert months == ["2024-01", "2024-02", "2024-03"]
+    
+    def test_pages_span_partitions(self):
+        """Test keyset pages continue across month boundaries"""
+        self.seed_months()
+        page, cursor = get_audit_logs_page(limit=2)
+        page2, cursor2 = get_audit_logs_page(limit=2, cursor=cursor)
+        assert [l['id'] for l in page + page2] == ["c", "b", "a"]
+        assert cursor2 is None
+    
+    def test_expire_archives_and_drops(self, archive_dir):
+        """Test expired months are archived, dropped and still readable"""
+        self.seed_months()
+        expired = database.expire_audit_partitions("2024-03")
+        assert [(e['month'], e['rows']) for e in expired] == [("2024-01", 1), ("2024-02", 1)]
+        assert len(list(archive_dir.glob("*.ndjson.gz"))) == 2
+        
+        assert [l['id'] for l in get_audit_logs()] == ["c"]
+        assert [l['id'] for l in get_audit_logs(include_archived=True)] == ["c", "b", "a"]
+        
+        logs, _ = get_audit_logs_page(search="user:admin", include_archived=True)
+        assert [l['id'] for l in logs] == ["c", "a"]
+        logs, _ = get_audit_logs_page(until="2024-02-01", include_archived=True)
+        assert [l['id'] for l in logs] == ["a"]
+        data, _ = get_audit_logs_page(include_archived=True, as_json=True)
+        assert json.loads(data) == get_audit_logs_page(include_archived=True)[0]
+    
+    def test_expire_without_archive(self, archive_dir):
+        """Test archiving can be turned off"""
+        self.seed_months()
+        database.expire_audit_partitions("2024-02", archive=False)
+        assert list(archive_dir.iterdir()) == []
+        assert [l['id'] for l in get_audit_logs(include_archived=True)] == ["c", "b"]
+    
+    def test_clear_old_audit_logs_keeps_current_month(self):
+        """Test retention drops whole months before the cutoff"""
+        self.seed_months()
+        add_audit_log("Login", "today")
+        assert database.clear_old_audit_logs(days=0, archive=False) == 3
+        assert [l['details'] for l in get_audit_logs()] == ["today"]
+    
+    def test_archived_month_rejects_inserts(self, archive_dir):
+        """Test rows for an archived month are refused rather than starting a second partition"""
+        self.seed_months()
+        database.expire_audit_partitions("2024-02")
+        
+        with pytest.raises(ValueError):
+            database.insert_audit_logs([
+                ("d", "2024-03-11 00:00:00", "Login", "march", "admin", None, None),
+                ("e", "2024-01-11 00:00:00", "Login", "late", "admin", None, None)
+            ])
+        # The whole batch is rejected
+        assert [l['id'] for l in get_audit_logs(include_archived=True)] == ["c", "b", "a"]
+        assert [p['month'] for p in database.get_audit_partitions()['live']] == ["2024-02", "2024-03"]
+        assert len(list(archive_dir.glob("*.ndjson.gz"))) == 1
+    
+    def test_archives_of_one_month_are_merged(self, archive_dir):
+        """Test a month archived twice ends up as one file in timestamp order"""
+        database.insert_audit_logs([("a2", "2024-01-20 00:00:00", "Login", "second", "admin", None, None)])
+        database.expire_audit_partitions("2024-02")
+        with database.get_db_connection() as conn:
+            # What older versions allowed: a new partition for an archived month
+            first = conn.execute("SELECT path, month, row_count FROM audit_archives").fetchone()
+            conn.execute("DELETE FROM audit_archives")
+            conn.commit()
+        database.insert_audit_logs([("a1", "2024-01-05 00:00:00", "Login", "first", "admin", None, None)])
+        database.expire_audit_partitions("2024-02")
+        with database.get_db_connection() as conn:
+            conn.execute("INSERT INTO audit_archives (path, month, row_count) VALUES (?, ?, ?)", tuple(first))
+            conn.commit()
+        assert len(list(archive_dir.glob("*.ndjson.gz"))) == 2
+        
+        assert database.merge_audit_archives() == ["2024-01"]
+        (archive,) = database.get_audit_partitions()['archived']
+        assert archive['row_count'] == 2
+        assert [str(path) for path in archive_dir.glob("*.ndjson.gz")] == [archive['path']]
+        assert [l['id'] for l in get_audit_logs(include_archived=True)] == ["a2", "a1"]
+        page, cursor = get_audit_logs_page(limit=1, include_archived=True)
+        page2, _ = get_audit_logs_page(limit=1, cursor=cursor, include_archived=True)
+        assert [l['id'] for l in page + page2] == ["a2", "a1"]
+
+
+class TestRecordIds:
+    """Test time-ordered record ids and the integer key migration"""
+    
+    def test_ids_sort_in_creation_order(self):
+        """Test ULIDs sort by creation time"""
+        import time
+        
+        ids = []
+        for _ in range(3):
+            ids.append(database.new_id())
+            time.sleep(0.002)
+        assert ids == sorted(ids)
+        assert len(set(ids)) == 3
+    
+    def test_display_id(self):
+        """Test short ids use the random tail of a ULID and the head of a UUID"""
+        assert database.display_id("01HV8ZQ4R7Y3K2M9N5P6T8W0XA") == "P6T8W0XA"
+        assert database.display_id("3f2b1c9a-0000-4000-8000-000000000000") == "3F2B1C9A"
+    
+    def test_migration_keeps_rows_in_time_order(self, monkeypatch):
+        """Test existing rows keep their ids and get keys in timestamp order"""
+        database.close_all_connections()
+        os.remove(database.DATABASE_PATH)
+        rebuild = next(
+            i for i, (description, _) in enumerate(database.SCHEMA_MIGRATIONS)
+            if description.startswith('time-ordered')
+        )
+        monkeypatch.setattr(database, 'SCHEMA_MIGRATIONS', database.SCHEMA_MIGRATIONS[:rebuild])
+        init_db()
+        
+        with database.get_db_connection() as conn:
+            conn.executemany(
+                'INSERT INTO tickets (id, title, created_at) VALUES (?, ?, ?)',
+                [("uuid-b", "Printer offline", "2024-02-01 00:00:00"),
+                 ("uuid-a", "VPN drops", "2024-01-01 00:00:00")]
+            )
+            conn.commit()
+            monkeypatch.undo()
+            database.migrate_db(conn)
+            rows = conn.execute('SELECT seq, id FROM tickets ORDER BY seq').fetchall()
+        
+        assert [row['id'] for row in rows] == ["uuid-a", "uuid-b"]
+        assert [r['id'] for r in search_tickets("printer")] == ["uuid-b"]
+        assert get_ticket_stats()['total'] == 2
+        assert get_ticket_by_id("uuid-a")['title'] == "VPN drops"
+
+
+    def test_partition_migration_keeps_unplaceable_rows(self, monkeypatch):
+        """Test audit logs without a usable timestamp month are quarantined, not dropped"""
+        database.close_all_connections()
+        os.remove(database.DATABASE_PATH)
+        partitions = next(
+            i for i, (description, _) in enumerate(database.SCHEMA_MIGRATIONS)
+            if description.startswith('monthly audit log partitions')
+        )
+        monkeypatch.setattr(database, 'SCHEMA_MIGRATIONS', database.SCHEMA_MIGRATIONS[:partitions])
+        init_db()
+        
+        with database.get_db_connection() as conn:
+            conn.executemany(
+                'INSERT INTO audit_logs (id, timestamp, action, details) VALUES (?, ?, ?, ?)',
+                [("good", "2024-01-10 00:00:00", "Login", "placed"),
+                 ("bad", "yesterday", "Login", "unparseable"),
+                 ("null", None, "Login", "no timestamp")]
+            )
+            conn.commit()
+            monkeypatch.undo()
+            database.migrate_db(conn)
+            quarantined = conn.execute(
+                f'SELECT id FROM {database.AUDIT_QUARANTINE_TABLE} ORDER BY id'
+            ).fetchall()
+        
+        assert [row['id'] for row in quarantined] == ["bad", "null"]
+        assert [l['id'] for l in get_audit_logs()] == ["good"]
+
+
+class TestMigrationFramework:
+    """Test the migration ledger, chunked backfills, resume and dry runs"""
+    
+    def make_migrations(self, apply):
+        return [
+            ('numbers table', [
+                'CREATE TABLE numbers (value INTEGER)',
+                'WITH RECURSIVE n(v) AS (SELECT 1 UNION ALL SELECT v + 1 FROM n WHERE v < 10) '
+                'INSERT INTO numbers (value) SELECT v FROM n'
+            ]),
+            ('double every number', [database.Backfill('numbers', apply, batch_size=3)])
+        ]
+    
+    def test_ledger_records_core_migrations(self):
+        """Test every core migration is recorded as applied"""
+        status = [m for m in database.get_migration_status('core')]
+        assert [m['version'] for m in status] == list(range(1, len(database.SCHEMA_MIGRATIONS) + 1))
+        assert {m['state'] for m in status} == {'applied'}
+    
+    def test_backfill_resumes_after_interruption(self):
+        """Test an interrupted backfill keeps committed chunks and resumes after them"""
+        import sqlite3
+        
+        calls = []
+        def flaky(conn, start, end):
+            calls.append((start, end))
+            if len(calls) == 3:
+                raise sqlite3.OperationalError("interrupted")
+            conn.execute('UPDATE numbers SET value = value * 2 WHERE rowid > ? AND rowid <= ?', (start, end))
+        
+        with database.get_db_connection() as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                database.migrate_db(conn, self.make_migrations(flaky), component='test', progress=None)
+            row = conn.execute("SELECT state, checkpoint FROM schema_migrations WHERE component = 'test' AND version = 2").fetchone()
+            assert row['state'] == 'running'
+            assert row['checkpoint'] is not None
+            
+            database.migrate_db(conn, self.make_migrations(
+                'UPDATE numbers SET value = value * 2 WHERE rowid > ? AND rowid <= ?'
+            ), component='test', progress=None)
+            values = [r[0] for r in conn.execute('SELECT value FROM numbers ORDER BY rowid')]
+        
+        # Chunks committed before the failure are not doubled twice
+        assert values == [v * 2 for v in range(1, 11)]
+        assert calls[:2] == [(0, 3), (3, 6)]
+    
+    def test_progress_reported(self):
+        """Test backfills report their final progress"""
+        events = []
+        with database.get_db_connection() as conn:
+            database.migrate_db(conn, self.make_migrations(
+                'UPDATE numbers SET value = value * 2 WHERE rowid > ? AND rowid <= ?'
+            ), component='test', progress=events.append)
+        assert events[-1]['rows_done'] == events[-1]['rows_total'] == 10
+    
+    def test_dry_run_changes_nothing(self):
+        """Test a dry run estimates pending work and rolls it back"""
+        with database.get_db_connection() as conn:
+            plan = database.migrate_db(conn, self.make_migrations(
+                'UPDATE numbers SET value = value * 2 WHERE rowid > ? AND rowid <= ?'
+            ), component='test', dry_run=True)
+            assert [m['version'] for m in plan] == [1, 2]
+            assert plan[1]['steps'][0]['rows'] == 10
+            assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'numbers'").fetchone() is None
+
+
+class TestAuditLogWriter:
+    """Test the background group-commit audit writer"""
+    
+    def test_enqueued_events_written_on_flush(self):
+        """Test queued events reach the database in batches"""
+        from audit_writer import AuditLogWriter
+        
+        writer = AuditLogWriter(flush_interval_ms=50, batch_size=10)
+        writer.start()
+        try:
+            ids = [writer.enqueue("Queued", f"Event {i}") for i in range(25)]
+            assert writer.flush()
+        finally:
+            writer.stop()
+        
+        logs = get_audit_logs(limit=100, action_filter="Queued")
+        assert {log['id'] for log in logs} == set(ids)
+        stats = writer.stats()
+        assert stats['written'] == 25
+        assert stats['batches'] < 25
+        assert stats['lost'] == 0
+    
+    def test_events_keep_enqueue_order(self):
+        """Test events are written in the order they were queued"""
+        from audit_writer import AuditLogWriter
+        
+        writer = AuditLogWriter(flush_interval_ms=20)
+        writer.start()
+        try:
+            for name in ("First", "Second", "Third"):
+                writer.enqueue(name, "Ordered")
+            writer.flush()
+        finally:
+            writer.stop()
+        
+        logs = get_audit_logs(limit=3)
+        assert [log['action'] for log in logs] == ["Third", "Second", "First"]
+    
+    def test_drop_policy_when_full(self):
+        """Test the drop policy discards events once the queue is full"""
+        from audit_writer import AuditLogWriter
+        
+        writer = AuditLogWriter(queue_size=2, policy='drop')
+        assert writer.enqueue("A", "1") is not None
+        assert writer.enqueue("B", "2") is not None
+        assert writer.enqueue("C", "3") is None
+        
+        stats = writer.stats()
+        assert stats['queue_depth'] == 2
+        assert stats['dropped'] == 1
+        assert stats['lost'] == 1
+    
+    def test_block_policy_times_out(self):
+        """Test the block policy gives up after block_timeout"""
+        from audit_writer import AuditLogWriter
+        
+        writer = AuditLogWriter(queue_size=1, policy='block', block_timeout=0.01)
+        writer.enqueue("A", "1")
+        assert writer.enqueue("B", "2") is None
+        assert writer.stats()['dropped'] == 1
+    
+    def test_sample_policy_discards_unsampled(self):
+        """Test the sample policy counts discarded events separately"""
+        from audit_writer import AuditLogWriter
+        
+        writer = AuditLogWriter(queue_size=1, policy='sample', sample_rate=0.0)
+        writer.enqueue("A", "1")
+        assert writer.enqueue("B", "2") is None
+        stats = writer.stats()
+        assert stats['sampled_out'] == 1
+        assert stats['lost'] == 1
+    
+    def test_stop_writes_pending_events(self):
+        """Test stopping the writer flushes what is still queued"""
+        from audit_writer import AuditLogWriter
+        
+        writer = AuditLogWriter(flush_interval_ms=1000)
+        writer.start()
+        writer.enqueue("Shutdown", "Pending")
+        writer.stop()
+        
+        assert len(get_audit_logs(action_filter="Shutdown")) == 1
+
+
+class TestAuditLogSearch:
+    """Test full-text audit log search and time ranges"""
+    
+    def test_search_any_field(self):
+        """Test bare terms match details, user and IP address"""
+        add_audit_log("Login", "Signed in from VPN", "alice", "10.1.2.3")
+        add_audit_log("Ticket", "Ticket ABC created", "bob", "10.9.9.9")
+        
+        assert [l['user'] for l in get_audit_logs_page(search="vpn")[0]] == ["alice"]
+        assert [l['user'] for l in get_audit_logs_page(search="bob")[0]] == ["bob"]
+        assert [l['user'] for l in get_audit_logs_page(search="ip:10.1.2.3")[0]] == ["alice"]
+    
+    def test_field_scoped_terms(self):
+        """Test field:value terms only match that field"""
+        add_audit_log("Ticket", "Ticket created by admin", "bob")
+        add_audit_log("Ticket", "Ticket created", "admin")
+        add_audit_log("Login", "User logged in", "admin")
+        
+        logs, _ = get_audit_logs_page(search="user:admin action:Ticket")
+        assert len(logs) == 1
+        assert logs[0]['user'] == "admin"
+        assert logs[0]['action'] == "Ticket"
+    
+    def test_time_range(self):
+        """Test since is inclusive and until is exclusive"""
+        database.insert_audit_logs([
+            ("a", "2024-01-01 00:00:00", "Login", "old", "admin", None, None),
+            ("b", "2024-02-01 00:00:00", "Login", "middle", "admin", None, None),
+            ("c", "2024-03-01 00:00:00", "Login", "new", "admin", None, None)
+        ])
+        
+        logs, _ = get_audit_logs_page(since="2024-02-01", until="2024-03-01T00:00:00Z")
+        assert [l['id'] for l in logs] == ["b"]
+        logs, _ = get_audit_logs_page(search="action:login", since="2024-01-15")
+        assert [l['id'] for l in logs] == ["c", "b"]
+    
+    def test_time_range_search_uses_timestamp_index(self):
+        """Test a searched time range walks the timestamp index"""
+        add_audit_log("Login", "User logged in")
+        partition = database.get_audit_partitions()['live'][0]['table_name']
+        with database.get_db_connection() as conn:
+            plan = ' '.join(row[3] for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM {partition} "
+                f"WHERE +rowid IN (SELECT rowid FROM {partition}_fts WHERE {partition}_fts MATCH 'x') "
+                "AND timestamp >= '2024-01-01' ORDER BY timestamp DESC, rowid DESC LIMIT 100"
+            ))
+        assert f'idx_{partition}_timestamp' in plan
+        assert 'TEMP B-TREE' not in plan
+    
+    def test_colons_outside_field_names_are_literal(self):
+        """Test times, IPv6 addresses and URLs are searched for, not read as fields"""
+        add_audit_log("Login", "Signed in at 10:30 via http://host/x", "alice", "fe80::1")
+        add_audit_log("Login", "Signed in at 11:45", "bob", "10.0.0.1")
+        
+        assert [l['user'] for l in get_audit_logs_page(search="10:30")[0]] == ["alice"]
+        assert [l['user'] for l in get_audit_logs_page(search="fe80::1")[0]] == ["alice"]
+        assert [l['user'] for l in get_audit_logs_page(search="ip:fe80::1")[0]] == ["alice"]
+        assert [l['user'] for l in get_audit_logs_page(search="http://host/x")[0]] == ["alice"]
+        assert get_audit_logs_page(search="bogus:value")[0] == []
+    
+    def test_quoted_phrase_scoped_to_field(self):
+        """Test a quoted phrase after a field prefix is matched as a whole in that field"""
+        add_audit_log("Ticket", "disk full on server", "alice")
+        add_audit_log("Ticket", "full disk on server", "bob")
+        add_audit_log("disk", "Ticket closed as full", "carol")
+        
+        assert database.build_audit_search_query('details:"disk full" bob') == 'details : "disk full" "bob"'
+        assert [l['user'] for l in get_audit_logs_page(search='details:"disk full"')[0]] == ["alice"]
+        assert [l['user'] for l in get_audit_logs_page(search="O'Brien")[0]] == []
+    
+    def test_invalid_search_rejected(self):
+        """Test unbalanced quotes and bad timestamps raise ValueError"""
+        with pytest.raises(ValueError):
+            get_audit_logs_page(search='details:"unterminated')
+        with pytest.raises(ValueError):
+            get_audit_logs_page(since="yesterday")
+    
+    def test_action_filter_unchanged(self):
+        """Test the action parameter still matches substrings"""
+        add_audit_log("Password Reset", "Reset for bob")
+        logs, _ = get_audit_logs_page(action_filter="word Re")
+        assert [l['action'] for l in logs] == ["Password Reset"]
+
+
+class TestExports:
+    """Test streaming NDJSON/CSV exports"""
+    
+    def test_tickets_stream_oldest_first(self):
+        """Test ticket exports are lazy, ordered and status filtered"""
+        database.create_tickets_bulk([
+            {"title": "First"}, {"title": "Second", "status": "closed"}, {"title": "Third"}
+        ])
+        rows = database.iter_tickets()
+        assert not isinstance(rows, list)
+        assert [t['title'] for t in rows] == ["First", "Second", "Third"]
+        assert [t['title'] for t in database.iter_tickets(status_filter="closed")] == ["Second"]
+    
+    def test_audit_logs_time_range_spans_partitions(self, tmp_path, monkeypatch):
+        """Test audit exports walk live and archived months in order"""
+        monkeypatch.setattr(database, 'AUDIT_ARCHIVE_DIR', str(tmp_path))
+        database.insert_audit_logs([
+            ("a", "2024-01-10 00:00:00", "Login", "january", "admin", None, None),
+            ("b", "2024-02-10 00:00:00", "Ticket", "february", "bob", None, None),
+            ("c", "2024-03-10 00:00:00", "Login", "march", "admin", None, None)
+        ])
+        database.expire_audit_partitions("2024-02")
+        assert [l['id'] for l in database.iter_audit_logs()] == ["b", "c"]
+        assert [l['id'] for l in database.iter_audit_logs(include_archived=True)] == ["a", "b", "c"]
+        logs = database.iter_audit_logs(since="2024-01-05", until="2024-02-11", include_archived=True)
+        assert [l['id'] for l in logs] == ["a", "b"]
+    
+    def test_invalid_range_raises_before_streaming(self):
+        """Test bad timestamps are rejected when the export starts"""
+        with pytest.raises(ValueError):
+            database.iter_devices(since="yesterday")
+        with pytest.raises(ValueError):
+            exports.stream_export("tickets", "xml")
+    
+    def test_formats(self):
+        """Test NDJSON and CSV encoding of exported rows"""
+        database.add_device({"hostname": "ws-01", "ip_address": "10.0.0.5"})
+        ndjson = "".join(exports.stream_export("devices", "ndjson"))
+        assert json.loads(ndjson.splitlines()[0])['hostname'] == "ws-01"
+        
+        lines = "".join(exports.stream_export("devices", "csv", since="2000-01-01")).splitlines()
+        assert lines[0].split(",")[:3] == ["id", "hostname", "ip_address"]
+        assert "ws-01" in lines[1]
+        assert "".join(exports.stream_export("devices", "csv", until="2000-01-01")) == ""
+
+
+class TestDeviceInventory:
+    """Test change-detecting device check-ins"""
+    
+    DEVICE = {"id": "dev-1", "hostname": "ws-01", "ip_address": "10.0.0.5", "os_info": "Windows 11"}
+    
+    def test_unchanged_checkin_only_touches_last_seen(self):
+        """Test a repeated check-in records no history"""
+        assert database.add_device(self.DEVICE) == "dev-1"
+        result = database.upsert_devices([self.DEVICE])
+        assert (result['inserted'], result['changed'], result['unchanged']) == (0, 0, 1)
+        assert database.get_device_history("dev-1") == []
+        assert len(database.get_all_devices()) == 1
+    
+    def test_unchanged_single_checkin_skips_lookup(self):
+        """Test one unchanged device is handled by a single UPDATE, without the batch lookup"""
+        database.add_device(self.DEVICE)
+        query_stats.query_stats.reset()
+        database.upsert_devices([self.DEVICE])
+        statements = [entry['sql'] for entry in query_stats.query_stats.top(limit=100)]
+        assert statements == ["UPDATE device_inventory SET last_seen = ? WHERE id = ? AND attributes_hash = ?"]
+    
+    def test_changes_recorded_as_diff(self):
+        """Test changed attributes are updated in place with an old/new diff"""
+        database.add_device(self.DEVICE)
+        database.add_device(dict(self.DEVICE, ip_address="10.0.0.9"))
+        database.add_device(dict(self.DEVICE, ip_address="10.0.0.9", os_info="Windows 11 24H2"))
+        
+        history = database.get_device_history("dev-1")
+        assert [h['changes'] for h in history] == [
+            {"os_info": ["Windows 11", "Windows 11 24H2"]},
+            {"ip_address": ["10.0.0.5", "10.0.0.9"]}
+        ]
+        assert database.get_all_devices()[0]['ip_address'] == "10.0.0.9"
+    
+    def test_batch_with_repeated_device(self):
+        """Test a device reported twice in one call ends with its last report"""
+        result = database.upsert_devices([self.DEVICE, dict(self.DEVICE, hostname="ws-01b"), {"hostname": "ws-02"}])
+        assert (result['inserted'], result['changed']) == (2, 1)
+        assert result['ids'][0] == result['ids'][1] == "dev-1"
+        assert {d['hostname'] for d in database.get_all_devices()} == {"ws-01b", "ws-02"}
+
+
+class TestSnapshotReads:
+    """Test long reads on snapshot connections are isolated from writers"""
+    
+    @pytest.fixture(params=['balanced', 'legacy'])
+    def profile(self, request, monkeypatch):
+        # legacy uses the rollback journal, where a long read blocks writers
+        monkeypatch.setattr(database, 'DB_PROFILE', request.param)
+        database.get_storage_backend().reset()
+        init_db()
+        return request.param
+    
+    def test_export_does_not_block_writes(self, profile, monkeypatch):
+        """Test writers commit promptly while an export is part-way through, with or without WAL"""
+        import threading
+        import time
+        monkeypatch.setattr(database, 'EXPORT_BATCH_SIZE', 10)
+        database.insert_audit_logs([
+            (f"log-{i:03d}", "2024-01-10 00:00:00", "Login", "seeded", "admin", None, None) for i in range(50)
+        ])
+        ticket_id = create_ticket({"title": "Before export"})
+        
+        rows = database.iter_audit_logs()
+        first = next(rows)
+        errors = []
+        
+        def writer():
+            try:
+                database.insert_audit_logs([("late", "2024-01-11 00:00:00", "Login", "late", "bob", None, None)])
+                update_ticket(ticket_id, {"status": "closed"})
+            except Exception as e:
+                errors.append(e)
+        
+        started = time.monotonic()
+        thread = threading.Thread(target=writer)
+        thread.start()
+        thread.join(timeout=10)
+        assert errors == []
+        assert time.monotonic() - started < 2
+        
+        exported = [row['id'] for row in [first] + list(rows)]
+        seeded = [f"log-{i:03d}" for i in range(50)]
+        assert get_ticket_by_id(ticket_id)['status'] == "closed"
+        if profile == 'balanced':
+            # A WAL snapshot does not see the late write
+            assert exported == seeded
+        else:
+            # Batched reads may pick it up, but never repeat or skip a row
+            assert exported in (seeded, seeded + ["late"])
+    
+    def test_rollback_journal_holds_no_read_transaction(self, monkeypatch):
+        """Test the legacy profile snapshot reads the file in place between short statements"""
+        monkeypatch.setattr(database, 'DB_PROFILE', 'legacy')
+        monkeypatch.setattr(database, 'EXPORT_BATCH_SIZE', 2)
+        database.get_storage_backend().reset()
+        init_db()
+        ticket_ids = [create_ticket({"title": f"Ticket {i}"}) for i in range(5)]
+        with database.get_snapshot_connection() as conn:
+            assert conn.execute('PRAGMA journal_mode').fetchone()[0].lower() != 'wal'
+            assert conn.execute('PRAGMA database_list').fetchone()['file'] == os.path.abspath(database.DATABASE_PATH)
+            assert not conn.in_transaction
+        assert [row['id'] for row in database.iter_tickets()] == ticket_ids
+    
+    def test_snapshot_is_read_only(self, profile):
+        """Test writes through a snapshot connection are refused"""
+        import sqlite3
+        with database.get_snapshot_connection() as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO settings (key, value) VALUES ('x', 'y')")
+
+
+class TestMaintenance:
+    """Test database maintenance runs and history"""
+    
+    def test_new_database_uses_incremental_auto_vacuum(self):
+        """Test init_db() sets auto_vacuum once instead of every connection doing it"""
+        with database.get_db_connection() as conn:
+            assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == database._AUTO_VACUUM_INCREMENTAL
+        
+        query_stats.query_stats.reset()
+        database.get_storage_backend().connect().close()
+        assert not any('auto_vacuum' in entry['sql'] for entry in query_stats.query_stats.top(limit=100))
+    
+    def test_reclaims_expired_partitions(self, tmp_path, monkeypatch):
+        """Test incremental vacuum returns pages freed by dropped partitions"""
+        monkeypatch.setattr(database, 'AUDIT_ARCHIVE_DIR', str(tmp_path))
+        database.insert_audit_logs([
+            (database.new_id(), f"2024-0{1 + i % 2}-10 00:00:00", "Login", "x" * 500, "admin", None, None)
+            for i in range(2000)
+        ])
+        database.expire_audit_partitions("2024-02", archive=False)
+        
+        run = database.run_maintenance()
+        statuses = {t['task']: t['status'] for t in run['tasks']}
+        assert statuses == {'optimize': 'done', 'analyze': 'done', 'incremental_vacuum': 'done', 'checkpoint': 'done'}
+        assert run['freelist_before'] > 0
+        assert run['freelist_after'] < run['freelist_before']
+        assert run['bytes_reclaimed'] > 0
+    
+    def test_time_budget_skips_tasks(self):
+        """Test tasks are not started once the time budget is spent"""
+        run = database.run_maintenance(time_budget=0)
+        assert {t['status'] for t in run['tasks']} == {'skipped'}
+    
+    def test_history_newest_first(self):
+        """Test runs are recorded with their tasks"""
+        first = database.run_maintenance(trigger='idle')
+        second = database.run_maintenance()
+        history = database.get_maintenance_history()
+        assert [r['id'] for r in history] == [second['id'], first['id']]
+        assert history[1]['trigger'] == 'idle'
+        assert history[0]['tasks'][0]['task'] == 'optimize'
+
+
+class TestQueryStats:
+    """Test statement timing and the slow-query log"""
+    
+    TICKET_BY_ID = f"SELECT {', '.join(database.TICKET_COLUMNS)} FROM tickets WHERE id = ?"
+    
+    @pytest.fixture(autouse=True)
+    def stats(self):
+        query_stats.query_stats.reset()
+        return query_stats.query_stats
+    
+    def test_normalize_sql(self):
+        """Test literals, IN lists and whitespace are folded"""
+        sql = "SELECT *  FROM t\n WHERE a = 'x' AND b > 10 AND c IN (?, ?, ?) AND d = ?"
+        assert query_stats.normalize_sql(sql) == "SELECT * FROM t WHERE a = ? AND b > ? AND c IN (?, ...) AND d = ?"
+        assert query_stats.normalize_sql("SELECT * FROM audit_logs_p202401") == "SELECT * FROM audit_logs_p202401"
+    
+    def test_statements_recorded_with_caller(self, stats, monkeypatch):
+        """Test executions are counted by statement with rows and calling function"""
+        monkeypatch.setattr(query_stats, 'QUERY_STATS_CALLER_SAMPLE', 1)
+        ticket_id = create_ticket({"title": "Timed"})
+        get_ticket_by_id(ticket_id)
+        get_ticket_by_id(ticket_id)
+        
+        entry = next(s for s in stats.top(50) if s['sql'] == self.TICKET_BY_ID)
+        assert entry['count'] == 2
+        assert entry['rows'] == 2
+        assert sum(entry['histogram'].values()) == 2
+        (caller,) = entry['callers']
+        assert caller.startswith("database.py:") and caller.endswith(" get_ticket_by_id")
+        with pytest.raises(ValueError):
+            stats.top(sort="bogus")
+    
+    def test_slow_queries_logged_with_plan(self, stats, monkeypatch):
+        """Test statements over the threshold are logged with their query plan"""
+        monkeypatch.setattr(stats, 'slow_query_ms', 0)
+        get_ticket_by_id("missing")
+        slow = next(s for s in stats.slow_queries() if s['sql'] == self.TICKET_BY_ID)
+        assert any("tickets" in line for line in slow['plan'])
+    
+    def test_slow_queries_always_name_caller(self, stats, monkeypatch, caplog):
+        """Test callers are sampled, but a slow statement is logged with its caller"""
+        monkeypatch.setattr(query_stats, 'QUERY_STATS_CALLER_SAMPLE', 10 ** 9)
+        ticket_id = create_ticket({"title": "Timed"})
+        next(query_stats._executions)
+        get_ticket_by_id(ticket_id)
+        assert next(s for s in stats.top(50) if s['sql'] == self.TICKET_BY_ID)['callers'] == {}
+        
+        monkeypatch.setattr(stats, 'slow_query_ms', 0)
+        with caplog.at_level('WARNING', logger='query_stats'):
+            get_ticket_by_id(ticket_id)
+            database.get_storage_backend().connect().close()
+        slow = next(s for s in stats.slow_queries() if s['sql'] == self.TICKET_BY_ID)
+        assert slow['caller'].endswith(" get_ticket_by_id")
+        assert any("Slow query" in message and "get_ticket_by_id" in message for message in caplog.messages)
+        # Connection setup pragmas are counted but not logged as slow
+        assert not any(s['sql'].startswith('PRAGMA') for s in stats.slow_queries())
+
+
 class TestSettingsOperations:
     """Test settings database operations"""
     
@@ -176,6 +1376,46 @@ class TestSettingsOperations:
         value = get_setting("update_key")
         assert value == "updated"
 
+class TestSettingsCache:
+    """Test the read-through settings cache"""
+    
+    def test_reads_served_from_cache(self):
+        """Test repeated reads load the table once"""
+        cache = database.get_settings_cache()
+        set_setting("theme", "dark")
+        loads = cache.stats['loads']
+        for _ in range(5):
+            assert get_setting("theme") == "dark"
+        assert cache.stats['loads'] == loads + 1
+    
+    def test_other_process_writes_picked_up(self, monkeypatch):
+        """Test writes outside this process are seen once the version is rechecked"""
+        import sqlite3
+        
+        monkeypatch.setattr(database.get_settings_cache(), 'check_interval', 3600)
+        set_setting("threshold", "80")
+        assert get_setting("threshold") == "80"
+        
+        other = sqlite3.connect(database.DATABASE_PATH)
+        other.execute("UPDATE settings SET value = '90' WHERE key = 'threshold'")
+        other.commit()
+        other.close()
+        
+        # Within the check interval the cached value is trusted
+        assert get_setting("threshold") == "80"
+        monkeypatch.setattr(database.get_settings_cache(), 'check_interval', 0)
+        assert get_setting("threshold") == "90"
+    
+    def test_unchanged_version_revalidates_without_reload(self, monkeypatch):
+        """Test an unchanged version keeps the cached copy"""
+        cache = database.get_settings_cache()
+        monkeypatch.setattr(cache, 'check_interval', 0)
+        set_setting("theme", "dark")
+        get_setting("theme")
+        loads = cache.stats['loads']
+        get_setting("theme")
+        assert cache.stats['loads'] == loads
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -28,6 +28,38 @@ class TestUtilityFunctions:
         assert result is not None
 
 
+class TestBackgroundWorker:
+    """Test the shared background worker plumbing"""
+    
+    def test_start_stop_and_counters(self, caplog):
+        """Test start and stop are idempotent, counters are reported and shutdown is logged"""
+        import logging
+        import threading
+        from background import BackgroundWorker
+        
+        class Ticker(BackgroundWorker):
+            thread_name = 'test-ticker'
+            label = 'Test ticker'
+            
+            def _loop(self):
+                while not self._stop.wait(0.01):
+                    self._count('ticks')
+        
+        worker = Ticker({'ticks': 0})
+        worker.start()
+        thread = worker.thread
+        worker.start()
+        assert worker.thread is thread
+        while worker.stats()['ticks'] == 0:
+            threading.Event().wait(0.01)
+        with caplog.at_level(logging.INFO, logger='background'):
+            worker.stop()
+            worker.stop()
+        assert not thread.is_alive()
+        assert worker.stats()['running'] is False
+        assert [record.getMessage() for record in caplog.records] == ["Test ticker stopped"]
+
+
 class TestSystemInfo:
     """Test system information gathering"""
     